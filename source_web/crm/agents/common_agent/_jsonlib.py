@@ -0,0 +1,211 @@
+"""
+JSON helpers for the common agents
+
+Uses orjson when it is installed, then pysimdjson for parsing, and falls back to
+the standard library json module otherwise, so callers get the faster parser
+without a hard dependency.
+"""
+
+import json
+from typing import Any, List, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import simdjson
+    SIMDJSON_AVAILABLE = True
+except ImportError:
+    SIMDJSON_AVAILABLE = False
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from str or bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    if SIMDJSON_AVAILABLE:
+        try:
+            return simdjson.loads(data)
+        except ValueError as e:
+            # pysimdjson raises plain ValueError; keep callers on a single exception type
+            doc = data.decode(errors="replace") if isinstance(data, (bytes, bytearray)) else str(data)
+            raise JSONDecodeError(str(e), doc, 0) from e
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """Serialize to a compact JSON string, stringifying values JSON cannot represent"""
+    if ORJSON_AVAILABLE:
+        # Native numpy support covers values coming out of the pandas partition path
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes, ready to send as an HTTP response body"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps_pretty(obj: Any) -> str:
+    """Serialize to JSON indented by two spaces, for logs and command-line output"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, default=str, ensure_ascii=False, indent=2)
+
+
+class ArrayItemStream:
+    """
+    Incrementally extract the items of one named JSON array from streamed text
+
+    Feed response chunks as they arrive; every object or array item of the target
+    array is returned as soon as its closing bracket has been received, so callers
+    can start work before the rest of the document is generated. The full text
+    seen so far stays available on .text for the final parse.
+
+    Only the key of the top-level object is matched; the same name nested deeper,
+    or inside a string value, is ignored.
+    """
+
+    def __init__(self, key: str):
+        """
+        Args:
+            key: Name of the array to extract (e.g. "activities")
+        """
+        self._marker = f'"{key}"'
+        self._buffer = ''
+        # Scan state while looking for the key: resume position and bracket depth there
+        self._scan_pos = 0
+        self._scan_depth = 0
+        self._pos = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """All text fed so far"""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Add a chunk of streamed text
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            Array items completed by this chunk (possibly empty)
+        """
+        self._buffer += chunk
+        items = []
+        if self.done:
+            return items
+
+        if self._pos is None:
+            self._pos = self._find_array()
+            if self._pos is None:
+                return items
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the target array itself
+                    self.done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(loads(buffer[self._item_start:i + 1]))
+                    except JSONDecodeError:
+                        pass
+                    self._item_start = None
+            i += 1
+
+        self._pos = i
+        return items
+
+    def _find_array(self) -> Optional[int]:
+        """
+        Scan on for the target key at depth 1 followed by an array
+
+        Returns:
+            Position just after the array's opening bracket, or None if not received yet
+        """
+        buffer = self._buffer
+        end = len(buffer)
+        i = self._scan_pos
+        depth = self._scan_depth
+        while i < end:
+            ch = buffer[i]
+            if ch == '"':
+                close = _string_end(buffer, i)
+                if close == -1:
+                    break
+                if depth == 1 and buffer[i:close + 1] == self._marker:
+                    colon = _skip_whitespace(buffer, close + 1)
+                    value = _skip_whitespace(buffer, colon + 1) if colon < end and buffer[colon] == ':' else colon
+                    if value >= end:
+                        # Not yet known whether this string is the key of an array; resume here
+                        break
+                    if value != colon and buffer[value] == '[':
+                        return value + 1
+                i = close + 1
+                continue
+            if ch in '{[':
+                depth += 1
+            elif ch in '}]':
+                depth -= 1
+            i += 1
+        self._scan_pos = i
+        self._scan_depth = depth
+        return None
+
+
+def _string_end(buffer: str, start: int) -> int:
+    """Index of the quote closing the JSON string opened at start, or -1 if not received yet"""
+    i = start + 1
+    end = len(buffer)
+    while i < end:
+        ch = buffer[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '"':
+            return i
+        i += 1
+    return -1
+
+
+def _skip_whitespace(buffer: str, i: int) -> int:
+    """Index of the first non-whitespace character at or after i (len(buffer) if none)"""
+    end = len(buffer)
+    while i < end and buffer[i] in ' \t\r\n':
+        i += 1
+    return i
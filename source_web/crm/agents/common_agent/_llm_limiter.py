@@ -0,0 +1,119 @@
+"""
+Shared in-flight limit for async LLM calls
+
+Every agent on an event loop shares one limiter, so bursts from many customers
+are pipelined over the shared connection pool with at most LLM_MAX_IN_FLIGHT
+calls outstanding. Each call holds its slot only until its own response
+arrives; prompts are sent one per request, never grouped.
+
+Usage:
+    limiter = get_llm_inflight_limiter()
+    response = await limiter.submit(model_factory, prompt, system_message)
+
+    async for chunk in limiter.stream(model_factory, prompt, system_message):
+        ...
+"""
+
+import asyncio
+import contextlib
+import os
+import weakref
+from typing import AsyncContextManager, AsyncIterator, Optional
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+
+# Queue marker for the end of a streamed completion
+_STREAM_END = object()
+
+
+class LLMInflightLimiter:
+    """
+    Bounds the number of LLM calls in flight
+
+    The semaphore is bound to the event loop that first uses it, so use
+    get_llm_inflight_limiter() to obtain the instance for the running loop.
+    """
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT):
+        """
+        Initialize the limiter
+
+        Args:
+            max_in_flight: Maximum LLM calls outstanding at once
+        """
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def submit(self, model_factory, prompt: str, system_message: Optional[str] = None) -> str:
+        """
+        Send a prompt once a slot is free and wait for its response
+
+        Args:
+            model_factory: ModelFactory that should answer the prompt
+            prompt: The user prompt
+            system_message: Optional system message
+
+        Returns:
+            Generated content string (or the factory's error string)
+        """
+        async with self._slots:
+            return await model_factory.agenerate_content(prompt, system_message)
+
+    async def stream(self, model_factory, prompt: str, system_message: Optional[str] = None,
+                     reservation: Optional[AsyncContextManager] = None) -> AsyncIterator[str]:
+        """
+        Stream a completion once a slot is free, without holding the slot while chunks are consumed
+
+        A background task reads the provider stream into a queue, holding the reservation
+        (e.g. a rate-limiter reservation) and then a slot only while the provider is
+        sending, so a slow or paused consumer never keeps either busy.
+
+        Args:
+            model_factory: ModelFactory that should answer the prompt
+            prompt: The user prompt
+            system_message: Optional system message
+            reservation: Optional async context entered before the slot is taken
+
+        Yields:
+            Text chunks of the generated content
+
+        Raises:
+            Exception: The provider error that ended the stream, after the chunks received before it
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump() -> None:
+            try:
+                async with reservation if reservation is not None else contextlib.nullcontext():
+                    async with self._slots:
+                        async for chunk in model_factory.astream_content(prompt, system_message):
+                            queue.put_nowait(chunk)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                queue.put_nowait(_STREAM_END)
+
+        task = asyncio.ensure_future(pump())
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # The consumer stopped early (or failed): stop reading the provider stream
+            task.cancel()
+
+
+# One limiter per event loop, since its semaphore cannot cross loops
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LLMInflightLimiter]" = weakref.WeakKeyDictionary()
+
+
+def get_llm_inflight_limiter() -> LLMInflightLimiter:
+    """Return the LLM in-flight limiter for the running event loop"""
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = LLMInflightLimiter()
+    return limiter
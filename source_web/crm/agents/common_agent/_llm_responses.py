@@ -0,0 +1,92 @@
+"""
+Helpers shared by the agents for handling LLM JSON responses
+
+Covers stripping Markdown fences, rendering fallback results from templates and
+caching raw responses that parsed successfully. Each agent keeps its own cache
+instance and templates; only the mechanics live here.
+
+Usage:
+    _response_cache = ResponseCache(maxsize=1024, ttl=3600)
+    _insights_fallback = insights_fallback_renderer(_INSIGHTS_FALLBACK_TEMPLATE)
+
+    result = _jsonlib.loads(FENCE_RE.sub('', response))
+"""
+
+import re
+import string
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from cachetools import TTLCache
+
+# Leading ```json / ``` and trailing ``` fences around an LLM JSON answer
+FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.IGNORECASE)
+
+
+def render_fallback(template: Any, values: Dict[str, str]) -> Any:
+    """Substitute $placeholders in every string of a nested fallback template"""
+    if isinstance(template, str):
+        return string.Template(template).safe_substitute(values)
+    if isinstance(template, dict):
+        return {key: render_fallback(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render_fallback(value, values) for value in template]
+    return template
+
+
+def insights_fallback_renderer(template: Dict[str, Any]) -> Callable[[str], Dict[str, Any]]:
+    """
+    Build the insights fallback lookup for one agent's template
+
+    Args:
+        template: Fallback result with $insight_type / $insight_title placeholders
+
+    Returns:
+        Function returning the fallback for an insight type, rendered once per type;
+        callers must deepcopy its result before mutating
+    """
+    @lru_cache(maxsize=16)
+    def insights_fallback(insight_type: str) -> Dict[str, Any]:
+        return render_fallback(template, {"insight_type": insight_type, "insight_title": insight_type.title()})
+
+    return insights_fallback
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL cache of raw LLM responses
+
+    A cache key of None means caching is off for that request, so get() misses and
+    set() does nothing.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize: Maximum number of responses kept
+            ttl: Seconds a response stays valid
+        """
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: Optional[str]) -> Optional[str]:
+        """Return the cached LLM response for a key, or None on a miss or when caching is off"""
+        if cache_key is None:
+            return None
+        with self._lock:
+            return self._cache.get(cache_key)
+
+    def set(self, cache_key: Optional[str], response: str) -> None:
+        """Store an LLM response that parsed successfully"""
+        if cache_key is None:
+            return
+        with self._lock:
+            self._cache[cache_key] = response
+
+    def clear(self) -> None:
+        """Drop every cached response"""
+        with self._lock:
+            self._cache.clear()
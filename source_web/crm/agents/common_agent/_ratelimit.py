@@ -0,0 +1,102 @@
+"""
+Async request/token bucket limiter for LLM calls
+
+Admits a call only when both the requests-per-minute and tokens-per-minute
+buckets have capacity, so concurrent batches stay under provider quotas instead
+of paying for 429 responses and retry-after waits.
+
+Usage:
+    bucket = AsyncLeakyBucket(rpm=500, tpm=150000)
+
+    async with bucket.reserve(estimate_tokens(prompt)):
+        response = await client.chat.completions.create(...)
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough prompt token estimate (~4 characters per token)"""
+    return sum(len(text) for text in texts if text) // 4
+
+
+class AsyncLeakyBucket:
+    """
+    Request + token bucket refilled continuously at rpm/60 and tpm/60 per second
+
+    Capacity is refilled lazily on each acquire rather than by a background task,
+    which keeps the bucket free of event-loop-bound state so one module-level
+    instance can be shared by every loop in the process. A limit of 0 disables
+    that dimension.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        """
+        Initialize the bucket at full capacity
+
+        Args:
+            rpm: Maximum requests per minute (0 for unlimited)
+            tpm: Maximum tokens per minute (0 for unlimited)
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests_available = float(rpm)
+        self.tokens_available = float(tpm)
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        """Add the capacity accrued since the last refill, up to the bucket size"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+
+        if self.rpm:
+            self.requests_available = min(self.rpm, self.requests_available + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens_available = min(self.tpm, self.tokens_available + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until one request and the given number of tokens are available, then take them
+
+        Args:
+            tokens: Estimated tokens the call will consume
+        """
+        # A single call larger than the whole bucket would otherwise wait forever
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+
+        while True:
+            self._refill()
+
+            has_request = not self.rpm or self.requests_available >= 1
+            has_tokens = not self.tpm or self.tokens_available >= tokens
+
+            if has_request and has_tokens:
+                if self.rpm:
+                    self.requests_available -= 1
+                if self.tpm:
+                    self.tokens_available -= tokens
+                return
+
+            wait = 0.0
+            if not has_request:
+                wait = (1 - self.requests_available) * 60 / self.rpm
+            if not has_tokens:
+                wait = max(wait, (tokens - self.tokens_available) * 60 / self.tpm)
+
+            await asyncio.sleep(max(wait, 0.01))
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int) -> AsyncIterator[None]:
+        """
+        Context manager form of acquire
+
+        Args:
+            tokens: Estimated tokens the call will consume
+        """
+        await self.acquire(tokens)
+        yield
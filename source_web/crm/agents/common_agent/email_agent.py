@@ -13,6 +13,9 @@ Key Features:
 4. Activity status based on interaction timestamps (<7 days = active, >7 days = inactive)
 5. Three-sentence insights format for proper structure and readability
 6. Recent email summary between current employee and current client
+7. Async variants with bounded concurrent LLM dispatch for multi-client batches
+8. Combined analysis + insights in a single LLM call when both are needed
+9. Streaming analysis that emits activities before the full response has arrived
 
 Core Analysis Capabilities:
 - Current client email content summarization and key point extraction
@@ -36,15 +39,341 @@ Supported Providers:
 """
 
 import os
-import json
-from typing import Dict, List, Any, Optional, Union
+import asyncio
+import copy
+import hashlib
+import heapq
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Any, Optional, Union, NamedTuple, Tuple
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from agents.model_factory import ModelFactory
+from datetime import datetime, timedelta, timezone
+from agents.model_factory import COMPLETION_MAX_TOKENS, ModelFactory
+from agents.common_agent._ratelimit import AsyncLeakyBucket, estimate_tokens
+from agents.common_agent._llm_limiter import get_llm_inflight_limiter
+from agents.common_agent._llm_responses import FENCE_RE, ResponseCache, insights_fallback_renderer
+from agents.common_agent import _jsonlib
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+try:
+    import numpy as np
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# JSON output schema shared by every analysis focus and insight type; only the three
+# insight categories, the next_move hints and the recent_email_summary block vary
+_SCHEMA_TEMPLATE = """REQUIRED JSON OUTPUT FORMAT:
+{{
+  "activities": [
+    {{
+      "type": "email",
+      "date": "YYYY-MM-DD",
+      "content_summary": "Brief summary of email content",
+      "status": "active/inactive/decline"
+    }}
+  ],
+  "insights": [
+{insights}
+  ],{recent_email_summary}
+  "next_move": {{
+    "priority": "high/medium/low",
+    "action": "{action}",
+    "rationale": "{rationale}"
+  }}
+}}"""
+
+_INSIGHT_SCHEMA_TEMPLATE = """    {{
+      "category": "{category}",
+      "insight": "Three sentence insight about {topic}. Each insight must contain exactly three sentences. This provides proper structure and readability."
+    }}"""
+
+_RECENT_EMAIL_SUMMARY_SCHEMA = """
+  "recent_email_summary": {
+    "has_recent_email": true/false,
+    "email_date": "YYYY-MM-DD",
+    "employee_id": 123,
+    "client_id": 456,
+    "email_type": "Email/Follow-up Email",
+    "content_preview": "First 150 characters of email content...",
+    "status": "active/inactive/decline",
+    "key_points": "Summary of main points from the most recent email"
+  },"""
+
+# (insight (category, topic) pairs, next_move action, next_move rationale, include recent_email_summary)
+_FOCUS_PARAMS = {
+    "comprehensive": (
+        (("Communication Patterns", "communication patterns"),
+         ("Content Analysis", "email content themes"),
+         ("Relationship Health", "relationship status")),
+        "Specific recommended action", "Why this action is recommended", True),
+    "sentiment": (
+        (("Sentiment Analysis", "overall sentiment trends"),
+         ("Tone Evolution", "how tone has changed over time"),
+         ("Emotional Indicators", "emotional cues in communications")),
+        "Sentiment-based recommended action", "Why this action addresses sentiment concerns", True),
+    "patterns": (
+        (("Communication Frequency", "email frequency patterns"),
+         ("Response Patterns", "response time and engagement patterns"),
+         ("Topic Trends", "recurring topics and themes")),
+        "Pattern-based recommended action", "Why this action leverages identified patterns", True),
+    "actions": (
+        (("Action Items Identified", "action items mentioned in emails"),
+         ("Follow-up Requirements", "follow-up needs and commitments"),
+         ("Priority Assessment", "priority levels of different actions")),
+        "Action-focused recommended next step", "Why this action addresses the most critical needs", True),
+}
+
+_INSIGHT_PARAMS = {
+    "strategic": (
+        (("Strategic Communication Opportunities", "strategic opportunities identified in email communications"),
+         ("Relationship Development", "relationship building through email interactions"),
+         ("Business Impact Assessment", "business impact of email communications")),
+        "Strategic action based on email analysis", "Strategic reasoning for recommended action", True),
+    "tactical": (
+        (("Immediate Action Items", "immediate actions needed based on emails"),
+         ("Process Improvements", "process improvements identified from email patterns"),
+         ("Response Optimization", "optimizing email response strategies")),
+        "Tactical action for immediate implementation", "Tactical reasoning for recommended action", False),
+    "relationship": (
+        (("Relationship Health", "current relationship health based on email tone and frequency"),
+         ("Engagement Levels", "engagement levels and responsiveness patterns"),
+         ("Trust Indicators", "trust and rapport indicators in email communications")),
+        "Relationship-focused action", "Relationship-based reasoning for recommended action", False),
+    "content": (
+        (("Content Themes", "recurring themes and topics in email content"),
+         ("Information Quality", "quality and completeness of information shared"),
+         ("Communication Clarity", "clarity and effectiveness of email communications")),
+        "Content-focused improvement action", "Content-based reasoning for recommended action", False),
+}
+
+
+def _render_schema(insights, action: str, rationale: str, include_recent_summary: bool) -> str:
+    """Render one REQUIRED JSON OUTPUT FORMAT block from its parameters"""
+    return _SCHEMA_TEMPLATE.format(
+        insights=",\n".join(_INSIGHT_SCHEMA_TEMPLATE.format(category=category, topic=topic) for category, topic in insights),
+        recent_email_summary=_RECENT_EMAIL_SUMMARY_SCHEMA if include_recent_summary else "",
+        action=action,
+        rationale=rationale
+    )
+
+
+# Rendered once at import, keyed by analysis focus / insight type
+_FOCUS_PROMPTS: Dict[str, str] = {focus: _render_schema(*params) for focus, params in _FOCUS_PARAMS.items()}
+_INSIGHT_PROMPTS: Dict[str, str] = {insight_type: _render_schema(*params) for insight_type, params in _INSIGHT_PARAMS.items()}
+
+# Deterministic result for clients with interactions but no emails; returned without an LLM call
+_NO_EMAILS_RESULT: Dict[str, Any] = {
+    "activities": [],
+    "insights": [
+        {
+            "category": "Email Engagement",
+            "insight": "No email communications with this client were found. There is no email history to analyze for patterns, sentiment or commitments. Starting an email conversation is the first step toward building this channel."
+        }
+    ],
+    "recent_email_summary": {
+        "has_recent_email": False,
+        "message": "No email interactions found for the specified criteria"
+    },
+    "next_move": {
+        "priority": "medium",
+        "action": "Initiate outreach",
+        "rationale": "No email communication exists with this client yet"
+    }
+}
+
+# Fallback results used when the LLM response cannot be parsed; only the first activity's
+# date and status (and, for insights, the insight type) vary between failures
+_ANALYSIS_FALLBACK: Dict[str, Any] = {
+    "activities": [
+        {
+            "type": "email",
+            "date": "N/A",
+            "content_summary": "Email communication analysis",
+            "status": "churned"
+        }
+    ],
+    "insights": [
+        {
+            "category": "Analysis Status",
+            "insight": "Email analysis was requested but encountered processing challenges. The system attempted to analyze the provided email communications. Manual review of the email content may be needed for detailed insights."
+        }
+    ],
+    "next_move": {
+        "priority": "medium",
+        "action": "Review email communications manually",
+        "rationale": "Automated analysis encountered issues, manual review recommended"
+    }
+}
+
+_INSIGHTS_FALLBACK_TEMPLATE: Dict[str, Any] = {
+    "activities": [
+        {
+            "type": "email",
+            "date": "N/A",
+            "content_summary": "Email $insight_type analysis",
+            "status": "churned"
+        }
+    ],
+    "insights": [
+        {
+            "category": "$insight_title Analysis",
+            "insight": "Email $insight_type analysis was requested but encountered processing challenges. The system attempted to analyze the provided email communications for $insight_type insights. Manual review of the email content may be needed for detailed $insight_type assessment."
+        }
+    ],
+    "next_move": {
+        "priority": "medium",
+        "action": "Review email communications for $insight_type insights",
+        "rationale": "Automated $insight_type analysis encountered issues, manual review recommended"
+    }
+}
+
+
+# Insights fallback rendered once per insight type; callers must deepcopy it before mutating
+_insights_fallback = insights_fallback_renderer(_INSIGHTS_FALLBACK_TEMPLATE)
+
+
+# Prompt size limits: only the most recent emails are listed in full, and their
+# content is cut shorter once the older tail has been summarized away
+MAX_EMAILS_IN_PROMPT = int(os.getenv("EMAIL_AGENT_MAX_EMAILS_IN_PROMPT", "20"))
+FULL_CONTENT_CHARS = 200
+TRIMMED_CONTENT_CHARS = 120
+
+# Interaction types (case-insensitive) that count as emails
+_EMAIL_TYPES = frozenset({'email', 'follow-up email', 'email follow-up'})
+
+# Interaction lists at least this long are filtered with pandas instead of a Python loop
+PANDAS_PARTITION_THRESHOLD = int(os.getenv("EMAIL_AGENT_PANDAS_THRESHOLD", "5000"))
+_FRAME_COLUMNS = ['customer_id', 'type', 'employee_id', 'created_at']
+
+# Limits for packing several clients into one analyze_email_communications_many request
+BATCH_MAX_CLIENTS = int(os.getenv("EMAIL_AGENT_BATCH_MAX_CLIENTS", "3"))
+BATCH_MAX_PROMPT_TOKENS = int(os.getenv("EMAIL_AGENT_BATCH_MAX_PROMPT_TOKENS", "12000"))
+# The combined answer must fit in one completion: each client costs its insights and next move
+# plus one activity entry per email listed in its prompt, with headroom left below the cap
+BATCH_OUTPUT_TOKENS_PER_CLIENT = 300
+BATCH_OUTPUT_TOKENS_PER_EMAIL = 40
+BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("EMAIL_AGENT_BATCH_MAX_OUTPUT_TOKENS", str(COMPLETION_MAX_TOKENS * 4 // 5)))
+
+# Status markers used in the formatted email details
+_STATUS_EMOJI: Dict[str, str] = {"active": "🟢", "inactive": "🟡", "churned": "🔴"}
+
+# Proactive provider quota limits for the async EmailAgent methods (0 disables a limit)
+_rate_limiter = AsyncLeakyBucket(
+    rpm=int(os.getenv("EMAIL_AGENT_RPM", "500")),
+    tpm=int(os.getenv("EMAIL_AGENT_TPM", "150000"))
+)
+
+# LLM responses keyed on (model, request kind, client, focus, email set); repeat dashboard
+# loads for a client whose emails have not changed skip the LLM roundtrip entirely
+_response_cache = ResponseCache(
+    maxsize=int(os.getenv("EMAIL_AGENT_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("EMAIL_AGENT_CACHE_TTL", "3600"))
+)
+_get_cached_response = _response_cache.get
+_set_cached_response = _response_cache.set
+
+
+def _is_email(interaction: Dict[str, Any]) -> bool:
+    """Whether an interaction record is an email"""
+    interaction_type = interaction.get('type')
+    return bool(interaction_type) and interaction_type.casefold() in _EMAIL_TYPES
+
+
+@lru_cache(maxsize=8192)
+def _parse_iso(date_string: str) -> datetime:
+    """Parse an ISO timestamp (accepting a trailing 'Z'); cached since the same dates recur across calls"""
+    return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+
+
+@lru_cache(maxsize=4096)
+def _format_date_cached(date_value: Any, tzinfo: Any = None) -> str:
+    """
+    Format a non-empty date value as YYYY-MM-DD; memoized since the same timestamps recur
+
+    Aware datetimes for the same instant compare (and hash) equal whatever their zone, so
+    callers pass the value's tzinfo as part of the cache key; it is not used otherwise.
+    """
+    try:
+        if isinstance(date_value, str):
+            # It's already a string, take first 10 chars for YYYY-MM-DD format
+            return date_value[:10]
+        elif hasattr(date_value, 'strftime'):
+            # It's a datetime object
+            return date_value.strftime('%Y-%m-%d')
+        else:
+            # Convert to string and take first 10 chars
+            return str(date_value)[:10]
+    except Exception:
+        return "N/A"
+
+
+# Bulk activity classification works on int64 epoch microseconds (Numba has no datetime
+# objects); codes index into _ACTIVITY_STATUSES and _MISSING_TIMESTAMP marks unusable dates
+_ACTIVITY_STATUSES = ("active", "inactive", "churned")
+_ACTIVE_WINDOW_US = 7 * 86400 * 10**6
+_MISSING_TIMESTAMP = -2**63
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+
+
+def _epoch_micros(value: Any, now: datetime) -> int:
+    """
+    Convert an interaction date to epoch microseconds comparable with now
+
+    Returns _MISSING_TIMESTAMP wherever _determine_activity_status would report 'churned':
+    empty or unparsable dates, and dates whose timezone awareness differs from now.
+    """
+    try:
+        if not value:
+            return _MISSING_TIMESTAMP
+        interaction_dt = _parse_iso(value) if isinstance(value, str) else value
+        if (interaction_dt.tzinfo is None) != (now.tzinfo is None):
+            return _MISSING_TIMESTAMP
+        epoch = _EPOCH if interaction_dt.tzinfo is None else _EPOCH_UTC
+        return (interaction_dt - epoch) // timedelta(microseconds=1)
+    except Exception:
+        return _MISSING_TIMESTAMP
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _classify_activity_codes(timestamps, now, window, missing):
+        """Activity code per timestamp: 0 active, 1 inactive, 2 churned"""
+        codes = np.empty(timestamps.shape, np.int8)
+        for i in prange(timestamps.shape[0]):
+            if timestamps[i] == missing:
+                codes[i] = 2
+            elif now - timestamps[i] < window:
+                codes[i] = 0
+            else:
+                codes[i] = 1
+        return codes
+
+
+class ClientEmailPartition(NamedTuple):
+    """Single-pass view of one client's email interactions"""
+    has_interactions: bool
+    emails: List[Dict[str, Any]]          # input order
+    recent_emails: List[Dict[str, Any]]   # up to MAX_EMAILS_IN_PROMPT, most recent first
+    recent_statuses: List[str]            # activity status of each recent email
+    active_count: int
+    most_recent: Optional[Dict[str, Any]]  # most recent email matching the employee filter
+    oldest_date: Any
+    older_newest_date: Any                # newest date among emails beyond recent_emails
+    now: datetime
+
 
 class EmailAgent:
     """
@@ -99,12 +428,28 @@ class EmailAgent:
 
         return self.model_factory.generate_content(prompt, system_message)
 
-    def _determine_activity_status(self, interaction_date: str) -> str:
+    async def _agenerate_content(self, prompt: str, system_message: str = None) -> str:
+        """
+        Async variant of _generate_content, bounded by the EMAIL_AGENT_RPM / EMAIL_AGENT_TPM
+        rate limits and the in-flight limit shared with the other agents (see _llm_limiter)
+
+        Args:
+            prompt: The user prompt
+            system_message: Optional system message for better context
+        """
+        if system_message is None:
+            system_message = "You are an expert email communication analyst with expertise in analyzing email patterns, extracting key insights, and providing actionable recommendations. You must follow the specified JSON output format exactly, including Activities/Insights/Next Move structure with proper formatting."
+
+        async with _rate_limiter.reserve(estimate_tokens(prompt, system_message)):
+            return await get_llm_inflight_limiter().submit(self.model_factory, prompt, system_message)
+
+    def _determine_activity_status(self, interaction_date: str, now: datetime = None) -> str:
         """
         Determine activity status based on interaction timestamp
         
         Args:
             interaction_date: ISO format date string
+            now: Reference time (defaults to datetime.now(); pass it in when classifying many rows)
             
         Returns:
             Status: 'active' if <7 days, 'inactive' if >7 days, 'churned' if no interactions
@@ -115,12 +460,12 @@ class EmailAgent:
             
             # Parse the date
             if isinstance(interaction_date, str):
-                interaction_dt = datetime.fromisoformat(interaction_date.replace('Z', '+00:00'))
+                interaction_dt = _parse_iso(interaction_date)
             else:
                 interaction_dt = interaction_date
             
             # Calculate days since interaction
-            days_since = (datetime.now() - interaction_dt).days
+            days_since = ((now or datetime.now()) - interaction_dt).days
             
             if days_since < 7:
                 return "active"
@@ -130,6 +475,30 @@ class EmailAgent:
         except Exception:
             return "churned"
 
+    def _classify_activity_statuses(self, interaction_dates: List[Any], now: datetime = None) -> List[str]:
+        """
+        Determine the activity status of many interaction dates at once
+
+        Uses a compiled Numba kernel over epoch microseconds when Numba is installed and
+        falls back to _determine_activity_status per date otherwise; both give the same result.
+
+        Args:
+            interaction_dates: ISO date strings or datetime objects
+            now: Reference time (defaults to datetime.now())
+
+        Returns:
+            Status for each date, in input order
+        """
+        now = now or datetime.now()
+
+        if not NUMBA_AVAILABLE:
+            return [self._determine_activity_status(interaction_date, now) for interaction_date in interaction_dates]
+
+        timestamps = np.fromiter((_epoch_micros(interaction_date, now) for interaction_date in interaction_dates),
+                                 dtype=np.int64, count=len(interaction_dates))
+        codes = _classify_activity_codes(timestamps, _epoch_micros(now, now), _ACTIVE_WINDOW_US, _MISSING_TIMESTAMP)
+        return [_ACTIVITY_STATUSES[code] for code in codes]
+
     def _format_date_safely(self, date_value) -> str:
         """
         Safely format a date value that could be a datetime object or string.
@@ -144,17 +513,148 @@ class EmailAgent:
             return "N/A"
 
         try:
-            if hasattr(date_value, 'strftime'):
-                # It's a datetime object
-                return date_value.strftime('%Y-%m-%d')
-            elif isinstance(date_value, str):
-                # It's already a string, take first 10 chars for YYYY-MM-DD format
-                return date_value[:10]
-            else:
-                # Convert to string and take first 10 chars
-                return str(date_value)[:10]
-        except Exception:
-            return "N/A"
+            return _format_date_cached(date_value, getattr(date_value, 'tzinfo', None))
+        except TypeError:
+            # Unhashable value; format it without the cache
+            return _format_date_cached.__wrapped__(date_value)
+
+    def _partition_client_emails(self,
+                                 interactions_data: List[Dict[str, Any]],
+                                 client_id: int = None,
+                                 employee_id: int = None,
+                                 now: datetime = None,
+                                 frame: Optional["pd.DataFrame"] = None) -> ClientEmailPartition:
+        """
+        Collect a client's email interactions, activity counts and most recent emails in one pass
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Client ID to filter by (None keeps every client)
+            employee_id: Employee ID the most recent email must belong to (None for any employee)
+            now: Reference time for activity status (defaults to datetime.now())
+            frame: Prebuilt _interaction_frame of interactions_data (built here when needed)
+
+        Returns:
+            ClientEmailPartition for the client
+        """
+        now = now or datetime.now()
+
+        if frame is None:
+            frame = self._interaction_frame(interactions_data)
+        if frame is not None:
+            return self._partition_client_emails_frame(interactions_data, frame, client_id, employee_id, now)
+
+        has_interactions = False
+        emails = []
+        active_count = 0
+        most_recent = None
+        oldest_date = None
+
+        for interaction in interactions_data:
+            if client_id is not None and interaction.get('customer_id') != client_id:
+                continue
+            has_interactions = True
+
+            if not _is_email(interaction):
+                continue
+            emails.append(interaction)
+
+            created_at = interaction.get('created_at', '')
+            if oldest_date is None or created_at < oldest_date:
+                oldest_date = created_at
+            if self._determine_activity_status(interaction.get('created_at'), now) == 'active':
+                active_count += 1
+
+            if employee_id is None or interaction.get('employee_id') == employee_id:
+                if most_recent is None or created_at > most_recent.get('created_at', ''):
+                    most_recent = interaction
+
+        # Top-K selection instead of sorting every email; one extra to date the trimmed tail
+        top_emails = heapq.nlargest(MAX_EMAILS_IN_PROMPT + 1, emails, key=lambda x: x.get('created_at', ''))
+        recent_emails = top_emails[:MAX_EMAILS_IN_PROMPT]
+        older_newest_date = top_emails[MAX_EMAILS_IN_PROMPT].get('created_at', 'N/A') if len(top_emails) > MAX_EMAILS_IN_PROMPT else None
+
+        return ClientEmailPartition(
+            has_interactions=has_interactions,
+            emails=emails,
+            recent_emails=recent_emails,
+            recent_statuses=[self._determine_activity_status(email.get('created_at'), now) for email in recent_emails],
+            active_count=active_count,
+            most_recent=most_recent,
+            oldest_date=oldest_date,
+            older_newest_date=older_newest_date,
+            now=now
+        )
+
+    @staticmethod
+    def _interaction_frame(interactions_data: List[Dict[str, Any]]) -> Optional["pd.DataFrame"]:
+        """
+        Build a DataFrame of the columns the vectorized partition filters on
+
+        Callers that partition the same list once per client (analyze_batch,
+        analyze_email_communications_many) build it once and pass it down.
+
+        Args:
+            interactions_data: List of interaction records
+
+        Returns:
+            DataFrame whose index matches positions in interactions_data, or None when pandas is
+            unavailable or the list is below PANDAS_PARTITION_THRESHOLD
+        """
+        if not PANDAS_AVAILABLE or len(interactions_data) < PANDAS_PARTITION_THRESHOLD:
+            return None
+        return pd.DataFrame.from_records(interactions_data, columns=_FRAME_COLUMNS)
+
+    def _partition_client_emails_frame(self,
+                                       interactions_data: List[Dict[str, Any]],
+                                       frame: "pd.DataFrame",
+                                       client_id: Optional[int],
+                                       employee_id: Optional[int],
+                                       now: datetime) -> ClientEmailPartition:
+        """
+        Vectorized equivalent of _partition_client_emails for very large interaction lists
+
+        Args:
+            interactions_data: List of interaction records
+            frame: _interaction_frame of interactions_data
+            client_id: Client ID to filter by (None keeps every client)
+            employee_id: Employee ID the most recent email must belong to (None for any employee)
+            now: Reference time for activity status
+
+        Returns:
+            ClientEmailPartition for the client
+        """
+        client_mask = frame['customer_id'] == client_id if client_id is not None else pd.Series(True, index=frame.index)
+        email_mask = client_mask & frame['type'].astype(str).str.casefold().isin(_EMAIL_TYPES)
+
+        email_frame = frame.loc[email_mask]
+        created = email_frame['created_at'].where(email_frame['created_at'].notna(), '')
+
+        # Stable descending sort keeps input order among equal dates, matching heapq.nlargest
+        order = created.sort_values(ascending=False, kind='stable').index
+        top_index = order[:MAX_EMAILS_IN_PROMPT + 1]
+
+        if employee_id is None:
+            most_recent_index = order[:1]
+        else:
+            most_recent_index = order[(email_frame.loc[order, 'employee_id'] == employee_id).to_numpy()][:1]
+
+        emails = [interactions_data[i] for i in email_frame.index]
+        top_emails = [interactions_data[i] for i in top_index]
+        recent_emails = top_emails[:MAX_EMAILS_IN_PROMPT]
+        statuses = self._classify_activity_statuses([email.get('created_at') for email in emails], now)
+
+        return ClientEmailPartition(
+            has_interactions=bool(client_mask.any()),
+            emails=emails,
+            recent_emails=recent_emails,
+            recent_statuses=[self._determine_activity_status(email.get('created_at'), now) for email in recent_emails],
+            active_count=statuses.count('active'),
+            most_recent=interactions_data[most_recent_index[0]] if len(most_recent_index) else None,
+            oldest_date=created.min() if len(created) else None,
+            older_newest_date=top_emails[MAX_EMAILS_IN_PROMPT].get('created_at', 'N/A') if len(top_emails) > MAX_EMAILS_IN_PROMPT else None,
+            now=now
+        )
 
     def format_email_interactions_for_analysis(self,
                                              interactions_data: List[Dict[str, Any]], 
@@ -172,54 +672,60 @@ class EmailAgent:
         if not interactions_data:
             return "No email interaction data available for analysis."
 
-        # Filter for email interactions only
-        email_interactions = [
-            interaction for interaction in interactions_data 
-            if interaction.get('type', '').lower() in ['email', 'follow-up email', 'email follow-up']
-        ]
+        return self._format_email_partition(self._partition_client_emails(interactions_data), context)
 
-        if not email_interactions:
-            return "No email interactions found in the provided data."
+    def _format_email_partition(self, partition: ClientEmailPartition, context: str) -> str:
+        """
+        Format an already partitioned set of email interactions for LLM analysis
+
+        Args:
+            partition: Output of _partition_client_emails
+            context: Analysis context
 
-        # Build formatted output
-        formatted_data = f"=== EMAIL ANALYSIS CONTEXT: {context.upper()} ===\n"
+        Returns:
+            Formatted string ready for LLM processing
+        """
+        recent_emails = partition.recent_emails
 
-        # Calculate summary statistics
-        total_emails = len(email_interactions)
-        recent_emails = len([e for e in email_interactions if self._determine_activity_status(e.get('created_at')) == 'active'])
+        if not recent_emails:
+            return "No email interactions found in the provided data."
 
-        # Get client information if available
-        client_id = email_interactions[0].get('customer_id') if email_interactions else 'N/A'
+        # Build formatted output as a list of parts joined once at the end
+        parts = [f"=== EMAIL ANALYSIS CONTEXT: {context.upper()} ===\n"]
 
-        formatted_data += f"""
+        parts.append(f"""
 === CURRENT CLIENT EMAIL INTERACTION SUMMARY ===
-Client ID: {client_id}
-Total Email Interactions: {total_emails}
-Recent Email Activity (last 7 days): {recent_emails}
-Analysis Period: {email_interactions[0].get('created_at', 'N/A')} to {email_interactions[-1].get('created_at', 'N/A')}
+Client ID: {recent_emails[0].get('customer_id')}
+Total Email Interactions: {len(partition.emails)}
+Recent Email Activity (last 7 days): {partition.active_count}
+Analysis Period: {partition.oldest_date or 'N/A'} to {recent_emails[0].get('created_at', 'N/A')}
 Focus: Single client email communication analysis
-"""
+""")
 
-        formatted_data += "\n=== EMAIL INTERACTION DETAILS ===\n"
-        
-        # Sort emails by date (most recent first)
-        sorted_emails = sorted(email_interactions, key=lambda x: x.get('created_at', ''), reverse=True)
+        parts.append("\n=== EMAIL INTERACTION DETAILS ===\n")
+
+        # Only the most recent emails go into the prompt in full; older ones are summarized in one line
+        older_count = len(partition.emails) - len(recent_emails)
+        content_limit = TRIMMED_CONTENT_CHARS if older_count else FULL_CONTENT_CHARS
         
-        for i, email in enumerate(sorted_emails, 1):
-            status = self._determine_activity_status(email.get('created_at'))
-            status_emoji = "🟢" if status == "active" else "🟡" if status == "inactive" else "🔴"
+        for i, (email, status) in enumerate(zip(recent_emails, partition.recent_statuses), 1):
+            status_emoji = _STATUS_EMOJI.get(status, "🔴")
+            content = email.get('content', 'No content available')
             
-            formatted_data += f"""
+            parts.append(f"""
 Email #{i}: {email.get('type', 'Email')} {status_emoji}
   Date: {email.get('created_at', 'N/A')}
   Employee ID: {email.get('employee_id', 'N/A')}
   Customer ID: {email.get('customer_id', 'N/A')}
-  Content: {email.get('content', 'No content available')[:200]}{'...' if len(email.get('content', '')) > 200 else ''}
+  Content: {content[:content_limit]}{'...' if len(content) > content_limit else ''}
   Duration: {email.get('duration_minutes', 0)} minutes
   Status: {status}
-"""
+""")
 
-        return formatted_data
+        if older_count:
+            parts.append(f"\n... and {older_count} older emails from {partition.oldest_date or 'N/A'} to {partition.older_newest_date} ...\n")
+
+        return "".join(parts)
 
     def _get_most_recent_email_summary(self,
                                      interactions_data: List[Dict[str, Any]],
@@ -236,34 +742,34 @@ Email #{i}: {email.get('type', 'Email')} {status_emoji}
         Returns:
             Dictionary with most recent email summary information
         """
-        # Filter for email interactions
-        email_interactions = [
-            interaction for interaction in interactions_data
-            if interaction.get('type', '').lower() in ['email', 'follow-up email', 'email follow-up']
-        ]
+        partition = self._partition_client_emails(interactions_data, client_id, employee_id)
+        return self._summarize_recent_email(partition)
+
+    def _summarize_recent_email(self, partition: ClientEmailPartition) -> Dict[str, Any]:
+        """
+        Build the recent email summary from a partition's most recent email
+
+        Args:
+            partition: Output of _partition_client_emails
 
-        # Further filter by employee and client if specified
-        if employee_id is not None:
-            email_interactions = [e for e in email_interactions if e.get('employee_id') == employee_id]
-        if client_id is not None:
-            email_interactions = [e for e in email_interactions if e.get('customer_id') == client_id]
+        Returns:
+            Dictionary with most recent email summary information
+        """
+        most_recent = partition.most_recent
 
-        if not email_interactions:
+        if most_recent is None:
             return {
                 "has_recent_email": False,
                 "message": "No email interactions found for the specified criteria"
             }
 
-        # Sort by date to get the most recent
-        sorted_emails = sorted(email_interactions, key=lambda x: x.get('created_at', ''), reverse=True)
-        most_recent = sorted_emails[0]
-
         # Generate summary of the most recent email
         content = most_recent.get('content', '')
         content_preview = content[:150] + "..." if len(content) > 150 else content
 
         return {
             "has_recent_email": True,
+            # Formatted once here; the result builders use this string as-is
             "email_date": self._format_date_safely(most_recent.get('created_at', '')),
             "employee_id": most_recent.get('employee_id'),
             "client_id": most_recent.get('customer_id'),
@@ -271,223 +777,83 @@ Email #{i}: {email.get('type', 'Email')} {status_emoji}
             "content_preview": content_preview,
             "full_content": content,
             "duration_minutes": most_recent.get('duration_minutes', 0),
-            "status": self._determine_activity_status(most_recent.get('created_at')),
+            "status": self._determine_activity_status(most_recent.get('created_at'), partition.now),
             "gmail_message_id": most_recent.get('gmail_message_id', '')
         }
 
-    def analyze_email_communications(self,
-                                   interactions_data: List[Dict[str, Any]],
-                                   client_id: int,
-                                   analysis_focus: str = "comprehensive",
-                                   employee_id: int = None) -> Dict[str, Any]:
+    def _response_cache_key(self, kind: str, client_id: int, focus: str, emails: List[Dict[str, Any]]) -> str:
         """
-        Analyze email communications for a specific current client with structured JSON output format
+        Build the response cache key from the inputs that shape the prompt
 
         Args:
-            interactions_data: List of interaction records
-            client_id: Current client ID to focus analysis on (REQUIRED)
-            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
-            employee_id: Optional specific employee ID to filter by
+            kind: Request kind ("analysis" or "insights")
+            client_id: Client being analyzed
+            focus: Analysis focus or insight type
+            emails: The client's email interactions
 
         Returns:
-            Structured JSON with Activities/Insights/Next Move format focused on the current client
+            Cache key string
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
-        logger.info(f"🔍 EmailAgent [Customer {client_id}]: Starting email communications analysis")
-        logger.info(f"📊 EmailAgent [Customer {client_id}]: Received {len(interactions_data)} total interactions")
-        logger.info(f"🎯 EmailAgent [Customer {client_id}]: Analysis focus: {analysis_focus}, Employee filter: {employee_id}")
+        email_ids = sorted(f"{email.get('gmail_message_id') or ''}|{email.get('created_at', '')}" for email in emails)
+        signature = hashlib.blake2b(",".join(email_ids).encode(), digest_size=16).hexdigest()
+        return f"email_agent:{self.model_name}:{kind}:{client_id}:{focus}:{signature}"
 
-        # Filter interactions for the current client only
-        client_interactions = [
-            interaction for interaction in interactions_data
-            if interaction.get('customer_id') == client_id
-        ]
+    def _parse_llm_json(self, response: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse an LLM response as a JSON object, stripping markdown code fences only if needed
 
-        if not client_interactions:
-            logger.warning(f"⚠️ EmailAgent [Customer {client_id}]: No interactions found for this client")
-            return {
-                "error": f"No interactions found for client_id {client_id}",
-                "client_id": client_id
-            }
+        Args:
+            response: Raw LLM response text
 
-        formatted_data = self.format_email_interactions_for_analysis(client_interactions, context=f"email_communication_analysis_for_client_{client_id}")
+        Returns:
+            Parsed JSON object, or None if the response is not a valid JSON object
+        """
+        try:
+            # Most responses are bare JSON; the parser skips surrounding whitespace itself
+            result = _jsonlib.loads(response)
+        except _jsonlib.JSONDecodeError:
+            try:
+                result = _jsonlib.loads(FENCE_RE.sub('', response))
+            except _jsonlib.JSONDecodeError:
+                return None
+
+        return result if isinstance(result, dict) else None
+
+    def _prepare_communications_analysis(self,
+                                         interactions_data: List[Dict[str, Any]],
+                                         client_id: int,
+                                         analysis_focus: str,
+                                         employee_id: int = None,
+                                         no_cache: bool = False,
+                                         frame: Optional["pd.DataFrame"] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build the prompt and per-client context for analyze_email_communications
 
-        # Filter email interactions for activities section (current client only)
-        email_interactions = [
-            interaction for interaction in client_interactions
-            if interaction.get('type', '').lower() in ['email', 'follow-up email', 'email follow-up']
-        ]
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache for this request
+            frame: Prebuilt _interaction_frame of interactions_data, shared across clients
 
-        # Get most recent email summary for current client
-        recent_email_summary = self._get_most_recent_email_summary(client_interactions, employee_id, client_id)
+        Returns:
+            Dictionary with prompt, system_message, cache_key, formatted_data, email_interactions and
+            recent_email_summary, or None if the client has no interactions
+        """
+        # Single pass over the interactions for the current client only
+        partition = self._partition_client_emails(interactions_data, client_id, employee_id, frame=frame)
 
-        focus_prompts = {
-            "comprehensive": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Communication Patterns",
-      "insight": "Three sentence insight about communication patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Content Analysis",
-      "insight": "Three sentence insight about email content themes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Relationship Health",
-      "insight": "Three sentence insight about relationship status. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_email_summary": {
-    "has_recent_email": true/false,
-    "email_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "email_type": "Email/Follow-up Email",
-    "content_preview": "First 150 characters of email content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent email"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Specific recommended action",
-    "rationale": "Why this action is recommended"
-  }
-}""",
+        if not partition.has_interactions:
+            return None
 
-            "sentiment": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Sentiment Analysis",
-      "insight": "Three sentence insight about overall sentiment trends. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Tone Evolution",
-      "insight": "Three sentence insight about how tone has changed over time. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Emotional Indicators",
-      "insight": "Three sentence insight about emotional cues in communications. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_email_summary": {
-    "has_recent_email": true/false,
-    "email_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "email_type": "Email/Follow-up Email",
-    "content_preview": "First 150 characters of email content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent email"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Sentiment-based recommended action",
-    "rationale": "Why this action addresses sentiment concerns"
-  }
-}""",
+        formatted_data = self._format_email_partition(partition, context=f"email_communication_analysis_for_client_{client_id}")
 
-            "patterns": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Communication Frequency",
-      "insight": "Three sentence insight about email frequency patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Response Patterns",
-      "insight": "Three sentence insight about response time and engagement patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Topic Trends",
-      "insight": "Three sentence insight about recurring topics and themes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_email_summary": {
-    "has_recent_email": true/false,
-    "email_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "email_type": "Email/Follow-up Email",
-    "content_preview": "First 150 characters of email content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent email"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Pattern-based recommended action",
-    "rationale": "Why this action leverages identified patterns"
-  }
-}""",
+        # Email interactions for activities section (current client only, in input order)
+        email_interactions = partition.emails
 
-            "actions": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Action Items Identified",
-      "insight": "Three sentence insight about action items mentioned in emails. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Follow-up Requirements",
-      "insight": "Three sentence insight about follow-up needs and commitments. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Priority Assessment",
-      "insight": "Three sentence insight about priority levels of different actions. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_email_summary": {
-    "has_recent_email": true/false,
-    "email_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "email_type": "Email/Follow-up Email",
-    "content_preview": "First 150 characters of email content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent email"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Action-focused recommended next step",
-    "rationale": "Why this action addresses the most critical needs"
-  }
-}"""
-        }
+        # Get most recent email summary for current client
+        recent_email_summary = self._summarize_recent_email(partition)
 
         system_message = f"""You are an expert email communication analyst. You MUST return valid JSON in the exact format specified.
 
@@ -503,7 +869,7 @@ Focus on {analysis_focus} analysis of the email communications."""
 
 {formatted_data}
 
-{focus_prompts.get(analysis_focus, focus_prompts['comprehensive'])}
+{_FOCUS_PROMPTS.get(analysis_focus, _FOCUS_PROMPTS['comprehensive'])}
 
 IMPORTANT:
 - Return ONLY valid JSON in the specified format
@@ -511,103 +877,548 @@ IMPORTANT:
 - Use actual dates and content from the email data
 - Determine activity status based on interaction timestamps"""
 
-        response = self._generate_content(prompt, system_message)
+        return {
+            "prompt": prompt,
+            "system_message": system_message,
+            "cache_key": None if no_cache else self._response_cache_key("analysis", client_id, analysis_focus, email_interactions),
+            "formatted_data": formatted_data,
+            "email_interactions": email_interactions,
+            "recent_email_count": len(partition.recent_emails),
+            "recent_email_summary": recent_email_summary
+        }
 
-        try:
-            # Clean the response to extract JSON
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
-
-            result = json.loads(response_clean)
-
-            # Add recent email summary to the result
-            if recent_email_summary['has_recent_email']:
-                # Handle datetime formatting properly
-                email_date = recent_email_summary['email_date']
-                if email_date:
-                    if hasattr(email_date, 'strftime'):
-                        # It's a datetime object
-                        formatted_date = email_date.strftime('%Y-%m-%d')
-                    elif isinstance(email_date, str):
-                        # It's already a string, take first 10 chars
-                        formatted_date = email_date[:10]
-                    else:
-                        formatted_date = str(email_date)[:10]
-                else:
-                    formatted_date = "N/A"
-
-                result['recent_email_summary'] = {
-                    "has_recent_email": True,
-                    "email_date": formatted_date,
-                    "employee_id": recent_email_summary['employee_id'],
-                    "client_id": recent_email_summary['client_id'],
-                    "email_type": recent_email_summary['email_type'],
-                    "content_preview": recent_email_summary['content_preview'],
-                    "status": recent_email_summary['status'],
-                    "key_points": f"Most recent email from {formatted_date}: {recent_email_summary['content_preview']}"
-                }
-            else:
-                result['recent_email_summary'] = {
-                    "has_recent_email": False,
-                    "message": recent_email_summary.get('message', 'No recent email found')
-                }
+    def _finalize_communications_analysis(self, response: str, prepared: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse the LLM response and turn it into the structured result, caching responses that parse
 
-            return result
-
-        except json.JSONDecodeError:
-            # Fallback structured response if JSON parsing fails
-            fallback_result = {
-                "activities": [
-                    {
-                        "type": "email",
-                        "date": self._format_date_safely(email.get('created_at', '')) if email_interactions else "N/A",
-                        "content_summary": "Email communication analysis",
-                        "status": self._determine_activity_status(email_interactions[0].get('created_at') if email_interactions else None)
-                    }
-                ],
-                "insights": [
-                    {
-                        "category": "Analysis Status",
-                        "insight": "Email analysis was requested but encountered processing challenges. The system attempted to analyze the provided email communications. Manual review of the email content may be needed for detailed insights."
-                    }
-                ],
-                "next_move": {
-                    "priority": "medium",
-                    "action": "Review email communications manually",
-                    "rationale": "Automated analysis encountered issues, manual review recommended"
-                }
-            }
+        Args:
+            response: Raw LLM response text
+            prepared: Output of _prepare_communications_analysis
 
-            # Add recent email summary to fallback result
-            if recent_email_summary['has_recent_email']:
-                formatted_date = self._format_date_safely(recent_email_summary['email_date'])
-                fallback_result['recent_email_summary'] = {
-                    "has_recent_email": True,
-                    "email_date": formatted_date,
-                    "employee_id": recent_email_summary['employee_id'],
-                    "client_id": recent_email_summary['client_id'],
-                    "email_type": recent_email_summary['email_type'],
-                    "content_preview": recent_email_summary['content_preview'],
-                    "status": recent_email_summary['status'],
-                    "key_points": f"Most recent email from {formatted_date}: {recent_email_summary['content_preview']}"
-                }
-            else:
-                fallback_result['recent_email_summary'] = {
-                    "has_recent_email": False,
-                    "message": recent_email_summary.get('message', 'No recent email found')
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format
+        """
+        result = self._parse_llm_json(response)
+        if result is not None:
+            _set_cached_response(prepared['cache_key'], response)
+
+        return self._build_communications_result(result, prepared)
+
+    def _build_recent_email_summary(self, recent_email_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the recent_email_summary field of an analysis or insights result
+
+        Args:
+            recent_email_summary: Output of _summarize_recent_email
+
+        Returns:
+            Summary dictionary for the result
+        """
+        if not recent_email_summary['has_recent_email']:
+            return {
+                "has_recent_email": False,
+                "message": recent_email_summary.get('message', 'No recent email found')
+            }
+
+        # Already formatted as YYYY-MM-DD (or "N/A") by _summarize_recent_email
+        formatted_date = recent_email_summary['email_date']
+        content_preview = recent_email_summary['content_preview']
+        return {
+            "has_recent_email": True,
+            "email_date": formatted_date,
+            "employee_id": recent_email_summary['employee_id'],
+            "client_id": recent_email_summary['client_id'],
+            "email_type": recent_email_summary['email_type'],
+            "content_preview": content_preview,
+            "status": recent_email_summary['status'],
+            "key_points": f"Most recent email from {formatted_date}: {content_preview}"
+        }
+
+    def _attach_recent_email_summary(self, result: Dict[str, Any], recent_email_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Set the recent_email_summary field of an analysis or insights result
+
+        Args:
+            result: Parsed LLM result or fallback result, updated in place
+            recent_email_summary: Output of _summarize_recent_email
+
+        Returns:
+            The same result dictionary
+        """
+        result['recent_email_summary'] = self._build_recent_email_summary(recent_email_summary)
+        return result
+
+    def _build_communications_result(self, result: Optional[Dict[str, Any]], prepared: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Attach the recent email summary to a parsed LLM result, or build the fallback result
+
+        Args:
+            result: Parsed LLM JSON object, or None if the response could not be parsed
+            prepared: Prepared request context holding email_interactions and recent_email_summary
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format
+        """
+        email_interactions = prepared['email_interactions']
+        recent_email_summary = prepared['recent_email_summary']
+
+        if result is not None:
+            return self._attach_recent_email_summary(result, recent_email_summary)
+
+        # Fallback structured response if JSON parsing fails
+        fallback_result = copy.deepcopy(_ANALYSIS_FALLBACK)
+        if email_interactions:
+            first_created_at = email_interactions[0].get('created_at')
+            fallback_activity = fallback_result['activities'][0]
+            fallback_activity['date'] = self._format_date_safely(first_created_at or '')
+            fallback_activity['status'] = self._determine_activity_status(first_created_at)
+
+        return self._attach_recent_email_summary(fallback_result, recent_email_summary)
+
+    def analyze_email_communications(self,
+                                   interactions_data: List[Dict[str, Any]],
+                                   client_id: int,
+                                   analysis_focus: str = "comprehensive",
+                                   employee_id: int = None,
+                                   no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Analyze email communications for a specific current client with structured JSON output format
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        logger.info("🔍 EmailAgent [Customer %s]: Starting email communications analysis", client_id)
+        logger.info("📊 EmailAgent [Customer %s]: Received %s total interactions", client_id, len(interactions_data))
+        logger.info("🎯 EmailAgent [Customer %s]: Analysis focus: %s, Employee filter: %s", client_id, analysis_focus, employee_id)
+
+        prepared = self._prepare_communications_analysis(interactions_data, client_id, analysis_focus, employee_id, no_cache)
+
+        if prepared is None:
+            logger.warning("⚠️ EmailAgent [Customer %s]: No interactions found for this client", client_id)
+            return {
+                "error": f"No interactions found for client_id {client_id}",
+                "client_id": client_id
+            }
+
+        if not prepared['email_interactions']:
+            return copy.deepcopy(_NO_EMAILS_RESULT)
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = self._generate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_communications_analysis(response, prepared)
+
+    async def a_analyze_email_communications(self,
+                                             interactions_data: List[Dict[str, Any]],
+                                             client_id: int,
+                                             analysis_focus: str = "comprehensive",
+                                             employee_id: int = None,
+                                             no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Async variant of analyze_email_communications for concurrent multi-client analysis
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        prepared = self._prepare_communications_analysis(interactions_data, client_id, analysis_focus, employee_id, no_cache)
+        return await self._a_complete_communications_analysis(prepared, client_id)
+
+    async def _a_complete_communications_analysis(self, prepared: Optional[Dict[str, Any]], client_id: int) -> Dict[str, Any]:
+        """
+        Answer a prepared communications analysis from the cache or the LLM
+
+        Args:
+            prepared: Output of _prepare_communications_analysis
+            client_id: Current client ID
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        if prepared is None:
+            return {
+                "error": f"No interactions found for client_id {client_id}",
+                "client_id": client_id
+            }
+
+        if not prepared['email_interactions']:
+            return copy.deepcopy(_NO_EMAILS_RESULT)
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = await self._agenerate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_communications_analysis(response, prepared)
+
+    async def a_stream_email_communications(self,
+                                            interactions_data: List[Dict[str, Any]],
+                                            client_id: int,
+                                            analysis_focus: str = "comprehensive",
+                                            employee_id: int = None,
+                                            no_cache: bool = False) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of analyze_email_communications
+
+        Activities are emitted as soon as each one has been generated, while the model is
+        still writing the insights; the complete structured result follows last.
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Yields:
+            ("activity", activity) for each activity, then ("result", full structured result);
+            if the provider fails mid-stream, ("error", details) replaces the result
+        """
+        prepared = self._prepare_communications_analysis(interactions_data, client_id, analysis_focus, employee_id, no_cache)
+
+        if prepared is None:
+            yield "result", {
+                "error": f"No interactions found for client_id {client_id}",
+                "client_id": client_id
+            }
+            return
+
+        if not prepared['email_interactions']:
+            yield "result", copy.deepcopy(_NO_EMAILS_RESULT)
+            return
+
+        response = _get_cached_response(prepared['cache_key'])
+
+        if response is None:
+            parser = _jsonlib.ArrayItemStream('activities')
+            stream = get_llm_inflight_limiter().stream(
+                self.model_factory, prepared['prompt'], prepared['system_message'],
+                reservation=_rate_limiter.reserve(estimate_tokens(prepared['prompt'], prepared['system_message']))
+            )
+            try:
+                async for chunk in stream:
+                    for activity in parser.feed(chunk):
+                        yield "activity", activity
+            except Exception as e:
+                yield "error", {"error": f"Error generating content with {self.provider}: {e}", "client_id": client_id}
+                return
+            yield "result", self._finalize_communications_analysis(parser.text, prepared)
+            return
+
+        result = self._finalize_communications_analysis(response, prepared)
+        for activity in result.get('activities') or []:
+            yield "activity", activity
+        yield "result", result
+
+    async def analyze_batch(self,
+                            interactions_data: List[Dict[str, Any]],
+                            client_ids: List[int],
+                            analysis_focus: str = "comprehensive",
+                            employee_id: int = None,
+                            no_cache: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze email communications for many clients concurrently
+
+        Args:
+            interactions_data: List of interaction records covering all requested clients
+            client_ids: Client IDs to analyze
+            analysis_focus: Focus area applied to every client
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Dictionary mapping each client ID to its analysis result
+        """
+        # Every client is partitioned from the same list, so the DataFrame is built once
+        frame = self._interaction_frame(interactions_data)
+        results = await asyncio.gather(*[
+            self._a_complete_communications_analysis(
+                self._prepare_communications_analysis(interactions_data, client_id, analysis_focus, employee_id, no_cache, frame),
+                client_id
+            )
+            for client_id in client_ids
+        ])
+        return dict(zip(client_ids, results))
+
+    def analyze_email_communications_many(self,
+                                          interactions_data: List[Dict[str, Any]],
+                                          client_ids: List[int],
+                                          analysis_focus: str = "comprehensive",
+                                          employee_id: int = None,
+                                          no_cache: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze several clients with as few LLM requests as possible
+
+        Clients are packed into shared prompts (bounded by BATCH_MAX_CLIENTS,
+        BATCH_MAX_PROMPT_TOKENS and BATCH_MAX_OUTPUT_TOKENS) that ask for one JSON object
+        keyed by client ID. Clients missing from a batch answer, or from a batch reply that
+        was truncated or unparseable, are retried individually; when the provider call
+        itself fails, its clients get the fallback result instead.
+
+        Args:
+            interactions_data: List of interaction records covering all requested clients
+            client_ids: Client IDs to analyze
+            analysis_focus: Focus area applied to every client
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Dictionary mapping each client ID to its analysis result
+        """
+        results = {}
+        pending = []
+        frame = self._interaction_frame(interactions_data)
+
+        for client_id in client_ids:
+            prepared = self._prepare_communications_analysis(interactions_data, client_id, analysis_focus, employee_id, no_cache, frame)
+
+            if prepared is None:
+                results[client_id] = {
+                    "error": f"No interactions found for client_id {client_id}",
+                    "client_id": client_id
                 }
+            elif not prepared['email_interactions']:
+                results[client_id] = copy.deepcopy(_NO_EMAILS_RESULT)
+            else:
+                cached = _get_cached_response(prepared['cache_key'])
+                if cached is not None:
+                    results[client_id] = self._finalize_communications_analysis(cached, prepared)
+                else:
+                    pending.append((client_id, prepared))
+
+        for group in self._group_batch_requests(pending):
+            prompt, system_message = self._build_batch_prompt(group, analysis_focus)
+            generation = self.model_factory.generate(prompt, system_message)
+            if generation.error is not None:
+                # The provider call itself failed (e.g. outage); retrying each client would
+                # only multiply the failing calls, so every client gets the fallback result
+                for client_id, prepared in group:
+                    results[client_id] = self._build_communications_result(None, prepared)
+                continue
+
+            batch_result = None
+            if generation.finish_reason == "length":
+                logger.warning("Batched email analysis for %s clients hit the completion cap", len(group))
+            else:
+                batch_result = self._parse_llm_json(generation.text)
+
+            for client_id, prepared in group:
+                client_result = batch_result.get(str(client_id)) if batch_result is not None else None
+
+                if isinstance(client_result, dict):
+                    _set_cached_response(prepared['cache_key'], _jsonlib.dumps(client_result))
+                    results[client_id] = self._build_communications_result(client_result, prepared)
+                else:
+                    # The batch skipped this client or its reply was unusable: ask for it alone,
+                    # reusing its prepared prompt
+                    response = self._generate_content(prepared['prompt'], prepared['system_message'])
+                    results[client_id] = self._finalize_communications_analysis(response, prepared)
 
-            return fallback_result
+        return {client_id: results[client_id] for client_id in client_ids}
+
+    def _group_batch_requests(self, pending: List[Tuple[int, Dict[str, Any]]]) -> List[List[Tuple[int, Dict[str, Any]]]]:
+        """
+        Split prepared client requests into batches bounded by client count, prompt size and
+        expected answer size
+
+        Args:
+            pending: (client_id, prepared) pairs still needing an LLM answer
+
+        Returns:
+            List of batches
+        """
+        groups = []
+        current = []
+        current_tokens = 0
+        current_output = 0
+
+        for client_id, prepared in pending:
+            tokens = estimate_tokens(prepared['formatted_data'])
+            output = BATCH_OUTPUT_TOKENS_PER_CLIENT + BATCH_OUTPUT_TOKENS_PER_EMAIL * prepared['recent_email_count']
+            if current and (len(current) >= BATCH_MAX_CLIENTS
+                            or current_tokens + tokens > BATCH_MAX_PROMPT_TOKENS
+                            or current_output + output > BATCH_MAX_OUTPUT_TOKENS):
+                groups.append(current)
+                current = []
+                current_tokens = 0
+                current_output = 0
+            current.append((client_id, prepared))
+            current_tokens += tokens
+            current_output += output
+
+        if current:
+            groups.append(current)
+        return groups
+
+    def _build_batch_prompt(self, group: List[Tuple[int, Dict[str, Any]]], analysis_focus: str) -> Tuple[str, str]:
+        """
+        Build one prompt covering every client in a batch
+
+        Args:
+            group: (client_id, prepared) pairs in the batch
+            analysis_focus: Focus area applied to every client
+
+        Returns:
+            Tuple of (prompt, system_message)
+        """
+        client_blocks = "\n\n".join(f"=== CLIENT {client_id} ===\n{prepared['formatted_data']}" for client_id, prepared in group)
+        client_keys = ", ".join(f'"{client_id}"' for client_id, _ in group)
+
+        system_message = f"""You are an expert email communication analyst. You MUST return valid JSON in the exact format specified.
+
+CRITICAL REQUIREMENTS:
+1. Each insight must contain exactly 3 sentences
+2. Activity status must be 'active' if interaction is <7 days old, 'inactive' if >7 days old, 'decline' if no recent interactions
+3. Return only valid JSON - no additional text or formatting
+4. Analyze each client separately, using only that client's email data
+
+Focus on {analysis_focus} analysis of the email communications."""
+
+        prompt = f"""Analyze the email communication data of each client below separately and return structured JSON:
+
+{client_blocks}
+
+Return ONE JSON object whose keys are the client IDs ({client_keys}) and whose values are that client's analysis in this format:
+{_FOCUS_PROMPTS.get(analysis_focus, _FOCUS_PROMPTS['comprehensive'])}
+
+IMPORTANT:
+- Return ONLY valid JSON in the specified format
+- Include every client ID listed above as a key
+- Each insight must be exactly 3 sentences
+- Use actual dates and content from the email data
+- Determine activity status based on interaction timestamps"""
+
+        return prompt, system_message
+
+    def _prepare_email_insights(self,
+                                interactions_data: List[Dict[str, Any]],
+                                client_id: int,
+                                insight_type: str,
+                                employee_id: int = None,
+                                no_cache: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Build the prompt and per-client context for generate_email_insights
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache for this request
+
+        Returns:
+            Dictionary with prompt, system_message, cache_key, email_interactions and recent_email_summary,
+            or None if the client has no interactions
+        """
+        # Single pass over the interactions for the current client only
+        partition = self._partition_client_emails(interactions_data, client_id, employee_id)
+
+        if not partition.has_interactions:
+            return None
+
+        formatted_data = self._format_email_partition(partition, context=f"email_insights_generation_for_client_{client_id}")
+
+        # Email interactions for activities section (current client only, in input order)
+        email_interactions = partition.emails
+
+        # Get most recent email summary for current client
+        recent_email_summary = self._summarize_recent_email(partition)
+
+        system_message = f"""You are an expert email communication analyst. You MUST return valid JSON in the exact format specified.
+
+CRITICAL REQUIREMENTS:
+1. Each insight must contain exactly 3 sentences
+2. Activity status must be 'active' if interaction is <7 days old, 'inactive' if >7 days old, 'decline' if no recent interactions
+3. Return only valid JSON - no additional text or formatting
+4. Use the actual email data provided to populate activities and insights
+
+Focus on {insight_type} insights from the email communications."""
+
+        prompt = f"""Generate {insight_type} insights from the following email communication data and return structured JSON:
+
+{formatted_data}
+
+{_INSIGHT_PROMPTS.get(insight_type, _INSIGHT_PROMPTS['strategic'])}
+
+IMPORTANT:
+- Return ONLY valid JSON in the specified format
+- Each insight must be exactly 3 sentences
+- Use actual dates and content from the email data
+- Determine activity status based on interaction timestamps"""
+
+        return {
+            "prompt": prompt,
+            "system_message": system_message,
+            "cache_key": None if no_cache else self._response_cache_key("insights", client_id, insight_type, email_interactions),
+            "email_interactions": email_interactions,
+            "recent_email_summary": recent_email_summary
+        }
+
+    def _finalize_email_insights(self, response: str, prepared: Dict[str, Any], insight_type: str) -> Dict[str, Any]:
+        """
+        Parse the LLM response and turn it into the structured result, caching responses that parse
+
+        Args:
+            response: Raw LLM response text
+            prepared: Output of _prepare_email_insights
+            insight_type: Type of insights requested
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format
+        """
+        result = self._parse_llm_json(response)
+        if result is not None:
+            _set_cached_response(prepared['cache_key'], response)
+
+        return self._build_insights_result(result, prepared, insight_type)
+
+    def _build_insights_result(self, result: Optional[Dict[str, Any]], prepared: Dict[str, Any], insight_type: str) -> Dict[str, Any]:
+        """
+        Attach the recent email summary to a parsed LLM result, or build the fallback result
+
+        Args:
+            result: Parsed LLM JSON object, or None if the response could not be parsed
+            prepared: Prepared request context holding email_interactions and recent_email_summary
+            insight_type: Type of insights requested
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format
+        """
+        email_interactions = prepared['email_interactions']
+        recent_email_summary = prepared['recent_email_summary']
+
+        if result is not None:
+            return self._attach_recent_email_summary(result, recent_email_summary)
+
+        # Fallback structured response if JSON parsing fails
+        fallback_result = copy.deepcopy(_insights_fallback(insight_type))
+        if email_interactions:
+            first_created_at = email_interactions[0].get('created_at')
+            fallback_activity = fallback_result['activities'][0]
+            fallback_activity['date'] = self._format_date_safely(first_created_at or '')
+            fallback_activity['status'] = self._determine_activity_status(first_created_at)
+
+        return self._attach_recent_email_summary(fallback_result, recent_email_summary)
 
     def generate_email_insights(self,
                               interactions_data: List[Dict[str, Any]],
                               client_id: int,
                               insight_type: str = "strategic",
-                              employee_id: int = None) -> Dict[str, Any]:
+                              employee_id: int = None,
+                              no_cache: bool = False) -> Dict[str, Any]:
         """
         Generate specific insights from email data for a specific current client with structured JSON output format
 
@@ -616,168 +1427,93 @@ IMPORTANT:
             client_id: Current client ID to focus analysis on (REQUIRED)
             insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
             employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
 
         Returns:
             Structured JSON with Activities/Insights/Next Move format focused on the current client
         """
-        # Filter interactions for the current client only
-        client_interactions = [
-            interaction for interaction in interactions_data
-            if interaction.get('customer_id') == client_id
-        ]
+        prepared = self._prepare_email_insights(interactions_data, client_id, insight_type, employee_id, no_cache)
 
-        if not client_interactions:
+        if prepared is None:
             return {
                 "error": f"No interactions found for client_id {client_id}",
                 "client_id": client_id
             }
 
-        formatted_data = self.format_email_interactions_for_analysis(client_interactions, context=f"email_insights_generation_for_client_{client_id}")
+        if not prepared['email_interactions']:
+            return copy.deepcopy(_NO_EMAILS_RESULT)
 
-        # Filter email interactions for activities section (current client only)
-        email_interactions = [
-            interaction for interaction in client_interactions
-            if interaction.get('type', '').lower() in ['email', 'follow-up email', 'email follow-up']
-        ]
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = self._generate_content(prepared['prompt'], prepared['system_message'])
 
-        # Get most recent email summary for current client
-        recent_email_summary = self._get_most_recent_email_summary(client_interactions, employee_id, client_id)
+        return self._finalize_email_insights(response, prepared, insight_type)
 
-        insight_prompts = {
-            "strategic": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Strategic Communication Opportunities",
-      "insight": "Three sentence insight about strategic opportunities identified in email communications. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Relationship Development",
-      "insight": "Three sentence insight about relationship building through email interactions. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Business Impact Assessment",
-      "insight": "Three sentence insight about business impact of email communications. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_email_summary": {
-    "has_recent_email": true/false,
-    "email_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "email_type": "Email/Follow-up Email",
-    "content_preview": "First 150 characters of email content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent email"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Strategic action based on email analysis",
-    "rationale": "Strategic reasoning for recommended action"
-  }
-}""",
+    async def a_generate_email_insights(self,
+                                        interactions_data: List[Dict[str, Any]],
+                                        client_id: int,
+                                        insight_type: str = "strategic",
+                                        employee_id: int = None,
+                                        no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Async variant of generate_email_insights for concurrent multi-client analysis
 
-            "tactical": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Immediate Action Items",
-      "insight": "Three sentence insight about immediate actions needed based on emails. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Process Improvements",
-      "insight": "Three sentence insight about process improvements identified from email patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Response Optimization",
-      "insight": "Three sentence insight about optimizing email response strategies. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Tactical action for immediate implementation",
-    "rationale": "Tactical reasoning for recommended action"
-  }
-}""",
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
 
-            "relationship": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Relationship Health",
-      "insight": "Three sentence insight about current relationship health based on email tone and frequency. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Engagement Levels",
-      "insight": "Three sentence insight about engagement levels and responsiveness patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Trust Indicators",
-      "insight": "Three sentence insight about trust and rapport indicators in email communications. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Relationship-focused action",
-    "rationale": "Relationship-based reasoning for recommended action"
-  }
-}""",
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        prepared = self._prepare_email_insights(interactions_data, client_id, insight_type, employee_id, no_cache)
 
-            "content": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "activities": [
-    {
-      "type": "email",
-      "date": "YYYY-MM-DD",
-      "content_summary": "Brief summary of email content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Content Themes",
-      "insight": "Three sentence insight about recurring themes and topics in email content. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Information Quality",
-      "insight": "Three sentence insight about quality and completeness of information shared. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Communication Clarity",
-      "insight": "Three sentence insight about clarity and effectiveness of email communications. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Content-focused improvement action",
-    "rationale": "Content-based reasoning for recommended action"
-  }
-}"""
-        }
+        if prepared is None:
+            return {
+                "error": f"No interactions found for client_id {client_id}",
+                "client_id": client_id
+            }
+
+        if not prepared['email_interactions']:
+            return copy.deepcopy(_NO_EMAILS_RESULT)
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = await self._agenerate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_email_insights(response, prepared, insight_type)
+
+    def _prepare_combined_analysis(self,
+                                   interactions_data: List[Dict[str, Any]],
+                                   client_id: int,
+                                   analysis_focus: str,
+                                   insight_type: str,
+                                   employee_id: int = None,
+                                   no_cache: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Build one prompt requesting both the communications analysis and the insights
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on
+            analysis_focus: Focus area for the analysis part
+            insight_type: Type of insights for the insights part
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache for this request
+
+        Returns:
+            Dictionary with prompt, system_message, cache_key, email_interactions and recent_email_summary,
+            or None if the client has no interactions
+        """
+        partition = self._partition_client_emails(interactions_data, client_id, employee_id)
+
+        if not partition.has_interactions:
+            return None
+
+        formatted_data = self._format_email_partition(partition, context=f"email_combined_analysis_for_client_{client_id}")
+        email_interactions = partition.emails
 
         system_message = f"""You are an expert email communication analyst. You MUST return valid JSON in the exact format specified.
 
@@ -787,13 +1523,19 @@ CRITICAL REQUIREMENTS:
 3. Return only valid JSON - no additional text or formatting
 4. Use the actual email data provided to populate activities and insights
 
-Focus on {insight_type} insights from the email communications."""
+Provide both {analysis_focus} analysis and {insight_type} insights of the email communications."""
 
-        prompt = f"""Generate {insight_type} insights from the following email communication data and return structured JSON:
+        prompt = f"""Analyze the following email communication data and return structured JSON:
 
 {formatted_data}
 
-{insight_prompts.get(insight_type, insight_prompts['strategic'])}
+Return ONE JSON object with exactly two top-level keys:
+- "analysis": {analysis_focus} analysis of the email communications in the first format below
+- "insights": {insight_type} insights from the email communications in the second format below
+
+"analysis" {_FOCUS_PROMPTS.get(analysis_focus, _FOCUS_PROMPTS['comprehensive'])}
+
+"insights" {_INSIGHT_PROMPTS.get(insight_type, _INSIGHT_PROMPTS['strategic'])}
 
 IMPORTANT:
 - Return ONLY valid JSON in the specified format
@@ -801,81 +1543,117 @@ IMPORTANT:
 - Use actual dates and content from the email data
 - Determine activity status based on interaction timestamps"""
 
-        response = self._generate_content(prompt, system_message)
+        return {
+            "prompt": prompt,
+            "system_message": system_message,
+            "cache_key": None if no_cache else self._response_cache_key("combined", client_id, f"{analysis_focus}+{insight_type}", email_interactions),
+            "email_interactions": email_interactions,
+            "recent_email_summary": self._summarize_recent_email(partition)
+        }
 
-        try:
-            # Clean the response to extract JSON
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
-
-            result = json.loads(response_clean)
-
-            # Add recent email summary to the result
-            if recent_email_summary['has_recent_email']:
-                formatted_date = self._format_date_safely(recent_email_summary['email_date'])
-                result['recent_email_summary'] = {
-                    "has_recent_email": True,
-                    "email_date": formatted_date,
-                    "employee_id": recent_email_summary['employee_id'],
-                    "client_id": recent_email_summary['client_id'],
-                    "email_type": recent_email_summary['email_type'],
-                    "content_preview": recent_email_summary['content_preview'],
-                    "status": recent_email_summary['status'],
-                    "key_points": f"Most recent email from {formatted_date}: {recent_email_summary['content_preview']}"
-                }
-            else:
-                result['recent_email_summary'] = {
-                    "has_recent_email": False,
-                    "message": recent_email_summary.get('message', 'No recent email found')
-                }
+    def _finalize_combined_analysis(self,
+                                    response: str,
+                                    prepared: Dict[str, Any],
+                                    insight_type: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Parse the combined LLM response once and split it into the two structured results
 
-            return result
-
-        except json.JSONDecodeError:
-            # Fallback structured response if JSON parsing fails
-            fallback_result = {
-                "activities": [
-                    {
-                        "type": "email",
-                        "date": self._format_date_safely(email.get('created_at', '')) if email_interactions else "N/A",
-                        "content_summary": f"Email {insight_type} analysis",
-                        "status": self._determine_activity_status(email_interactions[0].get('created_at') if email_interactions else None)
-                    }
-                ],
-                "insights": [
-                    {
-                        "category": f"{insight_type.title()} Analysis",
-                        "insight": f"Email {insight_type} analysis was requested but encountered processing challenges. The system attempted to analyze the provided email communications for {insight_type} insights. Manual review of the email content may be needed for detailed {insight_type} assessment."
-                    }
-                ],
-                "next_move": {
-                    "priority": "medium",
-                    "action": f"Review email communications for {insight_type} insights",
-                    "rationale": f"Automated {insight_type} analysis encountered issues, manual review recommended"
-                }
+        Args:
+            response: Raw LLM response text
+            prepared: Output of _prepare_combined_analysis
+            insight_type: Type of insights requested
+
+        Returns:
+            Tuple of (communications analysis, email insights)
+        """
+        combined = self._parse_llm_json(response) or {}
+        analysis = combined.get('analysis')
+        insights = combined.get('insights')
+
+        if not isinstance(analysis, dict):
+            analysis = None
+        if not isinstance(insights, dict):
+            insights = None
+        if analysis is not None and insights is not None:
+            _set_cached_response(prepared['cache_key'], response)
+
+        return (self._build_communications_result(analysis, prepared),
+                self._build_insights_result(insights, prepared, insight_type))
+
+    def analyze_and_insights(self,
+                             interactions_data: List[Dict[str, Any]],
+                             client_id: int,
+                             analysis_focus: str = "comprehensive",
+                             insight_type: str = "strategic",
+                             employee_id: int = None,
+                             no_cache: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Run analyze_email_communications and generate_email_insights with a single LLM call
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Tuple of (communications analysis, email insights), each in the same format as the separate methods
+        """
+        prepared = self._prepare_combined_analysis(interactions_data, client_id, analysis_focus, insight_type, employee_id, no_cache)
+
+        if prepared is None:
+            error = {
+                "error": f"No interactions found for client_id {client_id}",
+                "client_id": client_id
             }
+            return error, dict(error)
 
-            # Add recent email summary to fallback result
-            if recent_email_summary['has_recent_email']:
-                formatted_date = self._format_date_safely(recent_email_summary['email_date'])
-                fallback_result['recent_email_summary'] = {
-                    "has_recent_email": True,
-                    "email_date": formatted_date,
-                    "employee_id": recent_email_summary['employee_id'],
-                    "client_id": recent_email_summary['client_id'],
-                    "email_type": recent_email_summary['email_type'],
-                    "content_preview": recent_email_summary['content_preview'],
-                    "status": recent_email_summary['status'],
-                    "key_points": f"Most recent email from {formatted_date}: {recent_email_summary['content_preview']}"
-                }
-            else:
-                fallback_result['recent_email_summary'] = {
-                    "has_recent_email": False,
-                    "message": recent_email_summary.get('message', 'No recent email found')
-                }
+        if not prepared['email_interactions']:
+            return copy.deepcopy(_NO_EMAILS_RESULT), copy.deepcopy(_NO_EMAILS_RESULT)
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = self._generate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_combined_analysis(response, prepared, insight_type)
+
+    async def a_analyze_and_insights(self,
+                                     interactions_data: List[Dict[str, Any]],
+                                     client_id: int,
+                                     analysis_focus: str = "comprehensive",
+                                     insight_type: str = "strategic",
+                                     employee_id: int = None,
+                                     no_cache: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Async variant of analyze_and_insights
+
+        Args:
+            interactions_data: List of interaction records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Tuple of (communications analysis, email insights), each in the same format as the separate methods
+        """
+        prepared = self._prepare_combined_analysis(interactions_data, client_id, analysis_focus, insight_type, employee_id, no_cache)
+
+        if prepared is None:
+            error = {
+                "error": f"No interactions found for client_id {client_id}",
+                "client_id": client_id
+            }
+            return error, dict(error)
+
+        if not prepared['email_interactions']:
+            return copy.deepcopy(_NO_EMAILS_RESULT), copy.deepcopy(_NO_EMAILS_RESULT)
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = await self._agenerate_content(prepared['prompt'], prepared['system_message'])
 
-            return fallback_result
+        return self._finalize_combined_analysis(response, prepared, insight_type)
@@ -14,163 +14,50 @@ Responsibilities:
 Version: 3.0.0 (Refactored from Churn Analysis Agent - Focus on Pattern Analysis)
 """
 
-import json
+import hashlib
 import logging
+import os
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from agents.model_factory import ModelFactory
+from agents.common_agent import _jsonlib
+from agents.common_agent._llm_limiter import get_llm_inflight_limiter
+from agents.common_agent._llm_responses import FENCE_RE, ResponseCache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sections and bucket signals every analysis result must contain, in the order missing ones are filled in
+_REQUIRED_SECTIONS = ('features', 'pattern_analysis', 'statistical_methodology')
+_REQUIRED_BUCKETS = ('recency', 'frequency', 'monetary', 'category_dependency', 'lifecycle_stage')
 
-class HistoryPatternAnalysisError(Exception):
-    """Custom exception for history pattern analysis errors"""
-    pass
-
-
-class HistoryPatternAnalysisAgent:
-    """
-    History Pattern Analysis Agent
-
-    Performs comprehensive customer-specific purchase history pattern analysis using pre-mapped
-    database columns from the Schema Mapper Agent. Analyzes purchase frequency, spending behavior,
-    category preferences, and lifecycle patterns. Outputs behavioral signals for downstream
-    churn risk assessment by CRM agents (NextActionInsightAgent, RestartMomentumInsightAgent).
-    """
-
-    def __init__(self, provider: str = 'openai', model_name: Optional[str] = None, email: Optional[str] = None):
-        """
-        Initialize the History Pattern Analysis Agent
-
-        Args:
-            provider: LLM provider ('openai' or 'gemini')
-            model_name: Specific model name (optional)
-            email: User email (not used in simplified version)
-        """
-        self.agent_name = "History Pattern Analysis Agent"
-        self.version = "3.0.0"
-        self.provider = provider
-        self.email = email
-
-        # Initialize LLM
-        try:
-            self.model_factory = ModelFactory(provider=provider, model_name=model_name)
-            self.model_name = self.model_factory.model_name
-            logger.info(f"Initialized {self.agent_name} with {provider} ({self.model_name})")
-        except Exception as e:
-            logger.error(f"Failed to initialize LLM: {e}")
-            raise HistoryPatternAnalysisError(f"LLM initialization failed: {e}")
-
-    def analyze_customer_history_patterns(self, table_name: str, column_mapping: Dict[str, Any],
-                              target_customer: str = "10003", timezone: str = "America/Los_Angeles",
-                              currency: str = "USD") -> Dict[str, Any]:
-        """
-        Analyze customer purchase history patterns using pre-mapped schema columns
-
-        Args:
-            table_name: Name of the table analyzed
-            column_mapping: Column mappings from Schema Mapper Agent
-            target_customer: Target customer identifier
-            timezone: Timezone for date calculations
-            currency: Currency for monetary normalization
-
-        Returns:
-            Complete history pattern analysis result with features, positive_signals, and risk_indicators
-        """
-        try:
-            logger.info(f"Starting history pattern analysis for customer {target_customer} on table {table_name}")
-
-            # Log schema mapping information for debugging/monitoring
-            mapping_stats = column_mapping.get('mapping_summary', {})
-            logger.info(f"Schema mapping coverage: {mapping_stats.get('mapping_coverage_percentage', 'unknown')}% "
-                       f"({mapping_stats.get('total_columns_mapped', 'unknown')} of {mapping_stats.get('total_columns_examined', 'unknown')} columns)")
-
-            for bucket_name, columns in column_mapping.get('column_mapping', {}).items():
-                if bucket_name != 'unmapped' and columns:
-                    logger.info(f"Available {bucket_name} data: {len(columns)} columns with avg confidence {sum(col.get('confidence', 0) for col in columns) / len(columns):.2f}")
-
-            # Build comprehensive history pattern analysis prompt
-            prompt = self._build_history_pattern_analysis_prompt(
-                table_name=table_name,
-                column_mapping=column_mapping,
-                target_customer=target_customer,
-                timezone=timezone,
-                currency=currency
-            )
+# LLM responses keyed by a hash of model + prompt; the analysis is deterministic for a given
+# table, customer and column mapping, so refreshing dashboards can reuse it for a while
+_response_cache = ResponseCache(
+    maxsize=int(os.getenv("HISTORY_AGENT_CACHE_SIZE", "512")),
+    ttl=int(os.getenv("HISTORY_AGENT_CACHE_TTL", "900"))
+)
 
-            # Get LLM analysis
-            response = self.model_factory.generate_content(prompt)
+# Customers packed into one LLM prompt by analyze_customers_batch. A single analysis already
+# uses a large share of ModelFactory's COMPLETION_MAX_TOKENS, so batching is off by default;
+# raise it only for models whose answers are short enough to share one completion
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_AGENT_BATCH_SIZE", "1"))
 
-            # Clean and parse response
-            cleaned_response = response.strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.endswith('```'):
-                cleaned_response = cleaned_response[:-3]
-            cleaned_response = cleaned_response.strip()
+# Second-resolution timestamp of the last metadata stamp, reused while the second is unchanged
+_last_stamp = (0, "")
 
-            try:
-                result = json.loads(cleaned_response)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response as JSON: {e}")
-                logger.debug(f"Raw response: {cleaned_response[:500]}...")
-                raise HistoryPatternAnalysisError(f"Invalid JSON response from LLM: {e}")
 
-            # Validate and enhance result
-            self._validate_and_enhance_result(result, target_customer, table_name)
+def _now_iso() -> str:
+    """Current local time as an ISO string at second precision, formatted at most once per second"""
+    global _last_stamp
+    second = int(time.time())
+    if second != _last_stamp[0]:
+        _last_stamp = (second, datetime.fromtimestamp(second).isoformat())
+    return _last_stamp[1]
 
-            logger.info(f"History pattern analysis completed for customer {target_customer}")
-            return result
 
-        except Exception as e:
-            logger.error(f"History pattern analysis failed: {e}")
-            raise HistoryPatternAnalysisError(f"History pattern analysis failed: {e}")
-    
-    def _build_history_pattern_analysis_prompt(self, table_name: str, column_mapping: Dict[str, Any],
-                                            target_customer: str, timezone: str = "America/Los_Angeles",
-                                            currency: str = "USD") -> str:
-        """Build comprehensive prompt for history pattern analysis with purchase behavior patterns"""
-
-        # Build column mapping summary
-        mapping_summary = "MAPPED COLUMNS BY BUCKET:\n"
-        for bucket_name, columns in column_mapping.get('column_mapping', {}).items():
-            if bucket_name != 'unmapped' and columns:
-                mapping_summary += f"\n{bucket_name.upper()} ({len(columns)} columns):\n"
-                for col_info in columns:
-                    col_name = col_info['column']
-                    confidence = col_info.get('confidence', 0)
-                    subtype = col_info.get('subtype', '')
-                    reason = col_info.get('reason', 'No reason provided')
-                    mapping_summary += f"  • {col_name} [{subtype}] (confidence: {confidence:.2f})\n"
-                    mapping_summary += f"    Reason: {reason}\n"
-
-        # Add unmapped columns for context
-        unmapped_columns = column_mapping.get('column_mapping', {}).get('unmapped', [])
-        if unmapped_columns:
-            mapping_summary += f"\nUNMAPPED COLUMNS ({len(unmapped_columns)} columns):\n"
-            for col_info in unmapped_columns[:5]:  # Show first 5 unmapped columns
-                col_name = col_info['column']
-                reason = col_info.get('reason', 'No reason provided')
-                mapping_summary += f"  • {col_name} - {reason}\n"
-
-        # Build analysis context
-        analysis_context = f"HISTORY PATTERN ANALYSIS CONTEXT:\n"
-        analysis_context += f"Table: {table_name}\n"
-        analysis_context += f"Target Customer: {target_customer}\n"
-        analysis_context += f"Timezone: {timezone}\n"
-        analysis_context += f"Currency: {currency}\n"
-
-        # Add mapping summary statistics
-        mapping_stats = column_mapping.get('mapping_summary', {})
-        if mapping_stats:
-            analysis_context += f"Schema Analysis Results:\n"
-            analysis_context += f"  • Total columns examined: {mapping_stats.get('total_columns_examined', 'unknown')}\n"
-            analysis_context += f"  • Columns mapped: {mapping_stats.get('total_columns_mapped', 'unknown')}\n"
-            analysis_context += f"  • Mapping coverage: {mapping_stats.get('mapping_coverage_percentage', 'unknown')}%\n"
-
-        prompt = f"""You are an expert customer behavior analyst. Perform a comprehensive purchase history pattern analysis for customer {target_customer} using the available data columns identified through schema mapping.
+# Prompt for history pattern analysis; filled with str.format_map, so literal braces are doubled
+_HISTORY_PROMPT_TEMPLATE = """You are an expert customer behavior analyst. Perform a comprehensive purchase history pattern analysis for customer {target_customer} using the available data columns identified through schema mapping.
 
 {analysis_context}
 
@@ -302,16 +189,380 @@ IMPORTANT FINAL INSTRUCTIONS:
 6. Include specific product categories in category_dependency analysis if available in schema
 7. Return valid JSON only - no markdown, no explanations, no comments"""
 
-        return prompt
+# Wraps the single-customer prompt (built for the CUSTOMER_ID placeholder) to analyze several
+# customers in one request; filled with str.format_map, so literal braces are doubled
+_BATCH_PROMPT_TEMPLATE = """You are analyzing purchase history patterns for {customer_count} customers in one request: {customer_list}.
+
+Perform the analysis described below separately for EACH of these customers. In the instructions, CUSTOMER_ID stands for the customer being analyzed.
+
+{customer_prompt}
+
+BATCH OUTPUT FORMAT (overrides the single-customer output instruction above):
+Return ONLY one valid JSON object whose keys are exactly the customer identifiers {customer_list} and whose values are each customer's complete analysis object in the structure above, for example:
+{{"<customer_id>": {{"features": {{...}}, "pattern_analysis": {{...}}, "statistical_methodology": {{...}}}}}}"""
+
+
+class HistoryPatternAnalysisError(Exception):
+    """Custom exception for history pattern analysis errors"""
+    pass
+
+
+class HistoryPatternAnalysisAgent:
+    """
+    History Pattern Analysis Agent
+
+    Performs comprehensive customer-specific purchase history pattern analysis using pre-mapped
+    database columns from the Schema Mapper Agent. Analyzes purchase frequency, spending behavior,
+    category preferences, and lifecycle patterns. Outputs behavioral signals for downstream
+    churn risk assessment by CRM agents (NextActionInsightAgent, RestartMomentumInsightAgent).
+    """
+
+    def __init__(self, provider: str = 'openai', model_name: Optional[str] = None, email: Optional[str] = None,
+                 use_cache: bool = True):
+        """
+        Initialize the History Pattern Analysis Agent
+
+        Args:
+            provider: LLM provider ('openai' or 'gemini')
+            model_name: Specific model name (optional)
+            email: User email (not used in simplified version)
+            use_cache: Reuse LLM responses for identical prompts within HISTORY_AGENT_CACHE_TTL seconds
+        """
+        self.agent_name = "History Pattern Analysis Agent"
+        self.version = "3.0.0"
+        self.provider = provider
+        self.email = email
+        self.use_cache = use_cache
+
+        # Initialize LLM
+        try:
+            self.model_factory = ModelFactory(provider=provider, model_name=model_name)
+            self.model_name = self.model_factory.model_name
+            logger.info("Initialized %s with %s (%s)", self.agent_name, provider, self.model_name)
+        except Exception as e:
+            logger.error("Failed to initialize LLM: %s", e)
+            raise HistoryPatternAnalysisError(f"LLM initialization failed: {e}")
+
+    def analyze_customer_history_patterns(self, table_name: str, column_mapping: Dict[str, Any],
+                              target_customer: str = "10003", timezone: str = "America/Los_Angeles",
+                              currency: str = "USD") -> Dict[str, Any]:
+        """
+        Analyze customer purchase history patterns using pre-mapped schema columns
+
+        Args:
+            table_name: Name of the table analyzed
+            column_mapping: Column mappings from Schema Mapper Agent
+            target_customer: Target customer identifier
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Returns:
+            Complete history pattern analysis result with features, positive_signals, and risk_indicators
+        """
+        try:
+            logger.info("Starting history pattern analysis for customer %s on table %s", target_customer, table_name)
+
+            prompt = self._prepare_history_pattern_prompt(table_name, column_mapping, target_customer, timezone, currency)
+
+            cache_key = self._response_cache_key(prompt)
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                logger.info("Using cached history pattern analysis for customer %s", target_customer)
+                return self._parse_history_pattern_response(cached, target_customer, table_name)
+
+            # Get LLM analysis
+            response = self.model_factory.generate_content(prompt)
+
+            result = self._parse_history_pattern_response(response, target_customer, table_name)
+            self._set_cached_response(cache_key, response)
+            return result
+
+        except Exception as e:
+            logger.error("History pattern analysis failed: %s", e)
+            raise HistoryPatternAnalysisError(f"History pattern analysis failed: {e}")
+
+    async def a_analyze_customer_history_patterns(self, table_name: str, column_mapping: Dict[str, Any],
+                                                  target_customer: str = "10003", timezone: str = "America/Los_Angeles",
+                                                  currency: str = "USD") -> Dict[str, Any]:
+        """
+        Async variant of analyze_customer_history_patterns
+
+        The LLM call goes through the shared in-flight limiter, so analyses for many
+        customers started together are pipelined over the shared connection pool.
+
+        Args:
+            table_name: Name of the table analyzed
+            column_mapping: Column mappings from Schema Mapper Agent
+            target_customer: Target customer identifier
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Returns:
+            Complete history pattern analysis result with features, positive_signals, and risk_indicators
+        """
+        try:
+            logger.info("Starting history pattern analysis for customer %s on table %s", target_customer, table_name)
+
+            prompt = self._prepare_history_pattern_prompt(table_name, column_mapping, target_customer, timezone, currency)
+
+            cache_key = self._response_cache_key(prompt)
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                logger.info("Using cached history pattern analysis for customer %s", target_customer)
+                return self._parse_history_pattern_response(cached, target_customer, table_name)
+
+            # Get LLM analysis
+            response = await get_llm_inflight_limiter().submit(self.model_factory, prompt)
+
+            result = self._parse_history_pattern_response(response, target_customer, table_name)
+            self._set_cached_response(cache_key, response)
+            return result
+
+        except Exception as e:
+            logger.error("History pattern analysis failed: %s", e)
+            raise HistoryPatternAnalysisError(f"History pattern analysis failed: {e}")
+
+    def analyze_customers_batch(self, table_name: str, column_mapping: Dict[str, Any],
+                                target_customers: List[str], timezone: str = "America/Los_Angeles",
+                                currency: str = "USD", batch_size: int = HISTORY_BATCH_SIZE) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze purchase history patterns for several customers with as few LLM requests as possible
+
+        Customers with a cached analysis are answered from the cache; the rest are packed up
+        to batch_size per prompt that asks for one JSON object keyed by customer. Each
+        customer's answer is cached under its single-customer prompt, so later individual
+        calls reuse it. Customers missing from a batch answer, or from a batch reply that was
+        truncated or unparseable, are retried individually; when the provider call itself
+        fails, the chunk's customers are left out as failed.
+
+        Args:
+            table_name: Name of the table analyzed
+            column_mapping: Column mappings from Schema Mapper Agent
+            target_customers: Target customer identifiers
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+            batch_size: Maximum customers per LLM request
+
+        Returns:
+            Dictionary mapping each customer to its analysis result; customers whose analysis
+            failed are left out
+        """
+        logger.info("Starting batched history pattern analysis for %s customers on table %s", len(target_customers), table_name)
+
+        results = {}
+        pending = []
+        for target_customer in target_customers:
+            prompt = self._build_history_pattern_analysis_prompt(table_name, column_mapping, target_customer, timezone, currency)
+            cache_key = self._response_cache_key(prompt)
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                results[target_customer] = self._parse_history_pattern_response(cached, target_customer, table_name)
+            else:
+                pending.append((target_customer, cache_key))
+
+        for start in range(0, len(pending), max(batch_size, 1)):
+            chunk = pending[start:start + max(batch_size, 1)]
+            if len(chunk) > 1:
+                chunk_results = self._analyze_customer_chunk(table_name, column_mapping, chunk, timezone, currency)
+                if chunk_results is None:
+                    # The provider call itself failed (e.g. outage); retrying each customer would
+                    # only multiply the failing calls, so they are reported as failed
+                    logger.error("Batched history pattern analysis failed for customers %s",
+                                 ", ".join(str(target_customer) for target_customer, _ in chunk))
+                    continue
+                results.update(chunk_results)
+
+            for target_customer, _ in chunk:
+                if target_customer in results:
+                    continue
+                if len(chunk) > 1:
+                    logger.warning("Customer %s missing from batch answer, analyzing individually", target_customer)
+                try:
+                    results[target_customer] = self.analyze_customer_history_patterns(
+                        table_name, column_mapping, target_customer, timezone, currency)
+                except HistoryPatternAnalysisError as e:
+                    logger.error("History pattern analysis failed for customer %s: %s", target_customer, e)
+
+        return {customer: results[customer] for customer in target_customers if customer in results}
+
+    def _analyze_customer_chunk(self, table_name: str, column_mapping: Dict[str, Any],
+                                chunk: List[tuple], timezone: str, currency: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Send one multi-customer prompt and fan the answer out per customer
+
+        Args:
+            table_name: Name of the table analyzed
+            column_mapping: Column mappings from Schema Mapper Agent
+            chunk: (target_customer, single-customer cache key) pairs
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Returns:
+            Dictionary mapping each answered customer to its validated analysis result (empty
+            when the reply was truncated or is not a JSON object, so every customer is retried
+            individually), or None when the provider call failed
+        """
+        customer_list = ", ".join(str(target_customer) for target_customer, _ in chunk)
+        prompt = _BATCH_PROMPT_TEMPLATE.format_map({
+            'customer_count': len(chunk),
+            'customer_list': customer_list,
+            'customer_prompt': self._build_history_pattern_analysis_prompt(
+                table_name, column_mapping, "CUSTOMER_ID", timezone, currency)
+        })
+
+        generation = self.model_factory.generate(prompt)
+        if generation.error is not None:
+            return None
+        if generation.finish_reason == "length":
+            logger.warning("Batched history pattern response for %s customers hit the completion cap",
+                           len(chunk))
+            return {}
+
+        response = generation.text
+        try:
+            answer = _jsonlib.loads(response)
+        except _jsonlib.JSONDecodeError:
+            try:
+                answer = _jsonlib.loads(FENCE_RE.sub('', response))
+            except _jsonlib.JSONDecodeError as e:
+                logger.error("Failed to parse batched history pattern response as JSON: %s", e)
+                return {}
+
+        if not isinstance(answer, dict):
+            return {}
+
+        results = {}
+        for target_customer, cache_key in chunk:
+            customer_result = answer.get(str(target_customer))
+            if not isinstance(customer_result, dict):
+                continue
+            # Cache the raw per-customer answer before validation adds metadata to it
+            self._set_cached_response(cache_key, _jsonlib.dumps(customer_result))
+            self._validate_and_enhance_result(customer_result, target_customer, table_name)
+            results[target_customer] = customer_result
+
+        logger.info("Batched history pattern analysis answered %s of %s customers", len(results), len(chunk))
+        return results
+
+    def _response_cache_key(self, prompt: str) -> Optional[str]:
+        """Cache key for a prompt sent to this agent's model, or None when caching is disabled"""
+        if not self.use_cache:
+            return None
+        return hashlib.blake2b(f"{self.provider}|{self.model_name}|{prompt}".encode(), digest_size=16).hexdigest()
+
+    def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """Return the cached LLM response for a key, or None on a miss or when caching is off"""
+        return _response_cache.get(cache_key)
+
+    def _set_cached_response(self, cache_key: Optional[str], response: str) -> None:
+        """Store an LLM response that parsed successfully"""
+        _response_cache.set(cache_key, response)
+
+    def _prepare_history_pattern_prompt(self, table_name: str, column_mapping: Dict[str, Any],
+                                        target_customer: str, timezone: str, currency: str) -> str:
+        """Log the schema mapping coverage and build the history pattern analysis prompt"""
+        # Log schema mapping information for debugging/monitoring
+        mapping_stats = column_mapping.get('mapping_summary', {})
+        logger.info("Schema mapping coverage: %s%% (%s of %s columns)",
+                    mapping_stats.get('mapping_coverage_percentage', 'unknown'),
+                    mapping_stats.get('total_columns_mapped', 'unknown'),
+                    mapping_stats.get('total_columns_examined', 'unknown'))
+
+        # Per-bucket confidence averages scan every column, so only compute them when they are logged
+        if logger.isEnabledFor(logging.INFO):
+            for bucket_name, columns in column_mapping.get('column_mapping', {}).items():
+                if bucket_name != 'unmapped' and columns:
+                    logger.info("Available %s data: %s columns with avg confidence %.2f", bucket_name, len(columns), sum(col.get('confidence', 0) for col in columns) / len(columns))
+
+        # Build comprehensive history pattern analysis prompt
+        return self._build_history_pattern_analysis_prompt(
+            table_name=table_name,
+            column_mapping=column_mapping,
+            target_customer=target_customer,
+            timezone=timezone,
+            currency=currency
+        )
+
+    def _parse_history_pattern_response(self, response: str, target_customer: str, table_name: str) -> Dict[str, Any]:
+        """Parse the LLM response and validate/enhance the history pattern analysis result"""
+        # Parse the response as-is first; only fenced responses need cleaning
+        try:
+            result = _jsonlib.loads(response)
+        except _jsonlib.JSONDecodeError:
+            cleaned_response = FENCE_RE.sub('', response)
+            try:
+                result = _jsonlib.loads(cleaned_response)
+            except _jsonlib.JSONDecodeError as e:
+                logger.error("Failed to parse LLM response as JSON: %s", e)
+                logger.debug("Raw response: %s...", cleaned_response[:500])
+                raise HistoryPatternAnalysisError(f"Invalid JSON response from LLM: {e}")
+
+        # Validate and enhance result
+        self._validate_and_enhance_result(result, target_customer, table_name)
+
+        logger.info("History pattern analysis completed for customer %s", target_customer)
+        return result
+    
+    def _build_history_pattern_analysis_prompt(self, table_name: str, column_mapping: Dict[str, Any],
+                                            target_customer: str, timezone: str = "America/Los_Angeles",
+                                            currency: str = "USD") -> str:
+        """Build comprehensive prompt for history pattern analysis with purchase behavior patterns"""
+
+        column_buckets = column_mapping.get('column_mapping', {})
+
+        # Build column mapping summary
+        summary_parts = ["MAPPED COLUMNS BY BUCKET:\n"]
+        for bucket_name, columns in column_buckets.items():
+            if bucket_name != 'unmapped' and columns:
+                summary_parts.append(f"\n{bucket_name.upper()} ({len(columns)} columns):\n")
+                summary_parts.extend([
+                    f"  • {col_info['column']} [{col_info.get('subtype', '')}] (confidence: {col_info.get('confidence', 0):.2f})\n"
+                    f"    Reason: {col_info.get('reason', 'No reason provided')}\n"
+                    for col_info in columns
+                ])
+
+        # Add unmapped columns for context
+        unmapped_columns = column_buckets.get('unmapped', [])
+        if unmapped_columns:
+            summary_parts.append(f"\nUNMAPPED COLUMNS ({len(unmapped_columns)} columns):\n")
+            summary_parts.extend([
+                f"  • {col_info['column']} - {col_info.get('reason', 'No reason provided')}\n"
+                for col_info in unmapped_columns[:5]  # Show first 5 unmapped columns
+            ])
+        mapping_summary = "".join(summary_parts)
+
+        # Build analysis context
+        ctx_parts = [
+            "HISTORY PATTERN ANALYSIS CONTEXT:\n",
+            f"Table: {table_name}\n",
+            f"Target Customer: {target_customer}\n",
+            f"Timezone: {timezone}\n",
+            f"Currency: {currency}\n"
+        ]
+
+        # Add mapping summary statistics
+        mapping_stats = column_mapping.get('mapping_summary', {})
+        if mapping_stats:
+            ctx_parts.append("Schema Analysis Results:\n")
+            ctx_parts.append(f"  • Total columns examined: {mapping_stats.get('total_columns_examined', 'unknown')}\n")
+            ctx_parts.append(f"  • Columns mapped: {mapping_stats.get('total_columns_mapped', 'unknown')}\n")
+            ctx_parts.append(f"  • Mapping coverage: {mapping_stats.get('mapping_coverage_percentage', 'unknown')}%\n")
+        analysis_context = "".join(ctx_parts)
+
+        return _HISTORY_PROMPT_TEMPLATE.format_map({
+            'analysis_context': analysis_context,
+            'mapping_summary': mapping_summary,
+            'target_customer': target_customer,
+            'currency': currency
+        })
 
     def _validate_and_enhance_result(self, result: Dict[str, Any], target_customer: str, table_name: str) -> None:
         """Validate and enhance the history pattern analysis result"""
 
         # Ensure all required sections exist
-        required_sections = ['features', 'pattern_analysis', 'statistical_methodology']
-        for section in required_sections:
+        for section in _REQUIRED_SECTIONS:
             if section not in result:
-                logger.warning(f"Missing section {section} in history pattern analysis result")
+                logger.warning("Missing section %s in history pattern analysis result", section)
                 result[section] = {}
 
         # Add metadata
@@ -320,37 +571,35 @@ IMPORTANT FINAL INSTRUCTIONS:
             'agent_version': self.version,
             'target_customer': target_customer,
             'table_analyzed': table_name,
-            'analysis_timestamp': datetime.now().isoformat(),
+            'analysis_timestamp': _now_iso(),
             'llm_provider': self.provider,
             'llm_model': self.model_name,
             'analysis_type': 'purchase_history_patterns'
         }
 
+        # Every required section exists at this point
+        pattern_analysis = result['pattern_analysis']
+
         # Ensure detailed patterns exist
-        if 'pattern_analysis' in result:
-            if 'detailed_patterns' not in result['pattern_analysis'] or not result['pattern_analysis']['detailed_patterns']:
-                logger.warning("Missing detailed patterns in pattern analysis")
-                result['pattern_analysis']['detailed_patterns'] = [
-                    "Analysis based on schema mapping patterns and customer behavior indicators",
-                    "Pattern assessment derived from purchase frequency and monetary trends",
-                    "Category dependency analysis indicates product preference patterns"
-                ]
-
-            # Ensure positive_signals and risk_indicators exist
-            if 'positive_signals' not in result['pattern_analysis']:
-                result['pattern_analysis']['positive_signals'] = []
-            if 'risk_indicators' not in result['pattern_analysis']:
-                result['pattern_analysis']['risk_indicators'] = []
+        if not pattern_analysis.get('detailed_patterns'):
+            logger.warning("Missing detailed patterns in pattern analysis")
+            pattern_analysis['detailed_patterns'] = [
+                "Analysis based on schema mapping patterns and customer behavior indicators",
+                "Pattern assessment derived from purchase frequency and monetary trends",
+                "Category dependency analysis indicates product preference patterns"
+            ]
+
+        # Ensure positive_signals and risk_indicators exist
+        pattern_analysis.setdefault('positive_signals', [])
+        pattern_analysis.setdefault('risk_indicators', [])
 
         # Validate bucket signals
-        if 'pattern_analysis' in result and 'bucket_signals' in result['pattern_analysis']:
-            required_buckets = ['recency', 'frequency', 'monetary', 'category_dependency', 'lifecycle_stage']
-            for bucket in required_buckets:
-                if bucket not in result['pattern_analysis']['bucket_signals']:
-                    logger.warning(f"Missing bucket signal for {bucket}")
-                    result['pattern_analysis']['bucket_signals'][bucket] = {
+        bucket_signals = pattern_analysis.get('bucket_signals')
+        if bucket_signals is not None:
+            for bucket in _REQUIRED_BUCKETS:
+                if bucket not in bucket_signals:
+                    logger.warning("Missing bucket signal for %s", bucket)
+                    bucket_signals[bucket] = {
                         'signal_strength': 'weak',
                         'detail': f'Analysis for {bucket} bucket not available'
                     }
-
-
@@ -13,6 +13,7 @@ Key Features:
 4. Activity status based on note timestamps (<7 days = active, >7 days = inactive)
 5. Three-sentence insights format for proper structure and readability
 6. Recent note summary between current employee and current client
+7. Async variants with bounded concurrent LLM dispatch for multi-client analysis
 
 Core Analysis Capabilities:
 - Current client note content summarization and key point extraction
@@ -36,15 +37,281 @@ Supported Providers:
 """
 
 import os
-import json
-from typing import Dict, List, Any, Optional, Union
+import copy
+import hashlib
+import heapq
+import logging
+import string
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Any, NamedTuple, Optional, Tuple, Union
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from agents.model_factory import ModelFactory
+from agents.model_factory import COMPLETION_MAX_TOKENS, ModelFactory
+from agents.common_agent import _jsonlib
+from agents.common_agent._llm_limiter import get_llm_inflight_limiter
+from agents.common_agent._llm_responses import FENCE_RE, ResponseCache, insights_fallback_renderer
+
+try:
+    import numpy as np
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Prompt size limits: only the most recent notes are listed, each with a shortened body
+MAX_NOTES_IN_PROMPT = int(os.getenv("NOTE_AGENT_MAX_NOTES_IN_PROMPT", "50"))
+MAX_NOTE_BODY_CHARS = int(os.getenv("NOTE_AGENT_MAX_NOTE_BODY_CHARS", "120"))
+
+# OpenAI Batch API settings for offline multi-client analysis (BatchNoteAnalyzer)
+BATCH_POLL_INTERVAL = float(os.getenv("NOTE_AGENT_BATCH_POLL_SECONDS", "30"))
+BATCH_COMPLETION_WINDOW = "24h"
+# Longest wait for a batch before it is cancelled and its clients get the fallback result
+BATCH_MAX_WAIT = float(os.getenv("NOTE_AGENT_BATCH_MAX_WAIT_SECONDS", str(24 * 3600)))
+_BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# Note count from which activity statuses are computed with one vectorized pandas pass
+PANDAS_STATUS_THRESHOLD = int(os.getenv("NOTE_AGENT_PANDAS_THRESHOLD", "100"))
+
+# Prompt parts shared by every analysis focus and insight type; the per-request
+# instructions go after the note data so the provider can reuse the cached prefix
+_SYSTEM_MESSAGE = """You are an expert client relationship analyst. You MUST return valid JSON in the exact format specified.
+
+CRITICAL REQUIREMENTS:
+1. Each insight must contain exactly 3 sentences
+2. Activity status must be 'active' if note is <7 days old, 'inactive' if >7 days old, 'decline' if no recent notes
+3. Return only valid JSON - no additional text or formatting
+4. Use the actual note data provided to populate activities and insights"""
+
+_PROMPT_PREFIX = "Analyze the following client note data and return structured JSON:\n\n"
+
+_PROMPT_SUFFIX = """IMPORTANT:
+- Return ONLY valid JSON in the specified format
+- Each insight must be exactly 3 sentences
+- Use actual dates and content from the note data
+- Determine activity status based on note timestamps"""
+
+if sys.version_info >= (3, 11):
+    # fromisoformat accepts a trailing 'Z' natively, so skip the per-call string copy
+    _parse_iso = datetime.fromisoformat
+else:
+    def _parse_iso(date_string: str) -> datetime:
+        """Parse an ISO timestamp, accepting a trailing 'Z'"""
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+
+# One output schema shared by every analysis focus and insight type; only the three
+# insight categories and the next-move wording differ, so those are filled in once here
+_SCHEMA_TEMPLATE = string.Template("""REQUIRED JSON OUTPUT FORMAT:
+{
+  "client_id": 123,
+  "activities": [
+    {
+      "type": "note",
+      "date": "YYYY-MM-DD",
+      "title": "Note title",
+      "content_summary": "Brief summary of note content",
+      "status": "active/inactive/decline"
+    }
+  ],
+  "insights": [
+$insights
+  ],
+  "recent_note_summary": {
+    "has_recent_note": true/false,
+    "note_date": "YYYY-MM-DD",
+    "employee_id": 123,
+    "client_id": 456,
+    "note_title": "Title of most recent note",
+    "content_preview": "First 150 characters of note content...",
+    "status": "active/inactive/decline",
+    "key_points": "Summary of main points from the most recent note"
+  },
+  "next_move": {
+    "priority": "high/medium/low",
+    "action": $action,
+    "rationale": $rationale
+  }
+}""")
+
+_INSIGHT_ITEM_TEMPLATE = string.Template("""    {
+      "category": $category,
+      "insight": $insight
+    }""")
+
+
+def _render_schema(categories: List[tuple], action: str, rationale: str) -> str:
+    """
+    Render the output schema for one analysis focus or insight type
+
+    Args:
+        categories: (category, what the insight is about) for each expected insight
+        action: Example next_move action
+        rationale: Example next_move rationale
+
+    Returns:
+        Schema text for the prompt
+    """
+    insights = ",\n".join(
+        _INSIGHT_ITEM_TEMPLATE.substitute(
+            category=_jsonlib.dumps(category),
+            insight=_jsonlib.dumps(f"Three sentence insight about {about}. Each insight must contain exactly "
+                                   "three sentences. This provides proper structure and readability.")
+        )
+        for category, about in categories
+    )
+    return _SCHEMA_TEMPLATE.substitute(insights=insights, action=_jsonlib.dumps(action),
+                                       rationale=_jsonlib.dumps(rationale))
+
+
+_ANALYSIS_SCHEMAS = {
+    "comprehensive": _render_schema(
+        [("Note Patterns", "note-taking patterns and frequency"),
+         ("Content Analysis", "note content themes and topics"),
+         ("Relationship Health", "relationship status based on notes")],
+        "Specific recommended action", "Why this action is recommended"
+    )
+}
+
+_INSIGHT_SCHEMAS = {
+    "strategic": _render_schema(
+        [("Strategic Note Opportunities", "strategic opportunities identified in client notes"),
+         ("Relationship Development", "relationship building through note documentation"),
+         ("Business Impact Assessment", "business impact documented in notes")],
+        "Strategic action based on note analysis", "Strategic reasoning for recommended action"
+    ),
+    "tactical": _render_schema(
+        [("Immediate Action Items", "immediate actions needed based on notes"),
+         ("Process Improvements", "process improvements identified from note patterns"),
+         ("Client Service Optimization", "optimizing client service based on notes")],
+        "Tactical action for immediate implementation", "Tactical reasoning for recommended action"
+    ),
+    "relationship": _render_schema(
+        [("Relationship Health", "current relationship health based on note content and frequency"),
+         ("Client Engagement Levels", "client engagement levels and interaction patterns"),
+         ("Trust and Communication Indicators", "trust and communication indicators in note documentation")],
+        "Relationship-focused action", "Relationship-based reasoning for recommended action"
+    ),
+    "content": _render_schema(
+        [("Note Content Themes", "recurring themes and topics in note content"),
+         ("Information Quality", "quality and completeness of information documented"),
+         ("Documentation Effectiveness", "effectiveness of note-taking and documentation practices")],
+        "Content-focused improvement action", "Content-based reasoning for recommended action"
+    )
+}
+
+# Fallback results used when the LLM response cannot be parsed; only client_id and the
+# first activity's date and status (and, for insights, the insight type) vary between failures
+_ANALYSIS_FALLBACK: Dict[str, Any] = {
+    "client_id": None,
+    "activities": [
+        {
+            "type": "note",
+            "date": "N/A",
+            "title": "Note analysis",
+            "content_summary": "Client note analysis",
+            "status": "churned"
+        }
+    ],
+    "insights": [
+        {
+            "category": "Analysis Status",
+            "insight": "Note analysis was requested but encountered processing challenges. The system attempted to analyze the provided client notes. Manual review of the note content may be needed for detailed insights."
+        }
+    ],
+    "next_move": {
+        "priority": "medium",
+        "action": "Review client notes manually",
+        "rationale": "Automated analysis encountered issues, manual review recommended"
+    }
+}
+
+_INSIGHTS_FALLBACK_TEMPLATE: Dict[str, Any] = {
+    "client_id": None,
+    "activities": [
+        {
+            "type": "note",
+            "date": "N/A",
+            "title": "Note $insight_type analysis",
+            "content_summary": "Client note $insight_type analysis",
+            "status": "churned"
+        }
+    ],
+    "insights": [
+        {
+            "category": "$insight_title Analysis",
+            "insight": "Note $insight_type analysis was requested but encountered processing challenges. The system attempted to analyze the provided client notes for $insight_type insights. Manual review of the note content may be needed for detailed $insight_type assessment."
+        }
+    ],
+    "next_move": {
+        "priority": "medium",
+        "action": "Review client notes for $insight_type insights",
+        "rationale": "Automated $insight_type analysis encountered issues, manual review recommended"
+    }
+}
+
+
+# Insights fallback rendered once per insight type; callers must deepcopy it before mutating
+_insights_fallback = insights_fallback_renderer(_INSIGHTS_FALLBACK_TEMPLATE)
+
+# Emoji shown next to each note in the formatted prompt
+_STATUS_EMOJI = {"active": "🟢", "inactive": "🟡", "churned": "🔴"}
+
+# Exact-match cache of parsed-OK LLM responses keyed by a hash of provider, model, system
+# message and prompt, so dashboard refreshes for unchanged notes skip the LLM call
+_response_cache = ResponseCache(
+    maxsize=int(os.getenv("NOTE_AGENT_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("NOTE_AGENT_CACHE_TTL", "3600"))
+)
+_get_cached_response = _response_cache.get
+_set_cached_response = _response_cache.set
+
+
+class _Note(NamedTuple):
+    """Fields of one note record used while formatting, read from the dict once"""
+    created_at: Any   # display value; 'N/A' when missing (classified as churned)
+    sort_key: Any     # created_at, or '' when missing or empty
+    title: Any
+    body: str
+    employee_id: Any
+    client_id: Any
+
+    @classmethod
+    def from_record(cls, note: Dict[str, Any]) -> "_Note":
+        """Normalize a note dict, applying the defaults the prompt shows for missing fields"""
+        created_at = note.get('created_at', 'N/A')
+        body = note.get('body')
+        return cls(
+            created_at=created_at,
+            sort_key=note.get('created_at') or '',
+            title=note.get('title', 'Untitled Note'),
+            body='No content available' if body is None else body,
+            employee_id=note.get('employee_id', 'N/A'),
+            client_id=note.get('client_id', 'N/A')
+        )
+
+
+def index_notes_by_client(notes_data: List[Dict[str, Any]]) -> Dict[Any, List[Dict[str, Any]]]:
+    """
+    Group note records by client_id in one pass
+
+    Args:
+        notes_data: List of note records
+
+    Returns:
+        Dictionary mapping each client_id to its notes, in input order
+    """
+    notes_by_client = defaultdict(list)
+    for note in notes_data:
+        notes_by_client[note.get('client_id')].append(note)
+    return notes_by_client
+
 
 class NoteAgent:
     """
@@ -56,11 +323,21 @@ class NoteAgent:
     Next Move format with recent note summary functionality.
     """
 
+    __slots__ = ('model_factory', 'provider', 'model_name', 'client', 'model',
+                 'max_notes', 'max_body_chars')
+
+    # ModelFactory instances shared by every NoteAgent with the same provider, model and keys,
+    # so agents created per request reuse one initialized provider client
+    _factories: Dict[tuple, ModelFactory] = {}
+    _factories_lock = threading.Lock()
+
     def __init__(self,
                  provider: str = "gemini",
                  model_name: str = None,
                  google_api_key: str = None,
-                 openai_api_key: str = None):
+                 openai_api_key: str = None,
+                 max_notes: int = MAX_NOTES_IN_PROMPT,
+                 max_body_chars: int = MAX_NOTE_BODY_CHARS):
         """
         Initialize the Note Agent with multi-provider support
 
@@ -69,15 +346,14 @@ class NoteAgent:
             model_name: Specific model to use (if None, uses defaults)
             google_api_key: Google AI API key (if not provided, uses environment variable)
             openai_api_key: OpenAI API key (if not provided, uses environment variable)
+            max_notes: Most recent notes listed in the prompt; older ones are only counted
+            max_body_chars: Characters of each note body included in the prompt
         """
-        # Initialize model factory
-        self.model_factory = ModelFactory.create_for_agent(
-            agent_name="Note Agent",
-            provider=provider,
-            model_name=model_name,
-            google_api_key=google_api_key,
-            openai_api_key=openai_api_key
-        )
+        self.max_notes = max_notes
+        self.max_body_chars = max_body_chars
+
+        # Initialize model factory (shared with other agents using the same settings)
+        self.model_factory = self._get_model_factory(provider, model_name, google_api_key, openai_api_key)
 
         # Get model info for backward compatibility
         model_info = self.model_factory.get_model_info()
@@ -86,6 +362,43 @@ class NoteAgent:
         self.client = model_info.client  # For OpenAI
         self.model = model_info.model    # For Gemini
 
+    @classmethod
+    def _get_model_factory(cls,
+                           provider: str,
+                           model_name: Optional[str],
+                           google_api_key: Optional[str],
+                           openai_api_key: Optional[str]) -> ModelFactory:
+        """
+        Return the shared ModelFactory for these settings, creating it on first use
+
+        Args:
+            provider: AI provider to use
+            model_name: Specific model to use (if None, uses defaults)
+            google_api_key: Google AI API key
+            openai_api_key: OpenAI API key
+
+        Returns:
+            ModelFactory instance
+        """
+        key = (provider, model_name, google_api_key, openai_api_key)
+        with cls._factories_lock:
+            model_factory = cls._factories.get(key)
+            if model_factory is None:
+                model_factory = cls._factories[key] = ModelFactory.create_for_agent(
+                    agent_name="Note Agent",
+                    provider=provider,
+                    model_name=model_name,
+                    google_api_key=google_api_key,
+                    openai_api_key=openai_api_key
+                )
+        return model_factory
+
+    @classmethod
+    def clear_factories(cls) -> None:
+        """Drop the shared ModelFactory instances; agents created afterwards get new ones"""
+        with cls._factories_lock:
+            cls._factories.clear()
+
     def _generate_content(self, prompt: str, system_message: str = None) -> str:
         """
         Generate content using the selected provider with enhanced error handling
@@ -99,12 +412,27 @@ class NoteAgent:
 
         return self.model_factory.generate_content(prompt, system_message)
 
-    def _determine_activity_status(self, note_date: str) -> str:
+    async def _agenerate_content(self, prompt: str, system_message: str = None) -> str:
+        """
+        Async variant of _generate_content, bounded by the in-flight limit shared with the other
+        agents (see _llm_limiter)
+
+        Args:
+            prompt: The user prompt
+            system_message: Optional system message for better context
+        """
+        if system_message is None:
+            system_message = "You are an expert client relationship analyst with expertise in analyzing employee-client notes, extracting key insights, and providing actionable recommendations. You must follow the specified JSON output format exactly, including Activities/Insights/Next Move structure with proper formatting."
+
+        return await get_llm_inflight_limiter().submit(self.model_factory, prompt, system_message)
+
+    def _determine_activity_status(self, note_date: str, now: datetime = None) -> str:
         """
         Determine activity status based on note timestamp
         
         Args:
             note_date: ISO format date string
+            now: Reference time (defaults to datetime.now(); pass it in when classifying many notes)
             
         Returns:
             Status: 'active' if <7 days, 'inactive' if >7 days, 'churned' if no notes
@@ -115,12 +443,12 @@ class NoteAgent:
             
             # Parse the date
             if isinstance(note_date, str):
-                note_dt = datetime.fromisoformat(note_date.replace('Z', '+00:00'))
+                note_dt = _parse_iso(note_date)
             else:
                 note_dt = note_date
             
             # Calculate days since note
-            days_since = (datetime.now() - note_dt).days
+            days_since = ((now or datetime.now()) - note_dt).days
             
             if days_since < 7:
                 return "active"
@@ -130,6 +458,38 @@ class NoteAgent:
         except Exception:
             return "churned"
 
+    def _compute_statuses(self, note_dates: List[Any], now: datetime = None) -> List[str]:
+        """
+        Determine the activity status of many note dates in one pass
+
+        Large lists are parsed with a single pandas.to_datetime call and classified with
+        NumPy; lists with timezone-aware or otherwise mixed dates, and small lists, use
+        _determine_activity_status per date. Both paths give the same result.
+
+        Args:
+            note_dates: ISO date strings or datetime objects
+            now: Reference time (defaults to datetime.now())
+
+        Returns:
+            Status for each date, in input order
+        """
+        now = now or datetime.now()
+
+        if PANDAS_AVAILABLE and len(note_dates) >= PANDAS_STATUS_THRESHOLD:
+            try:
+                dates = pd.to_datetime(pd.Series(note_dates, dtype=object), errors='coerce', format='ISO8601')
+            except (ValueError, TypeError):
+                dates = None
+
+            # Naive datetimes only; aware ones cannot be compared with datetime.now() and are 'churned'
+            if dates is not None and dates.dtype.kind == 'M' and getattr(dates.dt, 'tz', None) is None:
+                days_since = (now - dates).dt.days.to_numpy()
+                statuses = np.where(dates.isna().to_numpy(), "churned",
+                                    np.where(days_since < 7, "active", "inactive"))
+                return statuses.tolist()
+
+        return [self._determine_activity_status(note_date, now) for note_date in note_dates]
+
     def _format_date_safely(self, date_value) -> str:
         """
         Safely format a date value that could be a datetime object or string.
@@ -171,25 +531,22 @@ class NoteAgent:
         Returns:
             Dictionary with most recent note summary information
         """
-        # Filter notes
-        filtered_notes = notes_data
-        
-        # Further filter by employee and client if specified
-        if employee_id is not None:
-            filtered_notes = [n for n in filtered_notes if n.get('employee_id') == employee_id]
-        if client_id is not None:
-            filtered_notes = [n for n in filtered_notes if n.get('client_id') == client_id]
-        
-        if not filtered_notes:
+        # Filter by employee and client (if specified) in one pass, with no intermediate lists
+        matching_notes = (
+            n for n in notes_data
+            if (employee_id is None or n.get('employee_id') == employee_id)
+            and (client_id is None or n.get('client_id') == client_id)
+        )
+
+        # Most recent note; max keeps the first of equal dates, like a stable descending sort
+        most_recent = max(matching_notes, key=lambda x: x.get('created_at') or '', default=None)
+
+        if most_recent is None:
             return {
                 "has_recent_note": False,
                 "message": "No notes found for the specified criteria"
             }
         
-        # Sort by date to get the most recent
-        sorted_notes = sorted(filtered_notes, key=lambda x: x.get('created_at', ''), reverse=True)
-        most_recent = sorted_notes[0]
-        
         # Generate summary of the most recent note
         title = most_recent.get('title', '')
         body = most_recent.get('body', '')
@@ -209,13 +566,15 @@ class NoteAgent:
 
     def format_notes_for_analysis(self,
                                  notes_data: List[Dict[str, Any]],
-                                 context: str = "note_analysis") -> str:
+                                 context: str = "note_analysis",
+                                 now: datetime = None) -> str:
         """
         Format note data for LLM analysis
 
         Args:
             notes_data: List of note records
             context: Analysis context
+            now: Reference time for every note's activity status (defaults to datetime.now())
 
         Returns:
             Formatted string ready for LLM processing
@@ -223,71 +582,92 @@ class NoteAgent:
         if not notes_data:
             return "No note data available for analysis."
 
-        # Build formatted output
-        formatted_data = f"=== NOTE ANALYSIS CONTEXT: {context.upper()} ===\n"
+        # Read each note's fields once; everything below works on the normalized records
+        notes = [_Note.from_record(note) for note in notes_data]
 
         # Calculate summary statistics
-        total_notes = len(notes_data)
-        recent_notes = len([n for n in notes_data if self._determine_activity_status(n.get('created_at')) == 'active'])
+        total_notes = len(notes)
+        statuses = self._compute_statuses([note.created_at for note in notes], now or datetime.now())
+        recent_notes = statuses.count('active')
 
         # Get client information if available
         client_id = notes_data[0].get('client_id') if notes_data else 'N/A'
 
-        formatted_data += f"""
+        # Collect the sections and join once instead of growing one string
+        parts = [f"""=== NOTE ANALYSIS CONTEXT: {context.upper()} ===
+
 === CURRENT CLIENT NOTE SUMMARY ===
 Client ID: {client_id}
 Total Notes: {total_notes}
 Recent Notes (last 7 days): {recent_notes}
-Analysis Period: {notes_data[0].get('created_at', 'N/A')} to {notes_data[-1].get('created_at', 'N/A')}
+Analysis Period: {notes[0].created_at} to {notes[-1].created_at}
 Focus: Single client note analysis
-"""
-
-        formatted_data += "\n=== INDIVIDUAL NOTE DETAILS ===\n"
-
-        # Sort notes by date (most recent first)
-        sorted_notes = sorted(notes_data, key=lambda x: x.get('created_at', ''), reverse=True)
+"""]
+
+        # Most recent notes first, keeping each note's precomputed status; nlargest matches a
+        # stable descending sort without sorting the notes that are left out of the prompt
+        order = heapq.nlargest(self.max_notes, range(total_notes), key=lambda j: notes[j].sort_key)
+        if len(order) < total_notes:
+            parts.append(f"Truncated: showing {len(order)} of {total_notes} most recent notes\n")
+
+        parts.append("\n=== INDIVIDUAL NOTE DETAILS ===\n")
+
+        max_body_chars = self.max_body_chars
+        for i, j in enumerate(order, 1):
+            note = notes[j]
+            status = statuses[j]
+            body = note.body
+            content = body[:max_body_chars] + '...' if len(body) > max_body_chars else body
+
+            parts.append(f"""
+Note #{i}: {note.title} {_STATUS_EMOJI[status]}
+  Date: {note.created_at}
+  Employee ID: {note.employee_id}
+  Client ID: {note.client_id}
+  Content: {content}
+  Status: {status}
+""")
 
-        for i, note in enumerate(sorted_notes, 1):
-            status = self._determine_activity_status(note.get('created_at'))
-            status_emoji = "🟢" if status == "active" else "🟡" if status == "inactive" else "🔴"
+        return "".join(parts)
 
-            formatted_data += f"""
-Note #{i}: {note.get('title', 'Untitled Note')} {status_emoji}
-  Date: {note.get('created_at', 'N/A')}
-  Employee ID: {note.get('employee_id', 'N/A')}
-  Client ID: {note.get('client_id', 'N/A')}
-  Content: {note.get('body', 'No content available')[:200]}{'...' if len(note.get('body', '')) > 200 else ''}
-  Status: {status}
-"""
+    def _response_cache_key(self, prompt: str, system_message: str) -> str:
+        """
+        Hash everything that determines the LLM response for an exact-match cache lookup
 
-        return formatted_data
+        Args:
+            prompt: The user prompt
+            system_message: System message sent with the prompt
 
-    def analyze_client_notes(self,
-                           notes_data: List[Dict[str, Any]],
-                           client_id: int,
-                           analysis_focus: str = "comprehensive",
-                           employee_id: int = None) -> Dict[str, Any]:
+        Returns:
+            Hex digest identifying the request
         """
-        Analyze client notes for a specific current client with structured JSON output format
+        request = f"{self.provider}|{self.model_name}|{system_message}|{prompt}"
+        return hashlib.blake2b(request.encode(), digest_size=16).hexdigest()
+
+    def _prepare_note_analysis(self,
+                               notes_data: List[Dict[str, Any]],
+                               client_id: int,
+                               analysis_focus: str,
+                               employee_id: int = None,
+                               no_cache: bool = False,
+                               prefiltered: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Filter the client's notes and build the analysis prompt
 
         Args:
             notes_data: List of note records
-            client_id: Current client ID to focus analysis on (REQUIRED)
+            client_id: Current client ID to focus analysis on
             analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
             employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache (cache_key is None)
+            prefiltered: notes_data already holds only this client's notes (see index_notes_by_client)
 
         Returns:
-            Structured JSON with Activities/Insights/Next Move format focused on the current client
+            Dictionary with prompt, system_message, cache_key, client_notes and recent_note_summary,
+            or None if the client has no notes
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
-        logger.info(f"🔍 NoteAgent [Customer {client_id}]: Starting client notes analysis")
-        logger.info(f"📊 NoteAgent [Customer {client_id}]: Received {len(notes_data)} total notes")
-        logger.info(f"🎯 NoteAgent [Customer {client_id}]: Analysis focus: {analysis_focus}, Employee filter: {employee_id}")
-
         # Filter notes for the current client only
-        client_notes = [
+        client_notes = notes_data if prefiltered else [
             note for note in notes_data
             if note.get('client_id') == client_id
         ]
@@ -295,472 +675,712 @@ Note #{i}: {note.get('title', 'Untitled Note')} {status_emoji}
         logger.info(f"📊 NoteAgent [Customer {client_id}]: Found {len(client_notes)} notes for this client")
 
         if not client_notes:
-            logger.warning(f"⚠️ NoteAgent [Customer {client_id}]: No notes found for this client")
-            return {
-                "error": f"No notes found for client_id {client_id}",
-                "client_id": client_id
-            }
+            return None
 
         formatted_data = self.format_notes_for_analysis(client_notes, context=f"note_analysis_for_client_{client_id}")
 
         # Get most recent note summary for current client
         recent_note_summary = self._get_most_recent_note_summary(client_notes, employee_id, client_id)
 
-        focus_prompts = {
-            "comprehensive": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "client_id": 123,
-  "activities": [
-    {
-      "type": "note",
-      "date": "YYYY-MM-DD",
-      "title": "Note title",
-      "content_summary": "Brief summary of note content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Note Patterns",
-      "insight": "Three sentence insight about note-taking patterns and frequency. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Content Analysis",
-      "insight": "Three sentence insight about note content themes and topics. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Relationship Health",
-      "insight": "Three sentence insight about relationship status based on notes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_note_summary": {
-    "has_recent_note": true/false,
-    "note_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "note_title": "Title of most recent note",
-    "content_preview": "First 150 characters of note content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent note"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Specific recommended action",
-    "rationale": "Why this action is recommended"
-  }
-}"""
-        }
+        # Stable system message and note data first, focus-specific instructions last, so
+        # every analysis and insight request for a client shares one cacheable prefix
+        system_message = _SYSTEM_MESSAGE
 
-        system_message = f"""You are an expert client relationship analyst. You MUST return valid JSON in the exact format specified.
+        prompt = f"""{_PROMPT_PREFIX}{formatted_data}
 
-CRITICAL REQUIREMENTS:
-1. Each insight must contain exactly 3 sentences
-2. Activity status must be 'active' if note is <7 days old, 'inactive' if >7 days old, 'decline' if no recent notes
-3. Return only valid JSON - no additional text or formatting
-4. Use the actual note data provided to populate activities and insights
+Focus on {analysis_focus} analysis of the client notes.
 
-Focus on {analysis_focus} analysis of the client notes."""
+{_ANALYSIS_SCHEMAS.get(analysis_focus, _ANALYSIS_SCHEMAS['comprehensive'])}
 
-        prompt = f"""Analyze the following client note data and return structured JSON:
+{_PROMPT_SUFFIX}"""
 
-{formatted_data}
+        return {
+            "prompt": prompt,
+            "system_message": system_message,
+            "cache_key": None if no_cache else self._response_cache_key(prompt, system_message),
+            "client_notes": client_notes,
+            "recent_note_summary": recent_note_summary
+        }
 
-{focus_prompts.get(analysis_focus, focus_prompts['comprehensive'])}
+    def _fill_fallback(self, fallback_result: Dict[str, Any], client_id: int, client_notes: List[Dict[str, Any]]) -> None:
+        """
+        Write the per-request fields into a deep-copied fallback template
 
-IMPORTANT:
-- Return ONLY valid JSON in the specified format
-- Each insight must be exactly 3 sentences
-- Use actual dates and content from the note data
-- Determine activity status based on note timestamps"""
+        Args:
+            fallback_result: Copy of _ANALYSIS_FALLBACK or an _insights_fallback result
+            client_id: Current client ID
+            client_notes: The client's notes; the first one dates the fallback activity
+        """
+        fallback_result['client_id'] = client_id
+        first_created_at = client_notes[0].get('created_at') if client_notes else None
+        fallback_activity = fallback_result['activities'][0]
+        fallback_activity['date'] = self._format_date_safely(first_created_at or '') if client_notes else "N/A"
+        fallback_activity['status'] = self._determine_activity_status(first_created_at)
 
-        response = self._generate_content(prompt, system_message)
+    def _attach_recent_note_summary(self, result: Dict[str, Any], recent_note_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add the most recent note summary to an analysis or insights result
 
-        try:
-            # Clean the response to extract JSON
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
-
-            result = json.loads(response_clean)
-
-            # Add recent note summary to the result
-            if recent_note_summary['has_recent_note']:
-                formatted_date = self._format_date_safely(recent_note_summary['note_date'])
-                result['recent_note_summary'] = {
-                    "has_recent_note": True,
-                    "note_date": formatted_date,
-                    "employee_id": recent_note_summary['employee_id'],
-                    "client_id": recent_note_summary['client_id'],
-                    "note_title": recent_note_summary['note_title'],
-                    "content_preview": recent_note_summary['content_preview'],
-                    "status": recent_note_summary['status'],
-                    "key_points": f"Most recent note from {formatted_date}: {recent_note_summary['note_title']} - {recent_note_summary['content_preview']}"
-                }
-            else:
-                result['recent_note_summary'] = {
-                    "has_recent_note": False,
-                    "message": recent_note_summary.get('message', 'No recent note found')
-                }
+        Args:
+            result: Parsed LLM result or fallback result
+            recent_note_summary: Output of _get_most_recent_note_summary
 
-            return result
-
-        except json.JSONDecodeError:
-            # Fallback structured response if JSON parsing fails
-            fallback_result = {
-                "client_id": client_id,
-                "activities": [
-                    {
-                        "type": "note",
-                        "date": self._format_date_safely(client_notes[0].get('created_at', '')) if client_notes else "N/A",
-                        "title": "Note analysis",
-                        "content_summary": "Client note analysis",
-                        "status": self._determine_activity_status(client_notes[0].get('created_at') if client_notes else None)
-                    }
-                ],
-                "insights": [
-                    {
-                        "category": "Analysis Status",
-                        "insight": "Note analysis was requested but encountered processing challenges. The system attempted to analyze the provided client notes. Manual review of the note content may be needed for detailed insights."
-                    }
-                ],
-                "next_move": {
-                    "priority": "medium",
-                    "action": "Review client notes manually",
-                    "rationale": "Automated analysis encountered issues, manual review recommended"
-                }
+        Returns:
+            The same result dictionary
+        """
+        if recent_note_summary['has_recent_note']:
+            formatted_date = self._format_date_safely(recent_note_summary['note_date'])
+            result['recent_note_summary'] = {
+                "has_recent_note": True,
+                "note_date": formatted_date,
+                "employee_id": recent_note_summary['employee_id'],
+                "client_id": recent_note_summary['client_id'],
+                "note_title": recent_note_summary['note_title'],
+                "content_preview": recent_note_summary['content_preview'],
+                "status": recent_note_summary['status'],
+                "key_points": f"Most recent note from {formatted_date}: {recent_note_summary['note_title']} - {recent_note_summary['content_preview']}"
             }
+        else:
+            result['recent_note_summary'] = {
+                "has_recent_note": False,
+                "message": recent_note_summary.get('message', 'No recent note found')
+            }
+        return result
 
-            # Add recent note summary to fallback result
-            if recent_note_summary['has_recent_note']:
-                formatted_date = self._format_date_safely(recent_note_summary['note_date'])
-                fallback_result['recent_note_summary'] = {
-                    "has_recent_note": True,
-                    "note_date": formatted_date,
-                    "employee_id": recent_note_summary['employee_id'],
-                    "client_id": recent_note_summary['client_id'],
-                    "note_title": recent_note_summary['note_title'],
-                    "content_preview": recent_note_summary['content_preview'],
-                    "status": recent_note_summary['status'],
-                    "key_points": f"Most recent note from {formatted_date}: {recent_note_summary['note_title']} - {recent_note_summary['content_preview']}"
-                }
-            else:
-                fallback_result['recent_note_summary'] = {
-                    "has_recent_note": False,
-                    "message": recent_note_summary.get('message', 'No recent note found')
-                }
+    def _finalize_note_analysis(self, response: str, prepared: Dict[str, Any], client_id: int) -> Dict[str, Any]:
+        """
+        Parse the LLM response for an analysis request, falling back to a structured default
 
-            return fallback_result
+        Args:
+            response: Raw LLM response text
+            prepared: Output of _prepare_note_analysis
+            client_id: Current client ID
 
-    def generate_note_insights(self,
-                             notes_data: List[Dict[str, Any]],
-                             client_id: int,
-                             insight_type: str = "strategic",
-                             employee_id: int = None) -> Dict[str, Any]:
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format
         """
-        Generate specific insights from note data for a specific current client with structured JSON output format
+        client_notes = prepared['client_notes']
+        recent_note_summary = prepared['recent_note_summary']
+
+        try:
+            # Strip markdown code fences in one pass to extract JSON
+            result = _jsonlib.loads(FENCE_RE.sub('', response))
+        except _jsonlib.JSONDecodeError:
+            result = None
+
+        # Only a JSON object is usable (and cacheable); arrays and scalars get the fallback too
+        if isinstance(result, dict):
+            _set_cached_response(prepared['cache_key'], response)
+            return self._attach_recent_note_summary(result, recent_note_summary)
+
+        # Fallback structured response if the reply is not a JSON object
+        fallback_result = copy.deepcopy(_ANALYSIS_FALLBACK)
+        self._fill_fallback(fallback_result, client_id, client_notes)
+        return self._attach_recent_note_summary(fallback_result, recent_note_summary)
+
+    def analyze_client_notes(self,
+                           notes_data: List[Dict[str, Any]],
+                           client_id: int,
+                           analysis_focus: str = "comprehensive",
+                           employee_id: int = None,
+                           no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Analyze client notes for a specific current client with structured JSON output format
 
         Args:
             notes_data: List of note records
             client_id: Current client ID to focus analysis on (REQUIRED)
-            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
             employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
 
         Returns:
             Structured JSON with Activities/Insights/Next Move format focused on the current client
         """
-        # Filter notes for the current client only
-        client_notes = [
-            note for note in notes_data
-            if note.get('client_id') == client_id
-        ]
+        logger.info(f"🔍 NoteAgent [Customer {client_id}]: Starting client notes analysis")
+        logger.info(f"📊 NoteAgent [Customer {client_id}]: Received {len(notes_data)} total notes")
+        logger.info(f"🎯 NoteAgent [Customer {client_id}]: Analysis focus: {analysis_focus}, Employee filter: {employee_id}")
 
-        if not client_notes:
+        return self._analyze_client_notes(notes_data, client_id, analysis_focus, employee_id, no_cache)
+
+    def _analyze_client_notes(self,
+                              notes_data: List[Dict[str, Any]],
+                              client_id: int,
+                              analysis_focus: str,
+                              employee_id: int = None,
+                              no_cache: bool = False,
+                              prefiltered: bool = False) -> Dict[str, Any]:
+        """
+        Prepare, generate and finalize one client's note analysis
+
+        Args:
+            notes_data: List of note records (only this client's when prefiltered)
+            client_id: Current client ID to focus analysis on
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+            prefiltered: notes_data already holds only this client's notes
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        prepared = self._prepare_note_analysis(notes_data, client_id, analysis_focus, employee_id, no_cache, prefiltered)
+
+        if prepared is None:
+            logger.warning(f"⚠️ NoteAgent [Customer {client_id}]: No notes found for this client")
             return {
                 "error": f"No notes found for client_id {client_id}",
                 "client_id": client_id
             }
 
-        formatted_data = self.format_notes_for_analysis(client_notes, context=f"note_insights_generation_for_client_{client_id}")
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = self._generate_content(prepared['prompt'], prepared['system_message'])
 
-        # Get most recent note summary for current client
-        recent_note_summary = self._get_most_recent_note_summary(client_notes, employee_id, client_id)
+        return self._finalize_note_analysis(response, prepared, client_id)
 
-        insight_prompts = {
-            "strategic": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "client_id": 123,
-  "activities": [
-    {
-      "type": "note",
-      "date": "YYYY-MM-DD",
-      "title": "Note title",
-      "content_summary": "Brief summary of note content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Strategic Note Opportunities",
-      "insight": "Three sentence insight about strategic opportunities identified in client notes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Relationship Development",
-      "insight": "Three sentence insight about relationship building through note documentation. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Business Impact Assessment",
-      "insight": "Three sentence insight about business impact documented in notes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_note_summary": {
-    "has_recent_note": true/false,
-    "note_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "note_title": "Title of most recent note",
-    "content_preview": "First 150 characters of note content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent note"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Strategic action based on note analysis",
-    "rationale": "Strategic reasoning for recommended action"
-  }
-}""",
+    def analyze_client_notes_bytes(self,
+                                   notes_data: List[Dict[str, Any]],
+                                   client_id: int,
+                                   analysis_focus: str = "comprehensive",
+                                   employee_id: int = None,
+                                   no_cache: bool = False) -> bytes:
+        """
+        analyze_client_notes serialized to JSON bytes for the HTTP layer
 
-            "tactical": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "client_id": 123,
-  "activities": [
-    {
-      "type": "note",
-      "date": "YYYY-MM-DD",
-      "title": "Note title",
-      "content_summary": "Brief summary of note content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Immediate Action Items",
-      "insight": "Three sentence insight about immediate actions needed based on notes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Process Improvements",
-      "insight": "Three sentence insight about process improvements identified from note patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Client Service Optimization",
-      "insight": "Three sentence insight about optimizing client service based on notes. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_note_summary": {
-    "has_recent_note": true/false,
-    "note_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "note_title": "Title of most recent note",
-    "content_preview": "First 150 characters of note content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent note"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Tactical action for immediate implementation",
-    "rationale": "Tactical reasoning for recommended action"
-  }
-}""",
+        Routes can return these directly (Response(content=..., media_type='application/json'))
+        instead of re-encoding the dict through jsonable_encoder and the stdlib json module.
 
-            "relationship": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "client_id": 123,
-  "activities": [
-    {
-      "type": "note",
-      "date": "YYYY-MM-DD",
-      "title": "Note title",
-      "content_summary": "Brief summary of note content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Relationship Health",
-      "insight": "Three sentence insight about current relationship health based on note content and frequency. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Client Engagement Levels",
-      "insight": "Three sentence insight about client engagement levels and interaction patterns. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Trust and Communication Indicators",
-      "insight": "Three sentence insight about trust and communication indicators in note documentation. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_note_summary": {
-    "has_recent_note": true/false,
-    "note_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "note_title": "Title of most recent note",
-    "content_preview": "First 150 characters of note content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent note"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Relationship-focused action",
-    "rationale": "Relationship-based reasoning for recommended action"
-  }
-}""",
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
 
-            "content": """REQUIRED JSON OUTPUT FORMAT:
-{
-  "client_id": 123,
-  "activities": [
-    {
-      "type": "note",
-      "date": "YYYY-MM-DD",
-      "title": "Note title",
-      "content_summary": "Brief summary of note content",
-      "status": "active/inactive/decline"
-    }
-  ],
-  "insights": [
-    {
-      "category": "Note Content Themes",
-      "insight": "Three sentence insight about recurring themes and topics in note content. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Information Quality",
-      "insight": "Three sentence insight about quality and completeness of information documented. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    },
-    {
-      "category": "Documentation Effectiveness",
-      "insight": "Three sentence insight about effectiveness of note-taking and documentation practices. Each insight must contain exactly three sentences. This provides proper structure and readability."
-    }
-  ],
-  "recent_note_summary": {
-    "has_recent_note": true/false,
-    "note_date": "YYYY-MM-DD",
-    "employee_id": 123,
-    "client_id": 456,
-    "note_title": "Title of most recent note",
-    "content_preview": "First 150 characters of note content...",
-    "status": "active/inactive/decline",
-    "key_points": "Summary of main points from the most recent note"
-  },
-  "next_move": {
-    "priority": "high/medium/low",
-    "action": "Content-focused improvement action",
-    "rationale": "Content-based reasoning for recommended action"
-  }
-}"""
+        Returns:
+            UTF-8 encoded JSON of the analysis result
+        """
+        return _jsonlib.dumps_bytes(self.analyze_client_notes(notes_data, client_id, analysis_focus, employee_id, no_cache))
+
+    def analyze_many_clients(self,
+                             notes_data: List[Dict[str, Any]],
+                             client_ids: List[int],
+                             analysis_focus: str = "comprehensive",
+                             employee_id: int = None,
+                             no_cache: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze client notes for several clients, indexing the notes by client once
+
+        Args:
+            notes_data: List of note records covering all requested clients
+            client_ids: Client IDs to analyze
+            analysis_focus: Focus area applied to every client
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Dictionary mapping each client ID to its analysis result
+        """
+        notes_by_client = index_notes_by_client(notes_data)
+
+        return {
+            client_id: self._analyze_client_notes(notes_by_client.get(client_id, []), client_id, analysis_focus,
+                                                  employee_id, no_cache, prefiltered=True)
+            for client_id in client_ids
         }
 
-        system_message = f"""You are an expert client relationship analyst. You MUST return valid JSON in the exact format specified.
+    def analyze_many(self,
+                     notes_by_client: Dict[int, List[Dict[str, Any]]],
+                     analysis_focuses: Tuple[str, ...] = ("comprehensive",),
+                     employee_id: int = None,
+                     no_cache: bool = False) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """
+        Run several analysis focuses for many clients, ordered for provider prefix caching
 
-CRITICAL REQUIREMENTS:
-1. Each insight must contain exactly 3 sentences
-2. Activity status must be 'active' if note is <7 days old, 'inactive' if >7 days old, 'decline' if no recent notes
-3. Return only valid JSON - no additional text or formatting
-4. Use the actual note data provided to populate activities and insights
+        All prompts are prepared first and then sent one after another in lexicographic
+        (system message, prompt) order, which places requests sharing the longest common
+        prefix next to each other. Every focus for a client shares the system message and
+        note data, so they go back-to-back while that prefix is still in the provider cache.
 
-Focus on {insight_type} insights from the client notes."""
+        Args:
+            notes_by_client: Dictionary mapping each client ID to that client's notes
+            analysis_focuses: Focus areas to run for every client
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
 
-        prompt = f"""Generate {insight_type} insights from the following client note data and return structured JSON:
+        Returns:
+            Dictionary mapping each client ID to {analysis focus: analysis result}
+        """
+        results = {client_id: {} for client_id in notes_by_client}
+        requests = []
+
+        for client_id, client_notes in notes_by_client.items():
+            for analysis_focus in analysis_focuses:
+                prepared = self._prepare_note_analysis(client_notes, client_id, analysis_focus, employee_id,
+                                                       no_cache, prefiltered=True)
+                if prepared is None:
+                    results[client_id][analysis_focus] = {
+                        "error": f"No notes found for client_id {client_id}",
+                        "client_id": client_id
+                    }
+                else:
+                    requests.append((client_id, analysis_focus, prepared))
 
-{formatted_data}
+        requests.sort(key=lambda request: (request[2]['system_message'], request[2]['prompt']))
 
-{insight_prompts.get(insight_type, insight_prompts['strategic'])}
+        for client_id, analysis_focus, prepared in requests:
+            response = _get_cached_response(prepared['cache_key'])
+            if response is None:
+                response = self._generate_content(prepared['prompt'], prepared['system_message'])
+            results[client_id][analysis_focus] = self._finalize_note_analysis(response, prepared, client_id)
 
-IMPORTANT:
-- Return ONLY valid JSON in the specified format
-- Each insight must be exactly 3 sentences
-- Use actual dates and content from the note data
-- Determine activity status based on note timestamps"""
+        return results
+
+    def analyze_clients_batch(self,
+                              notes_by_client: Dict[int, List[Dict[str, Any]]],
+                              analysis_focus: str = "comprehensive",
+                              employee_id: int = None,
+                              no_cache: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze many clients offline through the provider's batch endpoint (see BatchNoteAnalyzer)
+
+        Args:
+            notes_by_client: Dictionary mapping each client ID to that client's notes
+            analysis_focus: Focus area applied to every client
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Dictionary mapping each client ID to its analysis result
+        """
+        return BatchNoteAnalyzer(self).analyze_clients_batch(notes_by_client, analysis_focus, employee_id, no_cache)
+
+    async def a_analyze_client_notes(self,
+                                     notes_data: List[Dict[str, Any]],
+                                     client_id: int,
+                                     analysis_focus: str = "comprehensive",
+                                     employee_id: int = None,
+                                     no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Async variant of analyze_client_notes for concurrent multi-client analysis
+
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        prepared = self._prepare_note_analysis(notes_data, client_id, analysis_focus, employee_id, no_cache)
+
+        if prepared is None:
+            logger.warning(f"⚠️ NoteAgent [Customer {client_id}]: No notes found for this client")
+            return {
+                "error": f"No notes found for client_id {client_id}",
+                "client_id": client_id
+            }
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = await self._agenerate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_note_analysis(response, prepared, client_id)
+
+    async def a_stream_client_notes(self,
+                                    notes_data: List[Dict[str, Any]],
+                                    client_id: int,
+                                    analysis_focus: str = "comprehensive",
+                                    employee_id: int = None,
+                                    no_cache: bool = False) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of analyze_client_notes
+
+        Activities are emitted as soon as each one has been generated, while the model is
+        still writing the insights; the complete structured result follows last.
+
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            analysis_focus: Focus area ("comprehensive", "sentiment", "patterns", "actions")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Yields:
+            ("activity", activity) for each activity, then ("result", full structured result);
+            if the provider fails mid-stream, ("error", details) replaces the result
+        """
+        prepared = self._prepare_note_analysis(notes_data, client_id, analysis_focus, employee_id, no_cache)
 
-        response = self._generate_content(prompt, system_message)
+        if prepared is None:
+            yield "result", {
+                "error": f"No notes found for client_id {client_id}",
+                "client_id": client_id
+            }
+            return
+
+        response = _get_cached_response(prepared['cache_key'])
+
+        if response is None:
+            parser = _jsonlib.ArrayItemStream('activities')
+            stream = get_llm_inflight_limiter().stream(self.model_factory, prepared['prompt'], prepared['system_message'])
+            try:
+                async for chunk in stream:
+                    for activity in parser.feed(chunk):
+                        yield "activity", activity
+            except Exception as e:
+                yield "error", {"error": f"Error generating content with {self.provider}: {e}", "client_id": client_id}
+                return
+            yield "result", self._finalize_note_analysis(parser.text, prepared, client_id)
+            return
+
+        result = self._finalize_note_analysis(response, prepared, client_id)
+        for activity in result.get('activities') or []:
+            yield "activity", activity
+        yield "result", result
+
+    def _prepare_note_insights(self,
+                               notes_data: List[Dict[str, Any]],
+                               client_id: int,
+                               insight_type: str,
+                               employee_id: int = None,
+                               no_cache: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Filter the client's notes and build the insights prompt
+
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache (cache_key is None)
+
+        Returns:
+            Dictionary with prompt, system_message, cache_key, client_notes and recent_note_summary,
+            or None if the client has no notes
+        """
+        # Filter notes for the current client only
+        client_notes = [
+            note for note in notes_data
+            if note.get('client_id') == client_id
+        ]
+
+        if not client_notes:
+            return None
+
+        formatted_data = self.format_notes_for_analysis(client_notes, context=f"note_analysis_for_client_{client_id}")
+
+        # Get most recent note summary for current client
+        recent_note_summary = self._get_most_recent_note_summary(client_notes, employee_id, client_id)
+
+        # Same stable prefix as _prepare_note_analysis; only the tail names the insight type
+        system_message = _SYSTEM_MESSAGE
+
+        prompt = f"""{_PROMPT_PREFIX}{formatted_data}
+
+Generate {insight_type} insights from the client notes above.
+
+{_INSIGHT_SCHEMAS.get(insight_type, _INSIGHT_SCHEMAS['strategic'])}
+
+{_PROMPT_SUFFIX}"""
+
+        return {
+            "prompt": prompt,
+            "system_message": system_message,
+            "cache_key": None if no_cache else self._response_cache_key(prompt, system_message),
+            "client_notes": client_notes,
+            "recent_note_summary": recent_note_summary
+        }
+
+    def _finalize_note_insights(self, response: str, prepared: Dict[str, Any], client_id: int, insight_type: str) -> Dict[str, Any]:
+        """
+        Parse the LLM response for an insights request, falling back to a structured default
+
+        Args:
+            response: Raw LLM response text
+            prepared: Output of _prepare_note_insights
+            client_id: Current client ID
+            insight_type: Type of insights requested
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format
+        """
+        client_notes = prepared['client_notes']
+        recent_note_summary = prepared['recent_note_summary']
 
         try:
-            # Clean the response to extract JSON
-            response_clean = response.strip()
-            if response_clean.startswith('```json'):
-                response_clean = response_clean[7:]
-            if response_clean.endswith('```'):
-                response_clean = response_clean[:-3]
-            response_clean = response_clean.strip()
-
-            result = json.loads(response_clean)
-
-            # Add recent note summary to the result
-            if recent_note_summary['has_recent_note']:
-                formatted_date = self._format_date_safely(recent_note_summary['note_date'])
-                result['recent_note_summary'] = {
-                    "has_recent_note": True,
-                    "note_date": formatted_date,
-                    "employee_id": recent_note_summary['employee_id'],
-                    "client_id": recent_note_summary['client_id'],
-                    "note_title": recent_note_summary['note_title'],
-                    "content_preview": recent_note_summary['content_preview'],
-                    "status": recent_note_summary['status'],
-                    "key_points": f"Most recent note from {formatted_date}: {recent_note_summary['note_title']} - {recent_note_summary['content_preview']}"
-                }
-            else:
-                result['recent_note_summary'] = {
-                    "has_recent_note": False,
-                    "message": recent_note_summary.get('message', 'No recent note found')
-                }
+            # Strip markdown code fences in one pass to extract JSON
+            result = _jsonlib.loads(FENCE_RE.sub('', response))
+        except _jsonlib.JSONDecodeError:
+            result = None
 
-            return result
-
-        except json.JSONDecodeError:
-            # Fallback structured response if JSON parsing fails
-            fallback_result = {
-                "client_id": client_id,
-                "activities": [
-                    {
-                        "type": "note",
-                        "date": self._format_date_safely(note.get('created_at', '')) if client_notes else "N/A",
-                        "title": f"Note {insight_type} analysis",
-                        "content_summary": f"Client note {insight_type} analysis",
-                        "status": self._determine_activity_status(client_notes[0].get('created_at') if client_notes else None)
-                    }
-                ],
-                "insights": [
-                    {
-                        "category": f"{insight_type.title()} Analysis",
-                        "insight": f"Note {insight_type} analysis was requested but encountered processing challenges. The system attempted to analyze the provided client notes for {insight_type} insights. Manual review of the note content may be needed for detailed {insight_type} assessment."
-                    }
-                ],
-                "next_move": {
-                    "priority": "medium",
-                    "action": f"Review client notes for {insight_type} insights",
-                    "rationale": f"Automated {insight_type} analysis encountered issues, manual review recommended"
-                }
+        # Only a JSON object is usable (and cacheable); arrays and scalars get the fallback too
+        if isinstance(result, dict):
+            _set_cached_response(prepared['cache_key'], response)
+            return self._attach_recent_note_summary(result, recent_note_summary)
+
+        # Fallback structured response if the reply is not a JSON object
+        fallback_result = copy.deepcopy(_insights_fallback(insight_type))
+        self._fill_fallback(fallback_result, client_id, client_notes)
+        return self._attach_recent_note_summary(fallback_result, recent_note_summary)
+
+    def generate_note_insights(self,
+                             notes_data: List[Dict[str, Any]],
+                             client_id: int,
+                             insight_type: str = "strategic",
+                             employee_id: int = None,
+                             no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Generate specific insights from note data for a specific current client with structured JSON output format
+
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        prepared = self._prepare_note_insights(notes_data, client_id, insight_type, employee_id, no_cache)
+
+        if prepared is None:
+            return {
+                "error": f"No notes found for client_id {client_id}",
+                "client_id": client_id
             }
 
-            # Add recent note summary to fallback result
-            if recent_note_summary['has_recent_note']:
-                formatted_date = self._format_date_safely(recent_note_summary['note_date'])
-                fallback_result['recent_note_summary'] = {
-                    "has_recent_note": True,
-                    "note_date": formatted_date,
-                    "employee_id": recent_note_summary['employee_id'],
-                    "client_id": recent_note_summary['client_id'],
-                    "note_title": recent_note_summary['note_title'],
-                    "content_preview": recent_note_summary['content_preview'],
-                    "status": recent_note_summary['status'],
-                    "key_points": f"Most recent note from {formatted_date}: {recent_note_summary['note_title']} - {recent_note_summary['content_preview']}"
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = self._generate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_note_insights(response, prepared, client_id, insight_type)
+
+    def generate_note_insights_bytes(self,
+                                     notes_data: List[Dict[str, Any]],
+                                     client_id: int,
+                                     insight_type: str = "strategic",
+                                     employee_id: int = None,
+                                     no_cache: bool = False) -> bytes:
+        """
+        generate_note_insights serialized to JSON bytes for the HTTP layer
+
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            UTF-8 encoded JSON of the insights result
+        """
+        return _jsonlib.dumps_bytes(self.generate_note_insights(notes_data, client_id, insight_type, employee_id, no_cache))
+
+    async def a_generate_note_insights(self,
+                                       notes_data: List[Dict[str, Any]],
+                                       client_id: int,
+                                       insight_type: str = "strategic",
+                                       employee_id: int = None,
+                                       no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Async variant of generate_note_insights for concurrent multi-client analysis
+
+        Args:
+            notes_data: List of note records
+            client_id: Current client ID to focus analysis on (REQUIRED)
+            insight_type: Type of insights ("strategic", "tactical", "relationship", "content")
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Structured JSON with Activities/Insights/Next Move format focused on the current client
+        """
+        prepared = self._prepare_note_insights(notes_data, client_id, insight_type, employee_id, no_cache)
+
+        if prepared is None:
+            return {
+                "error": f"No notes found for client_id {client_id}",
+                "client_id": client_id
+            }
+
+        response = _get_cached_response(prepared['cache_key'])
+        if response is None:
+            response = await self._agenerate_content(prepared['prompt'], prepared['system_message'])
+
+        return self._finalize_note_insights(response, prepared, client_id, insight_type)
+
+
+# Shared factories hold SDK clients bound to the HTTP pools ModelFactory.aclose closes
+ModelFactory.register_close_hook(NoteAgent.clear_factories)
+
+
+class BatchNoteAnalyzer:
+    """
+    Offline note analysis for many clients through the OpenAI Batch API
+
+    Every client's prompt becomes one row of a JSONL batch file; the batch is submitted,
+    polled until it finishes and its output rows are routed back by custom_id (the client
+    ID). Batch requests are billed at half price and take up to BATCH_COMPLETION_WINDOW,
+    so this suits nightly jobs rather than interactive requests. Cached responses are used
+    without a batch row, and providers without a batch endpoint fall back to one request
+    per client.
+    """
+
+    def __init__(self, note_agent: NoteAgent, poll_interval: float = BATCH_POLL_INTERVAL,
+                 max_wait: float = BATCH_MAX_WAIT):
+        """
+        Initialize the batch analyzer
+
+        Args:
+            note_agent: NoteAgent whose prompts, model and response handling are used
+            poll_interval: Seconds between batch status checks
+            max_wait: Seconds to wait for the batch before cancelling it
+        """
+        self.note_agent = note_agent
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+
+    def analyze_clients_batch(self,
+                              notes_by_client: Dict[int, List[Dict[str, Any]]],
+                              analysis_focus: str = "comprehensive",
+                              employee_id: int = None,
+                              no_cache: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        Analyze client notes for every client in one batch job
+
+        Args:
+            notes_by_client: Dictionary mapping each client ID to that client's notes
+            analysis_focus: Focus area applied to every client
+            employee_id: Optional specific employee ID to filter by
+            no_cache: Skip the response cache and always call the LLM
+
+        Returns:
+            Dictionary mapping each client ID to its analysis result
+        """
+        agent = self.note_agent
+        results = {}
+        pending = {}
+
+        for client_id, client_notes in notes_by_client.items():
+            prepared = agent._prepare_note_analysis(client_notes, client_id, analysis_focus, employee_id,
+                                                    no_cache, prefiltered=True)
+            if prepared is None:
+                results[client_id] = {
+                    "error": f"No notes found for client_id {client_id}",
+                    "client_id": client_id
                 }
+                continue
+
+            response = _get_cached_response(prepared['cache_key'])
+            if response is not None:
+                results[client_id] = agent._finalize_note_analysis(response, prepared, client_id)
             else:
-                fallback_result['recent_note_summary'] = {
-                    "has_recent_note": False,
-                    "message": recent_note_summary.get('message', 'No recent note found')
+                pending[client_id] = prepared
+
+        if not pending:
+            return results
+
+        if agent.provider == "openai":
+            responses = self._run_openai_batch(pending)
+        else:
+            logger.warning(f"⚠️ NoteAgent: {agent.provider} has no batch endpoint, analyzing {len(pending)} clients one by one")
+            responses = {
+                client_id: agent._generate_content(prepared['prompt'], prepared['system_message'])
+                for client_id, prepared in pending.items()
+            }
+
+        for client_id, prepared in pending.items():
+            response = responses.get(client_id, f"Error generating content with {agent.provider}: no batch result")
+            results[client_id] = agent._finalize_note_analysis(response, prepared, client_id)
+
+        return results
+
+    def _run_openai_batch(self, pending: Dict[int, Dict[str, Any]]) -> Dict[int, str]:
+        """
+        Submit prepared prompts as one OpenAI batch and wait for the responses
+
+        Args:
+            pending: Dictionary mapping client ID to _prepare_note_analysis output
+
+        Returns:
+            Dictionary mapping client ID to response text (or an error string) for every
+            client the batch answered; clients whose output row is missing or unreadable
+            are left out, so the caller gives them the fallback result
+        """
+        agent = self.note_agent
+        client = agent.client
+        client_ids = {str(client_id): client_id for client_id in pending}
+
+        rows = [
+            _jsonlib.dumps({
+                "custom_id": str(client_id),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": agent.model_name,
+                    "messages": [
+                        {"role": "system", "content": prepared['system_message']},
+                        {"role": "user", "content": prepared['prompt']}
+                    ],
+                    "temperature": 0.3,
+                    "max_tokens": COMPLETION_MAX_TOKENS,
+                    # The prompts ask for one JSON object; JSON mode guarantees it parses
+                    "response_format": {"type": "json_object"}
                 }
+            })
+            for client_id, prepared in pending.items()
+        ]
 
-            return fallback_result
+        try:
+            batch_file = client.files.create(file=("note_analysis_batch.jsonl", "\n".join(rows).encode()), purpose="batch")
+            batch = client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window=BATCH_COMPLETION_WINDOW
+            )
+            logger.info(f"📦 NoteAgent: Submitted batch {batch.id} for {len(rows)} clients")
+
+            deadline = time.monotonic() + self.max_wait
+            while batch.status not in _BATCH_TERMINAL_STATUSES:
+                if time.monotonic() >= deadline:
+                    logger.error(f"❌ NoteAgent: Batch {batch.id} still {batch.status} after {self.max_wait:.0f}s, cancelling it")
+                    client.batches.cancel(batch.id)
+                    return {}
+                time.sleep(self.poll_interval)
+                batch = client.batches.retrieve(batch.id)
+
+            if batch.status != "completed" or not batch.output_file_id:
+                logger.error(f"❌ NoteAgent: Batch {batch.id} ended with status {batch.status}")
+                return {}
+
+            output = client.files.content(batch.output_file_id).text
+        except Exception as e:
+            logger.error(f"❌ NoteAgent: Batch analysis failed: {str(e)}")
+            return {}
+
+        responses = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                row = _jsonlib.loads(line)
+                client_id = client_ids.get(row.get('custom_id'))
+                if client_id is None:
+                    continue
+
+                response = row.get('response') or {}
+                if response.get('status_code') == 200:
+                    responses[client_id] = response['body']['choices'][0]['message']['content']
+                else:
+                    error = row.get('error') or response.get('body', {}).get('error')
+                    responses[client_id] = f"Error generating content with openai: {error}"
+            except (_jsonlib.JSONDecodeError, AttributeError, KeyError, IndexError, TypeError) as e:
+                logger.warning(f"⚠️ NoteAgent: Skipping unreadable row in batch {batch.id} output: {str(e)}")
+
+        logger.info(f"✅ NoteAgent: Batch {batch.id} returned {len(responses)} of {len(rows)} results")
+        return responses
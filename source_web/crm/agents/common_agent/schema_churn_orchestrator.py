@@ -12,15 +12,179 @@ Responsibilities:
 Version: 2.0.0 (Updated for History Pattern Analysis)
 """
 
+import asyncio
+import copy
 import logging
-from typing import Dict, List, Any, Optional
-from .schema_mapper_agent_specialized import SchemaMapperAgent as SpecializedSchemaMapper
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Any, Optional, Tuple, TypedDict
+from agents.model_factory import ModelFactory
+from .schema_mapper_agent_specialized import SchemaAccessError, SchemaMapperAgent as SpecializedSchemaMapper
 from .history_pattern_analysis_agent import HistoryPatternAnalysisAgent
+from . import _jsonlib
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Schema mappings run on a shared pool; concurrent requests for the same table and model
+# join the mapping already in flight instead of repeating the DB introspection and LLM call
+_mapping_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SCHEMA_MAPPING_WORKERS", "4")),
+                                       thread_name_prefix="schema-mapping")
+_inflight_mappings: Dict[Tuple[str, str, Optional[str], str], Future] = {}
+_inflight_lock = threading.Lock()
+
+
+# Specialized agents shared by every orchestrator with the same (provider, model_name, email), so
+# orchestrators created per request reuse the LLM clients and their connection pools. Both agents
+# keep no per-call state (DB connections are borrowed from a thread-safe pool per call and returned
+# before it ends), so sharing them across threads is safe. The pool keeps the AGENT_POOL_SIZE most
+# recently used entries; evicted schema mappers are closed, which releases their DB pools.
+AGENT_POOL_SIZE = int(os.getenv("ORCHESTRATOR_AGENT_POOL_SIZE", "32"))
+_AGENT_POOL: "OrderedDict[Tuple[str, Optional[str], Optional[str]], Tuple[SpecializedSchemaMapper, HistoryPatternAnalysisAgent]]" = OrderedDict()
+_agent_pool_lock = threading.Lock()
+
+# Each orchestration step is retried with jittered exponential backoff before falling back to the
+# error structure; provider hiccups (429/503, timeouts) surface from the agents as step failures
+STEP_ATTEMPTS = int(os.getenv("ORCHESTRATOR_STEP_ATTEMPTS", "3"))
+STEP_BACKOFF_SECONDS = float(os.getenv("ORCHESTRATOR_STEP_BACKOFF_SECONDS", "0.5"))
+STEP_MAX_BACKOFF_SECONDS = float(os.getenv("ORCHESTRATOR_STEP_MAX_BACKOFF_SECONDS", "8"))
+# No retry is started that would end past this many seconds after the step's first attempt
+STEP_RETRY_DEADLINE_SECONDS = float(os.getenv("ORCHESTRATOR_STEP_RETRY_DEADLINE_SECONDS", "30"))
+
+
+def _step_retry_delay(attempt: int, started: float) -> Optional[float]:
+    """
+    Backoff before retrying a step that failed on the given attempt
+
+    Args:
+        attempt: Number of the attempt that just failed (1-based)
+        started: time.monotonic() of the first attempt
+
+    Returns:
+        Seconds to wait, or None when the attempt or time budget is spent
+    """
+    if attempt >= STEP_ATTEMPTS:
+        return None
+    delay = max(STEP_BACKOFF_SECONDS, random.uniform(0, min(STEP_MAX_BACKOFF_SECONDS, STEP_BACKOFF_SECONDS * 2 ** attempt)))
+    if time.monotonic() - started + delay > STEP_RETRY_DEADLINE_SECONDS:
+        return None
+    return delay
+
+
+def _is_permanent_failure(error: Optional[BaseException]) -> bool:
+    """Whether a step failure cannot go away on retry (missing table, no permission), following __cause__"""
+    while error is not None:
+        if isinstance(error, SchemaAccessError):
+            return True
+        error = error.__cause__
+    return False
+
+
+def _discard_inflight(key: Tuple[str, str, Optional[str], str], future: Future) -> None:
+    """Forget a finished mapping future unless a newer one has replaced it"""
+    with _inflight_lock:
+        if _inflight_mappings.get(key) is future:
+            del _inflight_mappings[key]
+
+
+class BucketSignal(TypedDict):
+    """Evidence strength for one feature bucket"""
+    signal_strength: str
+    detail: str
+
+
+class PatternAnalysis(TypedDict, total=False):
+    """Behavioral patterns and per-bucket signals"""
+    detailed_patterns: List[str]
+    positive_signals: List[Any]
+    risk_indicators: List[Any]
+    bucket_signals: Dict[str, BucketSignal]
+
+
+class HistoryPatternResult(TypedDict, total=False):
+    """
+    Combined orchestrator output
+
+    column_mapping, features and pattern_analysis are always present; features and the
+    remaining sections carry LLM-generated content, so their inner keys stay open.
+    """
+    column_mapping: Dict[str, List[Any]]
+    mapping_summary: Dict[str, Any]
+    features: Dict[str, Any]
+    pattern_analysis: PatternAnalysis
+    statistical_methodology: Dict[str, Any]
+    analysis_metadata: Dict[str, Any]
+
+
+_SIGNAL_BUCKETS = ("recency", "frequency", "monetary", "category_dependency", "lifecycle_stage")
+
+# Placeholder sections, copied with copy.deepcopy whenever a result needs one; never hand these out directly
+_EMPTY_COLUMN_MAPPING = {bucket: [] for bucket in _SIGNAL_BUCKETS + ("unmapped",)}
+
+_EMPTY_FEATURES = {
+    "grouping_key_used": "none",
+    "recency": {"days_since_last_purchase": {"value": None, "notes": "not computed"}},
+    "frequency": {"order_count_3m": None, "order_count_prev3m": None},
+    "monetary": {"sales_3m": None, "sales_prev3m": None, "sales_12m": None},
+    "category_dependency": {"top_categories": [], "diversification_score": None},
+    "lifecycle_stage": {"stage_inference": "unknown"}
+}
+
+_EMPTY_BUCKET_SIGNALS = {bucket: {"signal_strength": "weak", "detail": "Not analyzed"} for bucket in _SIGNAL_BUCKETS}
+
+_EMPTY_PATTERN_ANALYSIS = {
+    "detailed_patterns": ["Analysis incomplete"],
+    "positive_signals": [],
+    "risk_indicators": [],
+    "bucket_signals": _EMPTY_BUCKET_SIGNALS
+}
+
+
+def _make_empty_column_mapping() -> Dict[str, List]:
+    """Fresh copy of the empty column mapping"""
+    return copy.deepcopy(_EMPTY_COLUMN_MAPPING)
+
+
+def _make_empty_features() -> Dict[str, Any]:
+    """Fresh copy of the not-computed features section"""
+    return copy.deepcopy(_EMPTY_FEATURES)
+
+
+def _make_empty_pattern_analysis() -> PatternAnalysis:
+    """Fresh copy of the incomplete pattern analysis section"""
+    return copy.deepcopy(_EMPTY_PATTERN_ANALYSIS)
+
+
+# Sections every combined result must contain, with the factory that fills a missing one
+_SECTION_FACTORIES = (
+    ('column_mapping', _make_empty_column_mapping),
+    ('features', _make_empty_features),
+    ('pattern_analysis', _make_empty_pattern_analysis)
+)
+
+# Result reported when the orchestrated analysis fails outright; _failed_result copies it in one
+# deepcopy and fills in detailed_patterns
+_ERROR_RESULT_TEMPLATE: HistoryPatternResult = {
+    "column_mapping": _EMPTY_COLUMN_MAPPING,
+    "features": {
+        "grouping_key_used": "none",
+        "recency": {"days_since_last_purchase": {"value": None, "notes": "analysis failed"}},
+        "frequency": {"order_count_3m": None, "order_count_prev3m": None},
+        "monetary": {"sales_3m": None, "sales_prev3m": None, "sales_12m": None},
+        "category_dependency": {"top_category": None},
+        "lifecycle_stage": {"stage_inference": "unknown"}
+    },
+    "pattern_analysis": {
+        "detailed_patterns": [],
+        "positive_signals": [],
+        "risk_indicators": [],
+        "bucket_signals": {bucket: {"signal_strength": "weak", "detail": "Analysis failed"} for bucket in _SIGNAL_BUCKETS}
+    }
+}
+
 
 class SchemaChurnOrchestratorError(Exception):
     """Custom exception for orchestrator errors"""
@@ -52,20 +216,102 @@ class SchemaChurnOrchestrator:
 
         # Initialize specialized agents
         try:
-            self.schema_mapper = SpecializedSchemaMapper(provider=provider, model_name=model_name, email=email)
-            self.history_analyzer = HistoryPatternAnalysisAgent(provider=provider, model_name=model_name, email=email)
-            logger.info(f"Initialized {self.agent_name} orchestrator with {provider}")
+            key = (provider, model_name, email)
+            evicted = []
+            with _agent_pool_lock:
+                agents = _AGENT_POOL.get(key)
+                if agents is None:
+                    agents = _AGENT_POOL[key] = (
+                        SpecializedSchemaMapper(provider=provider, model_name=model_name, email=email),
+                        HistoryPatternAnalysisAgent(provider=provider, model_name=model_name, email=email)
+                    )
+                    while len(_AGENT_POOL) > AGENT_POOL_SIZE:
+                        evicted.append(_AGENT_POOL.popitem(last=False)[1])
+                else:
+                    _AGENT_POOL.move_to_end(key)
+            self.schema_mapper, self.history_analyzer = agents
+            self._close_agents(evicted)
+            logger.info("Initialized %s orchestrator with %s", self.agent_name, provider)
         except Exception as e:
-            logger.error(f"Failed to initialize orchestrator: {e}")
+            logger.error("Failed to initialize orchestrator: %s", e)
             raise SchemaChurnOrchestratorError(f"Orchestrator initialization failed: {e}")
     
+    @classmethod
+    def clear_pool(cls) -> None:
+        """Drop and close the shared specialized agents, e.g. after rotating API keys"""
+        with _agent_pool_lock:
+            evicted = list(_AGENT_POOL.values())
+            _AGENT_POOL.clear()
+        cls._close_agents(evicted)
+
+    @staticmethod
+    def _close_agents(evicted: List[Tuple[SpecializedSchemaMapper, HistoryPatternAnalysisAgent]]) -> None:
+        """Close agents dropped from the pool; the history analyzer holds nothing to close"""
+        for schema_mapper, _ in evicted:
+            try:
+                schema_mapper.close()
+            except Exception as e:
+                logger.error("Failed to close pooled schema mapper: %s", e)
+
     @property
     def model_name(self) -> str:
         """Get model name from schema mapper agent"""
         return self.schema_mapper.model_name
     
+    def _run_step(self, step: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run one orchestration step, retrying failures with jittered backoff
+
+        Args:
+            step: Step name for logging
+            func: Step callable
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            The step's result; the last failure is re-raised once retries are spent, and
+            failures that cannot go away (see _is_permanent_failure) are re-raised at once
+        """
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = None if _is_permanent_failure(e) else _step_retry_delay(attempt, started)
+                if delay is None:
+                    raise
+                logger.warning("%s failed (attempt %s/%s), retrying in %.1fs: %s", step, attempt, STEP_ATTEMPTS, delay, e)
+                time.sleep(delay)
+                attempt += 1
+
+    async def _arun_step(self, step: str, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """
+        Async variant of _run_step for coroutine steps
+
+        Args:
+            step: Step name for logging
+            func: Coroutine function implementing the step
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            The step's result; the last failure is re-raised once retries are spent, and
+            failures that cannot go away (see _is_permanent_failure) are re-raised at once
+        """
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = None if _is_permanent_failure(e) else _step_retry_delay(attempt, started)
+                if delay is None:
+                    raise
+                logger.warning("%s failed (attempt %s/%s), retrying in %.1fs: %s", step, attempt, STEP_ATTEMPTS, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+
     def analyze_customer_history_patterns(self, table_name: str, target_customer: str = "10003",
-                               timezone: str = "America/Los_Angeles", currency: str = "USD") -> Dict[str, Any]:
+                               timezone: str = "America/Los_Angeles", currency: str = "USD") -> HistoryPatternResult:
         """
         Main method: Analyze customer purchase history patterns
 
@@ -82,15 +328,17 @@ class SchemaChurnOrchestrator:
             Complete history pattern analysis with features, positive_signals, and risk_indicators
         """
         try:
-            logger.info(f"Starting orchestrated Schema-Mapper-to-History-Pattern analysis for table: {table_name}, customer: {target_customer}")
+            logger.info("Starting orchestrated Schema-Mapper-to-History-Pattern analysis for table: %s, customer: %s", table_name, target_customer)
 
-            # Step 1: Schema Mapping
-            logger.info("Step 1: Performing schema mapping...")
-            schema_mapping_result = self.schema_mapper.map_table_schema(table_name)
+            # Step 1: Schema Mapping (shared with concurrent requests for the same table)
+            logger.debug("Step 1: mapping schema for table %s", table_name)
+            schema_mapping_result = self._run_step("Schema mapping", self._map_schema, table_name)
 
             # Step 2: History Pattern Analysis
-            logger.info("Step 2: Performing history pattern analysis...")
-            history_analysis_result = self.history_analyzer.analyze_customer_history_patterns(
+            logger.debug("Step 2: analyzing history patterns for customer %s", target_customer)
+            history_analysis_result = self._run_step(
+                "History pattern analysis",
+                self.history_analyzer.analyze_customer_history_patterns,
                 table_name=table_name,
                 column_mapping=schema_mapping_result,
                 target_customer=target_customer,
@@ -99,49 +347,276 @@ class SchemaChurnOrchestrator:
             )
 
             # Step 3: Combine results
-            logger.info("Step 3: get history pattern insight...")
+            logger.debug("Step 3: combining results for customer %s", target_customer)
             combined_result = self._combine_results(schema_mapping_result, history_analysis_result)
 
-            logger.info(f"Orchestrated analysis completed for {table_name}")
+            logger.info("Orchestrated analysis completed for %s", table_name)
             return combined_result
             
         except Exception as e:
-            logger.error(f"Orchestrated analysis failed: {e}")
+            logger.error("Orchestrated analysis failed: %s", e)
             # Return error structure that matches expected format
-            return {
-                "column_mapping": {
-                    "recency": [],
-                    "frequency": [],
-                    "monetary": [],
-                    "category_dependency": [],
-                    "lifecycle_stage": [],
-                    "unmapped": []
-                },
-                "features": {
-                    "grouping_key_used": "none",
-                    "recency": {"days_since_last_purchase": {"value": None, "notes": "analysis failed"}},
-                    "frequency": {"order_count_3m": None, "order_count_prev3m": None},
-                    "monetary": {"sales_3m": None, "sales_prev3m": None, "sales_12m": None},
-                    "category_dependency": {"top_category": None},
-                    "lifecycle_stage": {"stage_inference": "unknown"}
-                },
-                "pattern_analysis": {
-                    "detailed_patterns": [f"Orchestrated analysis failed: {str(e)}"],
-                    "positive_signals": [],
-                    "risk_indicators": [],
-                    "bucket_signals": {
-                        "recency": {"signal_strength": "weak", "detail": "Analysis failed"},
-                        "frequency": {"signal_strength": "weak", "detail": "Analysis failed"},
-                        "monetary": {"signal_strength": "weak", "detail": "Analysis failed"},
-                        "category_dependency": {"signal_strength": "weak", "detail": "Analysis failed"},
-                        "lifecycle_stage": {"signal_strength": "weak", "detail": "Analysis failed"}
-                    }
-                }
-            }
+            return self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+
+    async def a_analyze_customer_history_patterns(self, table_name: str, target_customer: str = "10003",
+                                                  timezone: str = "America/Los_Angeles",
+                                                  currency: str = "USD") -> HistoryPatternResult:
+        """
+        Async variant of analyze_customer_history_patterns
+
+        The schema mapping runs on the shared mapping pool and is awaited without blocking
+        the event loop; the history analysis then goes through the agent's async path.
+        The two steps stay sequential because the analysis prompt needs the column mapping.
+
+        Args:
+            table_name: Name of the table to analyze
+            target_customer: Specific customer to analyze (default: "10003")
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Returns:
+            Complete history pattern analysis with features, positive_signals, and risk_indicators
+        """
+        try:
+            logger.info("Starting async orchestrated history pattern analysis for table: %s, customer: %s", table_name, target_customer)
+
+            schema_mapping_result = await self._arun_step("Schema mapping", self._amap_schema, table_name)
+
+            history_analysis_result = await self._arun_step(
+                "History pattern analysis",
+                self.history_analyzer.a_analyze_customer_history_patterns,
+                table_name=table_name,
+                column_mapping=schema_mapping_result,
+                target_customer=target_customer,
+                timezone=timezone,
+                currency=currency
+            )
+
+            combined_result = self._combine_results(schema_mapping_result, history_analysis_result)
+
+            logger.info("Async orchestrated analysis completed for %s", table_name)
+            return combined_result
+
+        except Exception as e:
+            logger.error("Async orchestrated analysis failed: %s", e)
+            return self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+
+    def iter_analyze_customer_history_patterns(self, table_name: str, target_customer: str = "10003",
+                                               timezone: str = "America/Los_Angeles",
+                                               currency: str = "USD") -> Iterator[Tuple[str, Any]]:
+        """
+        Progressive variant of analyze_customer_history_patterns
+
+        Yields ('schema', schema_mapping_result) as soon as the schema is mapped, so callers
+        that only need the column mapping can use it before the history analysis finishes.
+        The final event is always ('combined', result), where result is exactly what
+        analyze_customer_history_patterns returns (the error structure on failure).
+
+        Args:
+            table_name: Name of the table to analyze
+            target_customer: Specific customer to analyze (default: "10003")
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Yields:
+            (event, payload) tuples: 'schema' then 'combined'
+        """
+        try:
+            schema_mapping_result = self._run_step("Schema mapping", self._map_schema, table_name)
+        except Exception as e:
+            logger.error("Orchestrated analysis failed: %s", e)
+            yield 'combined', self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+            return
+
+        yield 'schema', schema_mapping_result
+
+        try:
+            history_analysis_result = self._run_step(
+                "History pattern analysis",
+                self.history_analyzer.analyze_customer_history_patterns,
+                table_name=table_name,
+                column_mapping=schema_mapping_result,
+                target_customer=target_customer,
+                timezone=timezone,
+                currency=currency
+            )
+            combined_result = self._combine_results(schema_mapping_result, history_analysis_result)
+        except Exception as e:
+            logger.error("Orchestrated analysis failed: %s", e)
+            combined_result = self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+
+        yield 'combined', combined_result
+
+    async def a_iter_analyze_customer_history_patterns(self, table_name: str, target_customer: str = "10003",
+                                                       timezone: str = "America/Los_Angeles",
+                                                       currency: str = "USD") -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Async variant of iter_analyze_customer_history_patterns
+
+        Args:
+            table_name: Name of the table to analyze
+            target_customer: Specific customer to analyze (default: "10003")
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Yields:
+            (event, payload) tuples: 'schema' then 'combined'
+        """
+        try:
+            schema_mapping_result = await self._arun_step("Schema mapping", self._amap_schema, table_name)
+        except Exception as e:
+            logger.error("Async orchestrated analysis failed: %s", e)
+            yield 'combined', self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+            return
+
+        yield 'schema', schema_mapping_result
+
+        try:
+            history_analysis_result = await self._arun_step(
+                "History pattern analysis",
+                self.history_analyzer.a_analyze_customer_history_patterns,
+                table_name=table_name,
+                column_mapping=schema_mapping_result,
+                target_customer=target_customer,
+                timezone=timezone,
+                currency=currency
+            )
+            combined_result = self._combine_results(schema_mapping_result, history_analysis_result)
+        except Exception as e:
+            logger.error("Async orchestrated analysis failed: %s", e)
+            combined_result = self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+
+        yield 'combined', combined_result
+
+    def analyze_customers_history_patterns(self, table_name: str, target_customers: List[str],
+                                           timezone: str = "America/Los_Angeles",
+                                           currency: str = "USD") -> Dict[str, HistoryPatternResult]:
+        """
+        Analyze purchase history patterns for many customers of one table
+
+        The schema is mapped once and the customers are analyzed in multi-customer LLM
+        requests (see HistoryPatternAnalysisAgent.analyze_customers_batch).
+
+        Args:
+            table_name: Name of the table to analyze
+            target_customers: Customers to analyze
+            timezone: Timezone for date calculations
+            currency: Currency for monetary normalization
+
+        Returns:
+            Dictionary mapping each customer to the same structure analyze_customer_history_patterns returns
+        """
+        try:
+            logger.info("Starting orchestrated history pattern analysis for %s customers on table: %s", len(target_customers), table_name)
+            schema_mapping_result = self._run_step("Schema mapping", self._map_schema, table_name)
+            history_results = self._run_step(
+                "History pattern analysis",
+                self.history_analyzer.analyze_customers_batch,
+                table_name=table_name,
+                column_mapping=schema_mapping_result,
+                target_customers=target_customers,
+                timezone=timezone,
+                currency=currency
+            )
+        except Exception as e:
+            logger.error("Orchestrated batch analysis failed: %s", e)
+            return {customer: self._failed_result(f"Orchestrated analysis failed: {str(e)}") for customer in target_customers}
+
+        results = {}
+        for customer in target_customers:
+            if customer not in history_results:
+                results[customer] = self._failed_result(f"History pattern analysis failed for customer {customer}")
+                continue
+            try:
+                results[customer] = self._combine_results(schema_mapping_result, history_results[customer])
+            except Exception as e:
+                logger.error("Combining results failed for customer %s: %s", customer, e)
+                results[customer] = self._failed_result(f"Orchestrated analysis failed: {str(e)}")
+        return results
+
+    def _failed_result(self, detail: str) -> HistoryPatternResult:
+        """
+        Error structure matching the normal analysis output
+
+        Args:
+            detail: Failure description reported in detailed_patterns
+
+        Returns:
+            Result with empty mappings, unknown features and weak bucket signals
+        """
+        result = copy.deepcopy(_ERROR_RESULT_TEMPLATE)
+        result["pattern_analysis"]["detailed_patterns"].append(detail)
+        return result
+
+    def _map_schema(self, table_name: str) -> Dict[str, Any]:
+        """
+        Map a table schema, joining an identical mapping that is already running
+
+        Finished mappings are cached by the schema mapper itself (keyed on the table's catalog
+        version, so DDL changes are picked up); concurrent callers share one in-flight mapping.
+
+        Args:
+            table_name: Name of the table to analyze
+
+        Returns:
+            Schema mapping result (callers get their own copy of a shared result)
+
+        Raises:
+            SchemaChurnOrchestratorError: If schema mapping fails
+        """
+        future = self._schema_mapping_future(table_name)
+        try:
+            result = future.result()
+        except Exception as e:
+            raise SchemaChurnOrchestratorError(f"Schema mapping failed for {table_name}: {e}") from e
+
+        # Callers mutate their combined result, so a mapping joined by several callers is never handed out
+        return copy.deepcopy(result)
+
+    async def _amap_schema(self, table_name: str) -> Dict[str, Any]:
+        """
+        Async variant of _map_schema; awaits the shared mapping without blocking the event loop
+
+        Args:
+            table_name: Name of the table to analyze
+
+        Returns:
+            Schema mapping result (callers get their own copy of a shared result)
+
+        Raises:
+            SchemaChurnOrchestratorError: If schema mapping fails
+        """
+        future = self._schema_mapping_future(table_name)
+        try:
+            # Shielded so a cancelled caller does not cancel the mapping other callers have joined
+            result = await asyncio.shield(asyncio.wrap_future(future))
+        except Exception as e:
+            raise SchemaChurnOrchestratorError(f"Schema mapping failed for {table_name}: {e}") from e
+
+        return copy.deepcopy(result)
+
+    def _schema_mapping_future(self, table_name: str) -> Future:
+        """Return the in-flight mapping future for a table, submitting one if none is running"""
+        key = (self.provider, self.model_name, self.email, table_name)
+        with _inflight_lock:
+            future = _inflight_mappings.get(key)
+            # A failed mapping may still be registered until its done callback runs; retries must not join it
+            if future is not None and future.done() and (future.cancelled() or future.exception() is not None):
+                future = None
+            joined = future is not None
+            if not joined:
+                future = _inflight_mappings[key] = _mapping_executor.submit(self.schema_mapper.map_table_schema, table_name)
+
+        if joined:
+            logger.debug("Joining schema mapping already in progress for %s", table_name)
+        else:
+            # Registered outside the lock: the callback runs inline if the future is already done
+            future.add_done_callback(lambda done: _discard_inflight(key, done))
+        return future
 
     # Backward compatibility alias
     def analyze_table_for_churn(self, table_name: str, target_customer: str = "10003",
-                               timezone: str = "America/Los_Angeles", currency: str = "USD") -> Dict[str, Any]:
+                               timezone: str = "America/Los_Angeles", currency: str = "USD") -> HistoryPatternResult:
         """
         Backward compatibility method - calls analyze_customer_history_patterns
 
@@ -151,58 +626,60 @@ class SchemaChurnOrchestrator:
         logger.warning("analyze_table_for_churn() is deprecated. Use analyze_customer_history_patterns() instead.")
         return self.analyze_customer_history_patterns(table_name, target_customer, timezone, currency)
 
-    def _combine_results(self, schema_result: Dict[str, Any], history_result: Dict[str, Any]) -> Dict[str, Any]:
+    def _combine_results(self, schema_result: Dict[str, Any], history_result: Dict[str, Any]) -> HistoryPatternResult:
         """
         Combine results from Schema Mapper and History Pattern Analysis agents
 
+        The history result is consumed: it is completed in place and returned, so pass a
+        result that is not used elsewhere (every caller passes a freshly parsed analysis).
+
         Args:
             schema_result: Result from Schema Mapper Agent
             history_result: Result from History Pattern Analysis Agent
 
         Returns:
             Combined result in the expected format
-        """
-        try:
-            # Start with the history analysis result as the base
-            combined = history_result.copy()
-
-            # Ensure column_mapping is from schema result (more authoritative)
-            if 'column_mapping' in schema_result:
-                combined['column_mapping'] = schema_result['column_mapping']
-
-            # Add schema mapping summary if available
-            if 'mapping_summary' in schema_result:
-                combined['mapping_summary'] = schema_result['mapping_summary']
-
-            # Merge statistical methodology from both agents
-            combined_methodology = {}
 
-            # Add schema methodology
-            if 'statistical_methodology' in schema_result:
-                combined_methodology.update(schema_result['statistical_methodology'])
-
-            # Add/override with history analysis methodology
-            if 'statistical_methodology' in history_result:
-                history_methodology = history_result['statistical_methodology']
-                for key, value in history_methodology.items():
-                    if key in combined_methodology and isinstance(combined_methodology[key], dict) and isinstance(value, dict):
-                        combined_methodology[key].update(value)
-                    else:
-                        combined_methodology[key] = value
-
-            if combined_methodology:
-                combined['statistical_methodology'] = combined_methodology
-
-            # Ensure all expected sections are present
-            self._ensure_complete_structure(combined)
-
-            return combined
+        Raises:
+            Exception: Anything other than a malformed methodology propagates, so callers
+                report the standard error structure instead of a partial result
+        """
+        # The history analysis result is the base
+        combined = history_result
+
+        # Ensure column_mapping is from schema result (more authoritative)
+        schema_mapping = schema_result.get('column_mapping')
+        if schema_mapping is not None and schema_mapping is not combined.get('column_mapping'):
+            combined['column_mapping'] = schema_mapping
+
+        # Add schema mapping summary if available
+        mapping_summary = schema_result.get('mapping_summary')
+        if mapping_summary is not None:
+            combined['mapping_summary'] = mapping_summary
+
+        # Merge statistical methodology from both agents; history entries override schema
+        # entries, and entries that are dicts on both sides are merged one level deep.
+        # A methodology present on one side only is used as is.
+        schema_methodology = schema_result.get('statistical_methodology')
+        if schema_methodology:
+            history_methodology = history_result.get('statistical_methodology')
+            try:
+                combined_methodology = {**schema_methodology}
+                if history_methodology:
+                    for key, value in history_methodology.items():
+                        current = combined_methodology.get(key)
+                        combined_methodology[key] = {**current, **value} if isinstance(current, dict) and isinstance(value, dict) else value
+            except (TypeError, AttributeError) as e:
+                # LLM output with a malformed methodology section; keep the history agent's
+                logger.warning("Could not merge statistical methodology: %s", e)
+                combined_methodology = history_methodology or {}
+            combined['statistical_methodology'] = combined_methodology
+
+        # Ensure all expected sections are present
+        self._ensure_complete_structure(combined)
+
+        return combined
 
-        except Exception as e:
-            logger.error(f"Error combining results: {e}")
-            # Return history result as fallback
-            return history_result
-    
     def _ensure_complete_structure(self, result: Dict[str, Any]) -> None:
         """
         Ensure the result has all expected sections
@@ -210,42 +687,10 @@ class SchemaChurnOrchestrator:
         Args:
             result: Result dictionary to validate and complete
         """
-        # Ensure column_mapping exists
-        if 'column_mapping' not in result:
-            result['column_mapping'] = {
-                "recency": [],
-                "frequency": [],
-                "monetary": [],
-                "category_dependency": [],
-                "lifecycle_stage": [],
-                "unmapped": []
-            }
-
-        # Ensure features section exists
-        if 'features' not in result:
-            result['features'] = {
-                "grouping_key_used": "none",
-                "recency": {"days_since_last_purchase": {"value": None, "notes": "not computed"}},
-                "frequency": {"order_count_3m": None, "order_count_prev3m": None},
-                "monetary": {"sales_3m": None, "sales_prev3m": None, "sales_12m": None},
-                "category_dependency": {"top_categories": [], "diversification_score": None},
-                "lifecycle_stage": {"stage_inference": "unknown"}
-            }
-
-        # Ensure pattern_analysis exists
-        if 'pattern_analysis' not in result:
-            result['pattern_analysis'] = {
-                "detailed_patterns": ["Analysis incomplete"],
-                "positive_signals": [],
-                "risk_indicators": [],
-                "bucket_signals": {
-                    "recency": {"signal_strength": "weak", "detail": "Not analyzed"},
-                    "frequency": {"signal_strength": "weak", "detail": "Not analyzed"},
-                    "monetary": {"signal_strength": "weak", "detail": "Not analyzed"},
-                    "category_dependency": {"signal_strength": "weak", "detail": "Not analyzed"},
-                    "lifecycle_stage": {"signal_strength": "weak", "detail": "Not analyzed"}
-                }
-            }
+        # One hash probe per section; the placeholder copy is only made when a section is missing
+        for section, make_empty in _SECTION_FACTORIES:
+            if section not in result:
+                result[section] = make_empty()
     
     # Expose individual agent methods for advanced usage
     def map_schema_only(self, table_name: str) -> Dict[str, Any]:
@@ -258,7 +703,7 @@ class SchemaChurnOrchestrator:
         Returns:
             Schema mapping result
         """
-        return self.schema_mapper.map_table_schema(table_name)
+        return self._map_schema(table_name)
 
     def analyze_history_patterns_only(self, table_name: str, column_mapping: Dict[str, Any],
                           target_customer: str = "10003", timezone: str = "America/Los_Angeles",
@@ -285,14 +730,17 @@ class SchemaChurnOrchestrator:
         )
 
 
+# Pooled agents hold SDK clients bound to the HTTP pools ModelFactory.aclose closes
+ModelFactory.register_close_hook(SchemaChurnOrchestrator.clear_pool)
+
 # For backward compatibility, create an alias
 SchemaMapperAgent = SchemaChurnOrchestrator
 
 
 if __name__ == "__main__":
-    # Test the orchestrator
-    import json
+    logging.basicConfig(level=logging.INFO)
 
+    # Test the orchestrator
     orchestrator = SchemaChurnOrchestrator(provider='openai')
     result = orchestrator.analyze_customer_history_patterns('sales_data', target_customer='10003')
-    print(json.dumps(result, indent=2))
+    print(_jsonlib.dumps_pretty(result))
@@ -1,18 +1,21 @@
 #!/usr/bin/env python3
 """
-Schema-Mapper-to-Churn Agent (Backward Compatible Interface)
+Schema-Mapper-to-Churn Agent (Deprecated Interface)
 
-This file serves as a backward-compatible interface that orchestrates
-the specialized Schema Mapper Agent and Churn Analysis Agent.
-
-The original functionality is preserved while benefiting from the separation
-of concerns provided by the specialized agents.
+DEPRECATED: Import SchemaChurnOrchestrator (or its SchemaMapperAgent alias) from
+agents.common_agent.schema_churn_orchestrator instead. This module only re-exports
+the alias for code that still imports it from here.
 
 Version: 3.0.0 (Refactored with Specialized Agents)
 """
 
-# Import the orchestrator and expose it as SchemaMapperAgent for backward compatibility
-from .schema_churn_orchestrator import SchemaChurnOrchestrator
+import warnings
+
+from .schema_churn_orchestrator import SchemaChurnOrchestrator, SchemaMapperAgent
 
-# Create alias for backward compatibility
-SchemaMapperAgent = SchemaChurnOrchestrator
+warnings.warn(
+    "agents.common_agent.schema_mapper_agent is deprecated; import SchemaChurnOrchestrator "
+    "from agents.common_agent.schema_churn_orchestrator instead",
+    DeprecationWarning,
+    stacklevel=2
+)
@@ -13,169 +13,135 @@ Version: 1.0.0 (Specialized Schema Mapper Agent)
 """
 
 import os
+import copy
+import hashlib
 import json
 import logging
+import re
+import threading
 import psycopg2
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.pool import ThreadedConnectionPool
+from typing import Dict, List, Any, Optional, Tuple
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from agents.model_factory import ModelFactory
+from agents.common_agent import _jsonlib
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connection pools keyed by database config, so every agent routed to the same database reuses
+# warm connections instead of paying connect + auth on each schema read. ThreadedConnectionPool
+# raises instead of waiting when it is exhausted, so each pool is paired with a semaphore that
+# makes callers wait (up to DB_POOL_WAIT_SECONDS) for a free connection. _db_pool_users counts the
+# agents attached to each pool; SchemaMapperAgent.close closes a pool once its last agent detaches.
+DB_POOL_MAX_CONNECTIONS = int(os.getenv("SCHEMA_MAPPER_DB_POOL_SIZE", "10"))
+DB_POOL_WAIT_SECONDS = float(os.getenv("SCHEMA_MAPPER_DB_POOL_WAIT_SECONDS", "30"))
+_db_pools: Dict[Tuple, Tuple[ThreadedConnectionPool, threading.BoundedSemaphore]] = {}
+_db_pool_users: Dict[Tuple, int] = {}
+_db_pools_lock = threading.Lock()
 
-class SchemaMappingError(Exception):
-    """Custom exception for schema mapping errors"""
-    pass
 
-
-class SchemaMapperAgent:
+def close_db_pools() -> None:
     """
-    Schema Mapper Agent
-    
-    Analyzes database table schemas and maps columns to churn analysis feature buckets
-    using LLM-powered semantic classification.
+    Close every shared database connection pool
+
+    Call from the application shutdown hook. Agents that are used again afterwards open
+    new pools on their next connection.
     """
-    
-    def __init__(self, provider: str = 'openai', model_name: Optional[str] = None, email: Optional[str] = None):
-        """
-        Initialize the Schema Mapper Agent
-        
-        Args:
-            provider: LLM provider ('openai' or 'gemini')
-            model_name: Specific model name (optional)
-            email: User email for database routing (optional)
-        """
-        self.agent_name = "Schema Mapper Agent"
-        self.version = "1.0.0"
-        self.provider = provider
-        self.email = email
-        
-        # Initialize LLM
-        try:
-            self.model_factory = ModelFactory(provider=provider, model_name=model_name)
-            self.model_name = self.model_factory.model_name
-            logger.info(f"Initialized {self.agent_name} with {provider} ({self.model_name})")
-        except Exception as e:
-            logger.error(f"Failed to initialize LLM: {e}")
-            raise SchemaMappingError(f"LLM initialization failed: {e}")
-    
-    def get_db_connection(self) -> psycopg2.extensions.connection:
-        """Get database connection using CRM router pattern"""
-        try:
-            # Try to use CRM router's connection function
-            try:
-                from routers.crm_data_router import get_db_connection as crm_get_db_connection
-                conn = crm_get_db_connection(self.email)
-                logger.info(f"Database connection established using CRM router")
-                return conn
-            except ImportError:
-                logger.warning("Could not import CRM router, using direct connection")
-                pass
-            
-            # Fallback to direct connection
-            config = {
-                'host': os.getenv('SESSIONS_DB_HOST'),
-                'port': int(os.getenv('SESSIONS_DB_PORT', 5432)),
-                'database': os.getenv('SESSIONS_DB_NAME'),
-                'user': os.getenv('SESSIONS_DB_USER'),
-                'password': os.getenv('SESSIONS_DB_PASSWORD')
-            }
-            conn = psycopg2.connect(**config)
-            logger.info(f"Database connection established successfully")
-            return conn
-        except Exception as e:
-            logger.error(f"Database connection failed: {e}")
-            raise SchemaMappingError(f"Database connection failed: {e}")
-    
-    def get_table_schema(self, table_name: str) -> List[Dict[str, Any]]:
-        """Get table schema with column metadata and sample values"""
-        try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get column information with data types and sample values
-            query = """
-            SELECT 
-                column_name,
-                data_type,
-                is_nullable,
-                column_default
-            FROM information_schema.columns 
-            WHERE table_name = %s 
-            ORDER BY ordinal_position;
-            """
-            
-            cursor.execute(query, (table_name,))
-            columns = cursor.fetchall()
-            
-            if not columns:
-                raise SchemaMappingError(f"Table '{table_name}' not found or has no columns")
-            
-            # Get sample values for each column
-            schema = []
-            for col_name, data_type, is_nullable, default_val in columns:
-                try:
-                    # Get sample values (non-null, distinct)
-                    sample_query = f"""
-                    SELECT DISTINCT "{col_name}" 
-                    FROM {table_name} 
-                    WHERE "{col_name}" IS NOT NULL 
-                    LIMIT 5
-                    """
-                    cursor.execute(sample_query)
-                    sample_values = [str(row[0]) for row in cursor.fetchall()]
-                    
-                    schema.append({
-                        'column_name': col_name,
-                        'data_type': data_type,
-                        'is_nullable': is_nullable,
-                        'default_value': default_val,
-                        'sample_values': sample_values
-                    })
-                except Exception as e:
-                    logger.warning(f"Could not get sample values for column {col_name}: {e}")
-                    schema.append({
-                        'column_name': col_name,
-                        'data_type': data_type,
-                        'is_nullable': is_nullable,
-                        'default_value': default_val,
-                        'sample_values': []
-                    })
-            
-            cursor.close()
-            conn.close()
-            
-            logger.info(f"Retrieved schema for {table_name}: {len(schema)} columns")
-            return schema
-            
-        except Exception as e:
-            logger.error(f"Error getting table schema: {e}")
-            raise SchemaMappingError(f"Schema retrieval failed: {e}")
-    
-    def _build_schema_mapping_prompt(self, table_name: str, schema: List[Dict[str, Any]]) -> str:
-        """Build prompt for LLM-powered schema mapping"""
-        
-        # Build schema description
-        schema_description = f"Table: {table_name}\n"
-        schema_description += f"Total Columns: {len(schema)}\n\n"
-        
-        for i, col in enumerate(schema, 1):
-            col_name = col['column_name']
-            data_type = col['data_type']
-            sample_values = col.get('sample_values', [])
-            sample_str = ', '.join(sample_values[:3]) if sample_values else 'No samples'
-            
-            schema_description += f"{i:2d}. {col_name} ({data_type})\n"
-            schema_description += f"    Sample values: {sample_str}\n"
-        
-        prompt = f"""You are a database schema analysis expert. Analyze the following table schema and map columns to churn analysis feature buckets.
+    with _db_pools_lock:
+        pools = list(_db_pools.values())
+        _db_pools.clear()
+        _db_pool_users.clear()
+    for pool, _ in pools:
+        pool.closeall()
+    if pools:
+        logger.info(f"Closed {len(pools)} database connection pools")
+
+# Distinct non-null sample values fetched per column for the mapping prompt
+SAMPLE_VALUES_PER_COLUMN = 5
+# Columns classified from name and type alone: binary/document types, and id/uuid/guid keys
+# whose values carry no signal for the mapping prompt
+_UNSAMPLED_DATA_TYPES = frozenset({'bytea', 'json', 'jsonb', 'xml', 'uuid'})
+_UNSAMPLED_COLUMN_RE = re.compile(r'(?:^|_)(?:id|uuid|guid)$', re.IGNORECASE)
+# Rows read once into the sampling CTE; per-column samples are taken from these rows only
+SAMPLE_ROWS = int(os.getenv("SCHEMA_MAPPER_SAMPLE_ROWS", "10000"))
+# Sample values shown per column in the mapping prompt, each cut to PROMPT_SAMPLE_MAX_CHARS
+PROMPT_SAMPLES_PER_COLUMN = 3
+PROMPT_SAMPLE_MAX_CHARS = 20
+# Column budget of one multi-table mapping call; the reply (reasons for every column) has to
+# fit the model's completion limit, so larger sets of tables are split over several calls.
+# Each table also costs its column_mapping object with six bucket keys, counted as
+# BATCH_TABLE_OVERHEAD_COLUMNS columns
+BATCH_MAX_COLUMNS = int(os.getenv("SCHEMA_MAPPER_BATCH_MAX_COLUMNS", "40"))
+BATCH_TABLE_OVERHEAD_COLUMNS = 2
+
+_DATE_TYPES = frozenset({'date', 'timestamp without time zone', 'timestamp with time zone'})
+_NUMERIC_TYPES = frozenset({'numeric', 'money', 'real', 'double precision', 'integer', 'bigint', 'smallint'})
+_TEXT_TYPES = frozenset({'text', 'character varying', 'character'})
 
-{schema_description}
+# Columns obvious from name and type alone: (bucket, subtype, name pattern, allowed data types or
+# None for any, confidence). They are classified here, left out of the mapping prompt and merged
+# into the LLM's column_mapping afterwards; the first matching rule wins. Ruled columns are never
+# shown to the LLM, so patterns only match exact, unambiguous names; anything else (e.g. other
+# *_date columns such as ship_date or first_purchase_date) is left to the model.
+_COLUMN_RULES: List[Tuple[str, str, re.Pattern, Optional[frozenset], float]] = [
+    ('lifecycle_stage', 'customer_id', re.compile(r'^(?:customer|client|account)_(?:id|no|number|code)$', re.IGNORECASE), None, 0.95),
+    ('frequency', 'order_id', re.compile(r'^(?:order|transaction|invoice)_(?:id|no|number)$', re.IGNORECASE), None, 0.9),
+    ('recency', 'update_timestamp', re.compile(r'^(?:updated|modified|last_modified)(?:_at|_on|_date)?$', re.IGNORECASE), _DATE_TYPES, 0.9),
+    ('recency', 'primary_date', re.compile(r'^(?:order|transaction|invoice|sale|purchase|payment)_(?:date|at|time|timestamp)$', re.IGNORECASE), _DATE_TYPES, 0.95),
+    ('recency', 'secondary_date', re.compile(r'^created(?:_at|_on|_date)?$', re.IGNORECASE), _DATE_TYPES, 0.8),
+    ('frequency', 'quantity', re.compile(r'^(?:quantity|qty)$', re.IGNORECASE), _NUMERIC_TYPES, 0.9),
+    ('monetary', 'cost', re.compile(r'^(?:unit_|total_)?cost$', re.IGNORECASE), _NUMERIC_TYPES, 0.9),
+    ('monetary', 'profit', re.compile(r'^(?:gross_|net_)?profit$', re.IGNORECASE), _NUMERIC_TYPES, 0.9),
+    ('monetary', 'total', re.compile(r'^total(?:_amount|_price|_sales|_revenue)?$', re.IGNORECASE), _NUMERIC_TYPES, 0.9),
+    ('monetary', 'amount', re.compile(r'^(?:amount|price|unit_price|revenue|sales|sales_amount|net_amount|gross_amount)$', re.IGNORECASE), _NUMERIC_TYPES, 0.9),
+    ('lifecycle_stage', 'status', re.compile(r'^(?:customer_|account_)?status$', re.IGNORECASE), _TEXT_TYPES, 0.85),
+    ('category_dependency', 'product_category', re.compile(r'^product_category$', re.IGNORECASE), _TEXT_TYPES, 0.95),
+    ('category_dependency', 'product_type', re.compile(r'^(?:product|item)_type$', re.IGNORECASE), _TEXT_TYPES, 0.9),
+    ('category_dependency', 'category', re.compile(r'^category$', re.IGNORECASE), _TEXT_TYPES, 0.9),
+    ('category_dependency', 'division', re.compile(r'^division$', re.IGNORECASE), _TEXT_TYPES, 0.9),
+    ('category_dependency', 'department', re.compile(r'^department$', re.IGNORECASE), _TEXT_TYPES, 0.9),
+    ('category_dependency', 'segment', re.compile(r'^(?:customer_)?segment$', re.IGNORECASE), _TEXT_TYPES, 0.85),
+]
+
+# Table schemas keyed by (email, table_name, version token). The token combines the xmin of the
+# table's pg_class row (table-level DDL) with the newest xmin among its pg_attribute and pg_attrdef
+# rows (column add/drop/rename/type and default changes, which leave pg_class untouched), so a hit
+# is only served for an unchanged definition; the TTL bounds how stale the sample values can get.
+_table_schema_cache: TTLCache = TTLCache(
+    maxsize=int(os.getenv("SCHEMA_MAPPER_SCHEMA_CACHE_SIZE", "256")),
+    ttl=int(os.getenv("SCHEMA_MAPPER_SCHEMA_CACHE_TTL", "3600"))
+)
+_table_schema_cache_lock = threading.Lock()
+
+# Bump when the mapping prompt changes so cached mappings from the old prompt are not reused
+SCHEMA_MAPPING_PROMPT_VERSION = "1.3.2"
+
+# L1: finished mappings keyed by user and the exact prompt inputs (table, full schema with samples, model,
+# prompt version); checked before the structural cache below and backfilled from it on a hit
+_exact_mapping_cache: TTLCache = TTLCache(
+    maxsize=int(os.getenv("SCHEMA_MAPPER_MAPPING_CACHE_SIZE", "256")),
+    ttl=int(os.getenv("SCHEMA_MAPPER_MAPPING_CACHE_TTL", "86400"))
+)
+
+# L2: finished mappings keyed by user + model + structural schema fingerprint (sorted column:type
+# pairs), so a user's tables with the same structure reuse a mapping even when their sample values
+# differ. The user is part of the key because the LLM reasons can quote the sample values they saw.
+_structural_mapping_cache: TTLCache = TTLCache(
+    maxsize=int(os.getenv("SCHEMA_MAPPER_MAPPING_CACHE_SIZE", "256")),
+    ttl=int(os.getenv("SCHEMA_MAPPER_MAPPING_CACHE_TTL", "86400"))
+)
+# One lock guards both mapping cache tiers
+_mapping_cache_lock = threading.Lock()
+
+
+# Static part of the mapping prompt; the per-table schema description is appended after it,
+# so every mapping request shares this prefix (eligible for provider-side prompt caching)
+_SCHEMA_MAPPING_PROMPT_PREFIX = """You are a database schema analysis expert. Analyze the table schema given at the end of this message and map columns to churn analysis feature buckets.
 
 TASK: Map columns to these 5 feature buckets (multiple columns per bucket allowed):
 
@@ -188,7 +154,7 @@ TASK: Map columns to these 5 feature buckets (multiple columns per bucket allowe
 5. LIFECYCLE_STAGE: Customer identifiers, account creation dates, status fields
 
 INSTRUCTIONS:
-- Examine ALL {len(schema)} columns systematically
+- Examine ALL columns of the schema systematically
 - Map multiple relevant columns per bucket (not just one)
 - CRITICAL: Pay special attention to CATEGORY_DEPENDENCY - aggressively identify any columns related to products, categories, types, or classifications
 - Provide confidence scores (0.0-1.0) and detailed reasoning
@@ -197,80 +163,604 @@ INSTRUCTIONS:
 
 CRITICAL: Return ONLY valid JSON in this EXACT format (no markdown, no extra text, ensure all strings are properly escaped):
 
-{{
-  "column_mapping": {{
+{
+  "column_mapping": {
     "recency": [
-      {{
+      {
         "column": "column_name",
         "subtype": "primary_date|secondary_date|update_timestamp",
         "confidence": 0.95,
         "reason": "Detailed explanation of why this column fits recency analysis"
-      }}
+      }
     ],
     "frequency": [
-      {{
+      {
         "column": "column_name", 
         "subtype": "transaction_count|order_id|quantity",
         "confidence": 0.90,
         "reason": "Detailed explanation of why this column fits frequency analysis"
-      }}
+      }
     ],
     "monetary": [
-      {{
+      {
         "column": "column_name",
         "subtype": "amount|cost|profit|total",
         "confidence": 0.95,
         "reason": "Detailed explanation of why this column fits monetary analysis"
-      }}
+      }
     ],
     "category_dependency": [
-      {{
+      {
         "column": "column_name",
         "subtype": "product_category|product_type|category|division|department|segment|vendor|type|classification",
         "confidence": 0.85,
         "reason": "Detailed explanation of why this column fits category dependency analysis (e.g., contains product categories, item types, department classifications, or any categorical grouping of products/services)"
-      }}
+      }
     ],
     "lifecycle_stage": [
-      {{
+      {
         "column": "column_name",
         "subtype": "customer_id|first_purchase|status|stage",
         "confidence": 0.90,
         "reason": "Detailed explanation of why this column fits lifecycle stage analysis"
-      }}
+      }
     ],
     "unmapped": [
-      {{
+      {
         "column": "column_name",
         "reason": "Detailed explanation of why this column doesn't fit any bucket"
-      }}
+      }
     ]
-  }},
-  "mapping_summary": {{
-    "total_columns_examined": {len(schema)},
+  },
+  "mapping_summary": {
+    "total_columns_examined": 0,
     "total_columns_mapped": 0,
     "total_columns_unmapped": 0,
     "mapping_coverage_percentage": 0.0
-  }},
-  "statistical_methodology": {{
+  },
+  "statistical_methodology": {
     "classification_approach": "LLM-powered semantic analysis with confidence scoring",
-    "bucket_definitions": {{
+    "bucket_definitions": {
       "recency": "Date/timestamp fields for calculating time since last activity",
       "frequency": "Countable transaction or interaction identifiers",
       "monetary": "Financial value fields for revenue and cost analysis", 
       "category_dependency": "Categorical fields for product/service segmentation",
       "lifecycle_stage": "Customer identification and status tracking fields"
-    }},
-    "confidence_scoring": {{
+    },
+    "confidence_scoring": {
       "high_confidence": "0.8-1.0: Clear semantic match with bucket purpose",
       "medium_confidence": "0.6-0.79: Probable match with some uncertainty",
       "low_confidence": "0.4-0.59: Possible match requiring validation"
-    }}
-  }}
-}}"""
+    }
+  }
+}"""
+
+# Full static heads of the single- and multi-table prompts, built once at import; a request only
+# appends its schema description(s)
+_SINGLE_TABLE_PROMPT_HEAD = _SCHEMA_MAPPING_PROMPT_PREFIX + "\n\nSCHEMA TO ANALYZE:\n"
+_BATCH_PROMPT_HEAD = (
+    _SCHEMA_MAPPING_PROMPT_PREFIX
+    + "\n\nSeveral tables are given below. Map each table separately and return ONE JSON object "
+    + "whose keys are the table names and whose values hold only the column_mapping part of the "
+    + "format above (no mapping_summary or statistical_methodology)."
+    + "\n\nSCHEMAS TO ANALYZE:\n"
+)
+
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON Schema object in OpenAI strict-mode form: every property required, no extras"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+_MAPPED_COLUMN_SCHEMA = _strict_object({
+    "column": {"type": "string"},
+    "subtype": {"type": "string"},
+    "confidence": {"type": "number"},
+    "reason": {"type": "string"}
+})
+
+# Response contract of the mapping prompt above, passed to the model as structured output so the
+# reply is a bare JSON object of this shape (no fences or prose to strip)
+_SCHEMA_MAPPING_RESPONSE_SCHEMA: Dict[str, Any] = {
+    "title": "schema_mapping",
+    **_strict_object({
+        "column_mapping": _strict_object({
+            **{bucket: {"type": "array", "items": _MAPPED_COLUMN_SCHEMA}
+               for bucket in ("recency", "frequency", "monetary", "category_dependency", "lifecycle_stage")},
+            "unmapped": {"type": "array", "items": _strict_object({
+                "column": {"type": "string"},
+                "reason": {"type": "string"}
+            })}
+        }),
+        "mapping_summary": _strict_object({
+            "total_columns_examined": {"type": "integer"},
+            "total_columns_mapped": {"type": "integer"},
+            "total_columns_unmapped": {"type": "integer"},
+            "mapping_coverage_percentage": {"type": "number"}
+        }),
+        "statistical_methodology": _strict_object({
+            "classification_approach": {"type": "string"},
+            "bucket_definitions": _strict_object({
+                bucket: {"type": "string"}
+                for bucket in ("recency", "frequency", "monetary", "category_dependency", "lifecycle_stage")
+            }),
+            "confidence_scoring": _strict_object({
+                level: {"type": "string"}
+                for level in ("high_confidence", "medium_confidence", "low_confidence")
+            })
+        })
+    })
+}
+
+# Per-table reply of a multi-table mapping call: only column_mapping, since the summary is
+# recomputed locally and the methodology is fixed (_BATCH_STATISTICAL_METHODOLOGY)
+_BATCH_TABLE_RESPONSE_SCHEMA: Dict[str, Any] = _strict_object({
+    "column_mapping": _SCHEMA_MAPPING_RESPONSE_SCHEMA["properties"]["column_mapping"]
+})
+
+
+# Methodology returned when every column was classified by _COLUMN_RULES and no LLM call was made;
+# mirrors the statistical_methodology section of the prompt format
+_DEFAULT_STATISTICAL_METHODOLOGY: Dict[str, Any] = {
+    "classification_approach": "Rule-based name and type matching",
+    "bucket_definitions": {
+        "recency": "Date/timestamp fields for calculating time since last activity",
+        "frequency": "Countable transaction or interaction identifiers",
+        "monetary": "Financial value fields for revenue and cost analysis",
+        "category_dependency": "Categorical fields for product/service segmentation",
+        "lifecycle_stage": "Customer identification and status tracking fields"
+    },
+    "confidence_scoring": {
+        "high_confidence": "0.8-1.0: Clear semantic match with bucket purpose",
+        "medium_confidence": "0.6-0.79: Probable match with some uncertainty",
+        "low_confidence": "0.4-0.59: Possible match requiring validation"
+    }
+}
+
+# Methodology attached to tables mapped by a multi-table call, which does not ask the model for it
+_BATCH_STATISTICAL_METHODOLOGY: Dict[str, Any] = {
+    **_DEFAULT_STATISTICAL_METHODOLOGY,
+    "classification_approach": "LLM-powered semantic analysis with confidence scoring"
+}
+
+
+class SchemaMappingError(Exception):
+    """Custom exception for schema mapping errors"""
+    pass
+
+
+class SchemaAccessError(SchemaMappingError):
+    """The table does not exist or cannot be read with this database user; retrying will not help"""
+    pass
+
+
+class SchemaMapperAgent:
+    """
+    Schema Mapper Agent
+    
+    Analyzes database table schemas and maps columns to churn analysis feature buckets
+    using LLM-powered semantic classification.
+    """
+    
+    def __init__(self, provider: str = 'openai', model_name: Optional[str] = None, email: Optional[str] = None):
+        """
+        Initialize the Schema Mapper Agent
         
-        return prompt
+        Args:
+            provider: LLM provider ('openai' or 'gemini')
+            model_name: Specific model name (optional)
+            email: User email for database routing (optional)
+        """
+        self.agent_name = "Schema Mapper Agent"
+        self.version = "1.0.0"
+        self.provider = provider
+        self.email = email
+        self._db_pool: Optional[Tuple[ThreadedConnectionPool, threading.BoundedSemaphore]] = None
+        self._db_pool_key: Optional[Tuple] = None
+        # (pool, slots) each borrowed connection came from, keyed by id(conn), so it goes back
+        # there even if the agent has moved to a new pool in the meantime
+        self._borrowed: Dict[int, Tuple[ThreadedConnectionPool, threading.BoundedSemaphore]] = {}
+        
+        # Initialize LLM
+        try:
+            self.model_factory = ModelFactory(provider=provider, model_name=model_name)
+            self.model_name = self.model_factory.model_name
+            logger.info(f"Initialized {self.agent_name} with {provider} ({self.model_name})")
+        except Exception as e:
+            logger.error(f"Failed to initialize LLM: {e}")
+            raise SchemaMappingError(f"LLM initialization failed: {e}")
     
+    def _get_db_config(self) -> Dict[str, Any]:
+        """Database connection settings, routed per user by the CRM router when it is available"""
+        try:
+            from routers.crm_data_router import get_db_config as crm_get_db_config
+            return crm_get_db_config(self.email)
+        except ImportError:
+            logger.warning("Could not import CRM router, using direct connection")
+
+        return {
+            'host': os.getenv('SESSIONS_DB_HOST'),
+            'port': int(os.getenv('SESSIONS_DB_PORT', 5432)),
+            'database': os.getenv('SESSIONS_DB_NAME'),
+            'user': os.getenv('SESSIONS_DB_USER'),
+            'password': os.getenv('SESSIONS_DB_PASSWORD')
+        }
+
+    def _get_db_pool(self) -> Tuple[ThreadedConnectionPool, threading.BoundedSemaphore]:
+        """Return the shared (pool, slot semaphore) pair for this agent's database, creating it on first use"""
+        # A pool closed by close_db_pools is replaced by a new one
+        attached = self._db_pool
+        if attached is None or attached[0].closed:
+            config = self._get_db_config()
+            key = tuple(sorted(config.items()))
+            with _db_pools_lock:
+                # Another thread may have attached this agent while the config was read
+                if self._db_pool is attached:
+                    pool = _db_pools.get(key)
+                    if pool is None:
+                        pool = _db_pools[key] = (
+                            ThreadedConnectionPool(1, DB_POOL_MAX_CONNECTIONS, **config),
+                            threading.BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
+                        )
+                        _db_pool_users[key] = 0
+                        logger.info(f"Database connection pool created for {config.get('database')}")
+                    _db_pool_users[key] += 1
+                    self._db_pool = pool
+                    self._db_pool_key = key
+        return self._db_pool
+
+    def close(self) -> None:
+        """
+        Detach the agent from its shared database pool, closing the pool if no other agent uses it
+
+        Connections still borrowed from a closed pool are closed when they are released. The
+        agent stays usable; its next connection attaches it to a pool again.
+        """
+        with _db_pools_lock:
+            pool, key = self._db_pool, self._db_pool_key
+            self._db_pool = self._db_pool_key = None
+            # A pool already dropped by close_db_pools is not counted any more
+            if pool is None or _db_pools.get(key) is not pool:
+                return
+            _db_pool_users[key] -= 1
+            if _db_pool_users[key] > 0:
+                return
+            del _db_pools[key]
+            del _db_pool_users[key]
+        pool[0].closeall()
+        logger.info("Database connection pool closed after its last agent detached")
+
+    def get_db_connection(self) -> psycopg2.extensions.connection:
+        """
+        Get a pooled database connection; hand it back with release_db_connection
+
+        Waits for a free pool slot instead of failing when every connection is in use. A pooled
+        connection is pinged before it is handed out and replaced if it died while idle (server
+        restart, idle timeout).
+        """
+        pool, slots = self._get_db_pool()
+        if not slots.acquire(timeout=DB_POOL_WAIT_SECONDS):
+            logger.error(f"No database connection free after {DB_POOL_WAIT_SECONDS}s")
+            raise SchemaMappingError(f"Database connection failed: no connection free after {DB_POOL_WAIT_SECONDS}s")
+        try:
+            conn = pool.getconn()
+            if not self._connection_alive(conn):
+                logger.warning("Discarding dead pooled database connection")
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            self._borrowed[id(conn)] = (pool, slots)
+            return conn
+        except Exception as e:
+            slots.release()
+            logger.error(f"Database connection failed: {e}")
+            raise SchemaMappingError(f"Database connection failed: {e}")
+
+    @staticmethod
+    def _connection_alive(conn: psycopg2.extensions.connection) -> bool:
+        """Check a pooled connection with a trivial query (runs in the caller's upcoming transaction)"""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def release_db_connection(self, conn: psycopg2.extensions.connection) -> None:
+        """Return a connection from get_db_connection to its pool (an open transaction is rolled back)"""
+        pool, slots = self._borrowed.pop(id(conn))
+        try:
+            if pool.closed:
+                # The pool was shut down while the connection was out
+                conn.close()
+            else:
+                # Broken connections are closed rather than handed to the next caller
+                pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            slots.release()
+    
+    def get_table_schema(self, table_name: str) -> List[Dict[str, Any]]:
+        """Get table schema with column metadata and sample values"""
+        try:
+            conn = self.get_db_connection()
+            try:
+                with conn.cursor() as cursor:
+                    return self._read_table_schema(conn, cursor, table_name)
+            finally:
+                self.release_db_connection(conn)
+            
+        except SchemaAccessError:
+            raise
+        except psycopg2.ProgrammingError as e:
+            # Undefined table, insufficient privilege and other errors in the request itself
+            logger.error(f"Error getting table schema: {e}")
+            raise SchemaAccessError(f"Schema retrieval failed: {e}")
+        except Exception as e:
+            logger.error(f"Error getting table schema: {e}")
+            raise SchemaMappingError(f"Schema retrieval failed: {e}")
+
+    def _read_table_schema(self, conn, cursor, table_name: str) -> List[Dict[str, Any]]:
+        """Query column metadata and sample values, serving unchanged table definitions from the cache"""
+        # A cached schema for an unchanged table definition skips every other query
+        cache_key = self._table_schema_cache_key(conn, cursor, table_name)
+        if cache_key is not None:
+            with _table_schema_cache_lock:
+                cached = _table_schema_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Using cached schema for {table_name}: {len(cached)} columns")
+                return copy.deepcopy(cached)
+        
+        # Column metadata and planner statistics in one query. The lateral subquery picks one
+        # pg_stats row per column (the whole-hierarchy row for inheritance/partition parents);
+        # most_common_vals, or histogram_bounds for columns too distinct to have any, are cast
+        # to text[] so every type comes back as strings
+        query = """
+        SELECT 
+            c.column_name,
+            c.data_type,
+            c.is_nullable,
+            c.column_default,
+            COALESCE(s.most_common_vals::text, s.histogram_bounds::text)::text[] AS stats_samples,
+            s.n_distinct,
+            s.null_frac
+        FROM information_schema.columns c
+        LEFT JOIN LATERAL (
+            SELECT most_common_vals, histogram_bounds, n_distinct, null_frac
+            FROM pg_stats
+            WHERE schemaname = c.table_schema AND tablename = c.table_name AND attname = c.column_name
+            ORDER BY inherited DESC
+            LIMIT 1
+        ) s ON true
+        WHERE c.table_name = %s 
+        ORDER BY c.ordinal_position;
+        """
+        
+        cursor.execute(query, (table_name,))
+        field_names = [desc[0] for desc in cursor.description]
+        columns = [dict(zip(field_names, row)) for row in cursor.fetchall()]
+        
+        if not columns:
+            raise SchemaAccessError(f"Table '{table_name}' not found or has no columns")
+        
+        # Statistics cover most columns; the rest are sampled from the table in one round trip
+        sample_values_by_column = self._get_sample_values(conn, cursor, table_name, columns)
+
+        schema = [
+            {
+                'column_name': col['column_name'],
+                'data_type': col['data_type'],
+                'is_nullable': col['is_nullable'],
+                'default_value': col['column_default'],
+                'sample_values': sample_values,
+                # Planner estimates (None before the first ANALYZE): distinct values, negative
+                # meaning a fraction of the row count, and the fraction of NULLs
+                'n_distinct': col['n_distinct'],
+                'null_frac': col['null_frac']
+            }
+            for col, sample_values in zip(columns, sample_values_by_column)
+        ]
+
+        if cache_key is not None:
+            with _table_schema_cache_lock:
+                _table_schema_cache[cache_key] = copy.deepcopy(schema)
+        
+        logger.info(f"Retrieved schema for {table_name}: {len(schema)} columns")
+        return schema
+    
+    def _table_schema_cache_key(self, conn, cursor, table_name: str) -> Optional[Tuple[Optional[str], str, str]]:
+        """
+        Build the schema cache key from a cheap table version probe
+
+        Args:
+            conn: Open database connection
+            cursor: Cursor on that connection
+            table_name: Table being described
+
+        Returns:
+            (email, table_name, version token), or None when the table is unknown or the probe fails
+        """
+        try:
+            # xid has no ordering operators, so column row xmins are compared as integers
+            cursor.execute(
+                """
+                SELECT string_agg(c.xmin::text || ':' || COALESCE(cols.newest_xmin::text, ''), ',' ORDER BY c.oid)
+                FROM pg_class c
+                CROSS JOIN LATERAL (
+                    SELECT max(row_xmin) AS newest_xmin
+                    FROM (
+                        SELECT xmin::text::bigint AS row_xmin FROM pg_attribute WHERE attrelid = c.oid AND attnum > 0
+                        UNION ALL
+                        SELECT xmin::text::bigint FROM pg_attrdef WHERE adrelid = c.oid
+                    ) column_rows
+                ) cols
+                WHERE c.relname = %s
+                """,
+                (table_name,)
+            )
+            row = cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"Could not read schema version for {table_name}: {e}")
+            conn.rollback()
+            return None
+
+        if not row or row[0] is None:
+            return None
+        return (self.email, table_name, row[0])
+
+    def _get_sample_values(self, conn, cursor, table_name: str, columns: List[Dict[str, Any]]) -> List[List[str]]:
+        """
+        Get distinct non-null sample values for all columns
+
+        Columns whose values carry no signal (see _UNSAMPLED_DATA_TYPES and
+        _UNSAMPLED_COLUMN_RE) are skipped. The rest use the planner statistics already read
+        with the column metadata; only columns without statistics are sampled from the table
+        itself, in at most one query.
+
+        Args:
+            conn: Open database connection
+            cursor: Cursor on that connection
+            table_name: Table to sample
+            columns: Column metadata rows (column_name, data_type, stats_samples) in ordinal order
+
+        Returns:
+            Sample values per column, in the order of columns (empty lists for unsampled
+            columns, or where sampling fails)
+        """
+        sample_values: List[List[str]] = [[] for _ in columns]
+        wanted: Dict[str, int] = {}
+        for index, col in enumerate(columns):
+            col_name = col['column_name']
+            if col['data_type'] in _UNSAMPLED_DATA_TYPES or _UNSAMPLED_COLUMN_RE.search(col_name):
+                continue
+            if col['stats_samples']:
+                sample_values[index] = col['stats_samples'][:SAMPLE_VALUES_PER_COLUMN]
+            else:
+                wanted[col_name] = index
+
+        if wanted:
+            self._scan_sample_values(conn, cursor, table_name, wanted, sample_values)
+        return sample_values
+
+    def _scan_sample_values(self, conn, cursor, table_name: str, wanted: Dict[str, int],
+                            sample_values: List[List[str]]) -> None:
+        """
+        Sample columns without statistics from the table with a single query
+
+        The table is read once into a CTE bounded to SAMPLE_ROWS rows; one parenthesized
+        SELECT DISTINCT ... LIMIT per column then runs over that CTE and the branches are
+        combined with UNION ALL, so a wide table costs one round trip and one bounded scan
+        instead of one scan per column. Values are cast to text in SQL so every branch has
+        the same type.
+
+        Args:
+            conn: Open database connection
+            cursor: Cursor on that connection
+            table_name: Table to sample
+            wanted: Column name -> position in sample_values
+            sample_values: Per-column sample lists, filled in place
+        """
+        subqueries = []
+        for col_name, index in wanted.items():
+            quoted = '"' + col_name.replace('"', '""') + '"'
+            subqueries.append(
+                f"(SELECT DISTINCT {index} AS column_index, {quoted}::text AS sample_value "
+                f"FROM sample_rows WHERE {quoted} IS NOT NULL LIMIT {SAMPLE_VALUES_PER_COLUMN})"
+            )
+
+        # A CTE referenced by several branches is evaluated once
+        query = f"WITH sample_rows AS (SELECT * FROM {table_name} LIMIT {SAMPLE_ROWS})\n" + "\nUNION ALL\n".join(subqueries)
+
+        try:
+            cursor.execute(query)
+            for index, value in cursor.fetchall():
+                sample_values[index].append(value)
+        except Exception as e:
+            logger.warning(f"Could not get sample values for table {table_name}: {e}")
+            # Leave the connection usable after the failed statement
+            conn.rollback()
+    
+    def _exact_cache_key(self, table_name: str, schema: List[Dict[str, Any]]) -> str:
+        """Cache key for the exact mapping request: user, table, full schema, model and prompt version"""
+        payload = json.dumps({
+            "email": self.email,
+            "table": table_name,
+            "schema": schema,
+            "model": f"{self.provider}|{self.model_name}",
+            "prompt_version": SCHEMA_MAPPING_PROMPT_VERSION
+        }, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _structural_cache_key(self, schema: List[Dict[str, Any]]) -> str:
+        """Cache key for a schema's structure: user, model, prompt version and the sorted column:type pairs"""
+        canonical = "|".join(f"{col['column_name']}:{col['data_type']}" for col in sorted(schema, key=lambda col: col['column_name']))
+        return hashlib.blake2b(
+            f"{self.email}|{self.provider}|{self.model_name}|{SCHEMA_MAPPING_PROMPT_VERSION}|{canonical}".encode(), digest_size=16
+        ).hexdigest()
+
+    def _build_schema_mapping_prompt(self, table_name: str, schema: List[Dict[str, Any]]) -> str:
+        """Build prompt for LLM-powered schema mapping"""
+        # Static instructions first so providers can reuse the cached prompt prefix across tables
+        return _SINGLE_TABLE_PROMPT_HEAD + self._describe_schema(table_name, schema)
+    
+    def _build_batch_mapping_prompt(self, schemas: Dict[str, List[Dict[str, Any]]]) -> str:
+        """Build one mapping prompt covering several tables"""
+        return _BATCH_PROMPT_HEAD + "\n\n".join(
+            self._describe_schema(table_name, schema) for table_name, schema in schemas.items()
+        )
+    
+    def _describe_schema(self, table_name: str, schema: List[Dict[str, Any]]) -> str:
+        """Describe one table's columns for the mapping prompt"""
+        # One tab-separated line per column keeps the schema part of the prompt small on wide tables
+        header = f"Table: {table_name}\nTotal Columns: {len(schema)}\n\ncolumn\ttype\tsample values\n"
+        return header + "\n".join(
+            f"{col['column_name']}\t{col['data_type']}\t{self._prompt_samples(col)}" for col in schema
+        )
+    
+    @staticmethod
+    def _prompt_samples(col: Dict[str, Any]) -> str:
+        """
+        Format a column's sample values for the mapping prompt
+
+        Serial columns get none (their values are a counter); the rest show the first
+        PROMPT_SAMPLES_PER_COLUMN values on one line, each cut to PROMPT_SAMPLE_MAX_CHARS.
+        """
+        if str(col.get('default_value') or '').startswith('nextval('):
+            return ''
+        samples = []
+        for value in (col.get('sample_values') or [])[:PROMPT_SAMPLES_PER_COLUMN]:
+            value = ' '.join(str(value).split())
+            if len(value) > PROMPT_SAMPLE_MAX_CHARS:
+                value = value[:PROMPT_SAMPLE_MAX_CHARS - 1] + '…'
+            samples.append(value)
+        return ', '.join(samples)
+    
+    def _parse_mapping_response(self, response: str) -> Dict[str, Any]:
+        """
+        Parse the LLM mapping response
+
+        The response is requested as structured JSON output, so it is parsed as-is.
+
+        Args:
+            response: Raw LLM response text
+
+        Returns:
+            Parsed mapping result
+
+        Raises:
+            JSONDecodeError: If the response is not a JSON document
+        """
+        try:
+            return _jsonlib.loads(response)
+        except _jsonlib.JSONDecodeError as e:
+            logger.error(f"JSON parsing failed: {e}")
+            raise
+
     def map_table_schema(self, table_name: str) -> Dict[str, Any]:
         """
         Map table schema to churn analysis feature buckets
@@ -287,85 +777,272 @@ CRITICAL: Return ONLY valid JSON in this EXACT format (no markdown, no extra tex
             # Get table schema
             schema = self.get_table_schema(table_name)
             
-            # Build LLM prompt
-            prompt = self._build_schema_mapping_prompt(table_name, schema)
+            exact_key, structural_key, cached = self._cached_mapping(table_name, schema)
+            if cached is not None:
+                logger.info(f"Using cached schema mapping for {table_name}")
+                return cached
             
-            # Get LLM response
-            response = self.model_factory.generate_content(prompt)
+            # Obvious columns are classified by rule; only the rest go to the LLM
+            ruled, ambiguous = self._split_ruled_columns(schema)
+            if ambiguous:
+                # Build LLM prompt
+                prompt = self._build_schema_mapping_prompt(table_name, ambiguous)
+                
+                # Get LLM response
+                response = self.model_factory.generate_content(
+                    prompt, response_schema=_SCHEMA_MAPPING_RESPONSE_SCHEMA
+                )
+                
+                result = self._parse_mapping_response(response)
+                # JSON mode (models without strict structured output) guarantees JSON, not this shape
+                if not isinstance(result, dict) or not isinstance(result.get('column_mapping'), dict):
+                    raise SchemaMappingError("LLM response does not contain a column_mapping object")
+            else:
+                logger.info(f"All columns of {table_name} classified by rule, skipping LLM call")
+                result = self._rule_only_result()
             
-            # Clean and parse response
-            cleaned_response = response.strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.endswith('```'):
-                cleaned_response = cleaned_response[:-3]
-            cleaned_response = cleaned_response.strip()
+            self._merge_ruled_columns(result, ruled)
+            return self._finish_mapping(schema, result, exact_key, structural_key)
             
-            # Parse JSON response with error handling
-            try:
-                result = json.loads(cleaned_response)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing failed: {e}")
-                # Try to extract JSON from partial response
-                try:
-                    # Find the first { and try to parse from there
-                    start_idx = cleaned_response.find('{')
-                    if start_idx != -1:
-                        # Find the matching closing brace
-                        brace_count = 0
-                        end_idx = start_idx
-                        for i, char in enumerate(cleaned_response[start_idx:], start_idx):
-                            if char == '{':
-                                brace_count += 1
-                            elif char == '}':
-                                brace_count -= 1
-                                if brace_count == 0:
-                                    end_idx = i + 1
-                                    break
-                        
-                        partial_json = cleaned_response[start_idx:end_idx]
-                        result = json.loads(partial_json)
-                        logger.info("Successfully parsed partial JSON response")
-                    else:
-                        raise e
-                except:
-                    raise e
+        except SchemaAccessError:
+            raise
+        except Exception as e:
+            logger.error(f"Schema mapping failed: {e}")
+            raise SchemaMappingError(f"Schema mapping failed: {e}")
+    
+    def map_table_schemas(self, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Map several tables' schemas to churn analysis feature buckets
+        
+        Schemas are read in parallel and uncached tables are mapped together, packed into
+        as few LLM calls as BATCH_MAX_COLUMNS allows, so the static instructions are sent
+        once per call instead of once per table. Tables missing from a batch reply are
+        mapped one at a time.
+        
+        Args:
+            table_names: Names of the tables to analyze
             
-            # Update mapping summary
-            column_mapping = result.get('column_mapping', {})
-            total_mapped = 0
-            for bucket_name, columns in column_mapping.items():
-                if bucket_name != 'unmapped' and columns:
-                    total_mapped += len(columns)
-
-            total_unmapped = len(column_mapping.get('unmapped', []))
-            total_examined = len(schema)  # Use actual schema length, not just mapped + unmapped
-            coverage_percentage = (total_mapped / total_examined * 100) if total_examined > 0 else 0
+        Returns:
+            Mapping result per table name, in input order
             
-            # Calculate LLM classification failures
-            total_returned_by_llm = total_mapped + total_unmapped
-            llm_missed_columns = total_examined - total_returned_by_llm
-
-            if 'mapping_summary' in result:
-                result['mapping_summary'].update({
-                    'total_columns_examined': total_examined,
-                    'total_columns_mapped': total_mapped,
-                    'total_columns_unmapped': total_unmapped,
-                    'total_columns_missed_by_llm': llm_missed_columns,
-                    'mapping_coverage_percentage': round(coverage_percentage, 1),
-                    'llm_classification_success_rate': round((total_returned_by_llm / total_examined * 100), 1) if total_examined > 0 else 0
-                })
+        Raises:
+            SchemaMappingError: If any table cannot be mapped
+        """
+        table_names = list(dict.fromkeys(table_names))
+        if not table_names:
+            return {}
+        
+        try:
+            # Each worker holds one pooled connection, so never run more workers than the pool has
+            with ThreadPoolExecutor(max_workers=min(len(table_names), DB_POOL_MAX_CONNECTIONS)) as executor:
+                schemas = dict(zip(table_names, executor.map(self.get_table_schema, table_names)))
+            
+            results: Dict[str, Dict[str, Any]] = {}
+            pending: Dict[str, Tuple[str, str]] = {}
+            ruled_by_table: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+            ambiguous_by_table: Dict[str, List[Dict[str, Any]]] = {}
+            for table_name, schema in schemas.items():
+                exact_key, structural_key, cached = self._cached_mapping(table_name, schema)
+                if cached is not None:
+                    results[table_name] = cached
+                    continue
+                pending[table_name] = (exact_key, structural_key)
+                ruled_by_table[table_name], ambiguous = self._split_ruled_columns(schema)
+                if ambiguous:
+                    ambiguous_by_table[table_name] = ambiguous
+                else:
+                    result = self._rule_only_result()
+                    self._merge_ruled_columns(result, ruled_by_table[table_name])
+                    results[table_name] = self._finish_mapping(schema, result, exact_key, structural_key)
+            
+            for batch in self._pack_mapping_batches(ambiguous_by_table):
+                if len(batch) == 1:
+                    continue
+                logger.info(f"Mapping {len(batch)} tables in one call: {', '.join(batch)}")
+                for table_name, result in self._request_batch_mapping(batch).items():
+                    self._merge_ruled_columns(result, ruled_by_table[table_name])
+                    results[table_name] = self._finish_mapping(schemas[table_name], result, *pending[table_name])
             
-            logger.info(f"Schema mapping completed: {total_mapped} mapped, {total_unmapped} unmapped")
-            return result
+            for table_name in pending:
+                if table_name not in results:
+                    results[table_name] = self.map_table_schema(table_name)
             
+            return {table_name: results[table_name] for table_name in table_names}
+            
+        except SchemaMappingError:
+            raise
         except Exception as e:
             logger.error(f"Schema mapping failed: {e}")
             raise SchemaMappingError(f"Schema mapping failed: {e}")
+    
+    def _pack_mapping_batches(self, schemas: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, List[Dict[str, Any]]]]:
+        """Pack tables first-fit into batches of at most BATCH_MAX_COLUMNS columns, table overhead included"""
+        batches: List[Dict[str, List[Dict[str, Any]]]] = []
+        batch_columns: List[int] = []
+        for table_name, schema in schemas.items():
+            cost = len(schema) + BATCH_TABLE_OVERHEAD_COLUMNS
+            for index, columns in enumerate(batch_columns):
+                if columns + cost <= BATCH_MAX_COLUMNS:
+                    batches[index][table_name] = schema
+                    batch_columns[index] += cost
+                    break
+            else:
+                batches.append({table_name: schema})
+                batch_columns.append(cost)
+        return batches
+    
+    def _request_batch_mapping(self, schemas: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Map a batch of tables with one LLM call
+        
+        Args:
+            schemas: Table schemas keyed by table name
+            
+        Returns:
+            Parsed mapping per table, with an empty mapping_summary and the fixed batch
+            methodology; tables the reply lacks (or a reply that cannot be parsed) are left
+            out so the caller can map them individually
+        """
+        response_schema = {
+            "title": "schema_mappings",
+            **_strict_object({table_name: _BATCH_TABLE_RESPONSE_SCHEMA for table_name in schemas})
+        }
+        response = self.model_factory.generate_content(
+            self._build_batch_mapping_prompt(schemas), response_schema=response_schema
+        )
+        try:
+            parsed = self._parse_mapping_response(response)
+        except _jsonlib.JSONDecodeError:
+            logger.warning(f"Batch mapping reply could not be parsed, mapping {len(schemas)} tables individually")
+            return {}
+        if not isinstance(parsed, dict):
+            return {}
+        return {
+            table_name: {
+                'column_mapping': result['column_mapping'],
+                'mapping_summary': {},
+                'statistical_methodology': copy.deepcopy(_BATCH_STATISTICAL_METHODOLOGY)
+            }
+            for table_name, result in parsed.items()
+            if table_name in schemas and isinstance(result, dict) and isinstance(result.get('column_mapping'), dict)
+        }
+    
+    @staticmethod
+    def _rule_classify(col: Dict[str, Any]) -> Optional[Tuple[str, str, float]]:
+        """
+        Classify a column from its name and data type alone
+        
+        Args:
+            col: Schema entry with column_name and data_type
+            
+        Returns:
+            (bucket, subtype, confidence) of the first matching _COLUMN_RULES entry, or None
+        """
+        col_name = col['column_name']
+        data_type = str(col.get('data_type', '')).lower()
+        for bucket, subtype, pattern, data_types, confidence in _COLUMN_RULES:
+            if (data_types is None or data_type in data_types) and pattern.search(col_name):
+                return bucket, subtype, confidence
+        return None
+    
+    def _split_ruled_columns(self, schema: List[Dict[str, Any]]) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """
+        Partition a schema into rule-classified columns and columns left for the LLM
+        
+        Returns:
+            (column_mapping entries per bucket for the ruled columns, remaining schema entries)
+        """
+        ruled: Dict[str, List[Dict[str, Any]]] = {}
+        ambiguous: List[Dict[str, Any]] = []
+        for col in schema:
+            match = self._rule_classify(col)
+            if match is None:
+                ambiguous.append(col)
+                continue
+            bucket, subtype, confidence = match
+            ruled.setdefault(bucket, []).append({
+                'column': col['column_name'],
+                'subtype': subtype,
+                'confidence': confidence,
+                'reason': f"Rule-based match on column name and {col['data_type']} type"
+            })
+        return ruled, ambiguous
+    
+    @staticmethod
+    def _rule_only_result() -> Dict[str, Any]:
+        """Empty mapping result for a schema whose columns were all classified by rule"""
+        return {
+            'column_mapping': {bucket: [] for bucket in _SCHEMA_MAPPING_RESPONSE_SCHEMA['properties']['column_mapping']['required']},
+            'mapping_summary': {},
+            'statistical_methodology': copy.deepcopy(_DEFAULT_STATISTICAL_METHODOLOGY)
+        }
+    
+    @staticmethod
+    def _merge_ruled_columns(result: Dict[str, Any], ruled: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Add rule-classified columns to an LLM mapping result in place, ahead of the LLM's picks"""
+        column_mapping = result.setdefault('column_mapping', {})
+        for bucket, entries in ruled.items():
+            column_mapping[bucket] = entries + (column_mapping.get(bucket) or [])
+    
+    def _cached_mapping(self, table_name: str, schema: List[Dict[str, Any]]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        """
+        Look up a finished mapping of an identical request, then of a structurally identical schema
+        
+        Returns:
+            (exact cache key, structural cache key, deep copy of the cached mapping or None)
+        """
+        exact_key = self._exact_cache_key(table_name, schema)
+        structural_key = self._structural_cache_key(schema)
+        with _mapping_cache_lock:
+            cached = _exact_mapping_cache.get(exact_key)
+            if cached is None:
+                cached = _structural_mapping_cache.get(structural_key)
+                if cached is not None:
+                    _exact_mapping_cache[exact_key] = cached
+        return exact_key, structural_key, copy.deepcopy(cached) if cached is not None else None
+    
+    def _finish_mapping(self, schema: List[Dict[str, Any]], result: Dict[str, Any],
+                        exact_key: str, structural_key: str) -> Dict[str, Any]:
+        """Fill in the mapping summary from the actual schema and cache the finished mapping"""
+        # Update mapping summary
+        column_mapping = result.get('column_mapping', {})
+        total_mapped = 0
+        for bucket_name, columns in column_mapping.items():
+            if bucket_name != 'unmapped' and columns:
+                total_mapped += len(columns)
+
+        total_unmapped = len(column_mapping.get('unmapped', []))
+        total_examined = len(schema)  # Use actual schema length, not just mapped + unmapped
+        coverage_percentage = (total_mapped / total_examined * 100) if total_examined > 0 else 0
+        
+        # Calculate LLM classification failures
+        total_returned_by_llm = total_mapped + total_unmapped
+        llm_missed_columns = total_examined - total_returned_by_llm
+
+        if 'mapping_summary' in result:
+            result['mapping_summary'].update({
+                'total_columns_examined': total_examined,
+                'total_columns_mapped': total_mapped,
+                'total_columns_unmapped': total_unmapped,
+                'total_columns_missed_by_llm': llm_missed_columns,
+                'mapping_coverage_percentage': round(coverage_percentage, 1),
+                'llm_classification_success_rate': round((total_returned_by_llm / total_examined * 100), 1) if total_examined > 0 else 0
+            })
+        
+        # Both tiers share one private copy; hits are deep-copied before they are returned
+        stored = copy.deepcopy(result)
+        with _mapping_cache_lock:
+            _exact_mapping_cache[exact_key] = stored
+            _structural_mapping_cache[structural_key] = stored
+        
+        logger.info(f"Schema mapping completed: {total_mapped} mapped, {total_unmapped} unmapped")
+        return result
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     # Test the Schema Mapper Agent
     agent = SchemaMapperAgent(provider='openai')
     result = agent.map_table_schema('sales_data')
-    print(json.dumps(result, indent=2))
+    print(_jsonlib.dumps_pretty(result))
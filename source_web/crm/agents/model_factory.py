@@ -11,6 +11,7 @@ Key Features:
 4. Comprehensive error handling and logging
 5. Support for both OpenAI and Google Gemini providers
 6. Reusable across all CRM agent classes
+7. Process-wide pooled HTTP clients (HTTP/2 when available) shared by every agent
 
 Supported Providers:
 - Google Gemini (gemini-1.5-flash, gemini-1.5-pro)
@@ -26,27 +27,87 @@ Usage:
     model_info = factory.get_model_info()
     client = model_info.client  # For OpenAI
     model = model_info.model    # For Gemini
+
+    # On application shutdown
+    await ModelFactory.aclose()
 """
 
-import google.generativeai as genai
-import openai
+import asyncio
+import httpx
 import os
 import logging
-from typing import Optional, Union, NamedTuple
+import random
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Union, NamedTuple
 from dotenv import load_dotenv
 
+# Provider SDKs are imported inside the matching _init_* method so a process only
+# loads the SDK of the provider it actually uses
+if TYPE_CHECKING:
+    import google.generativeai as genai
+    import openai
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool sizing shared by all agents (the SDK default is far smaller)
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "50"))
+)
+HTTP_TIMEOUT = httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "60")), connect=10.0)
+
+# Jittered exponential backoff on provider rate-limit (429) errors for async calls
+RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("LLM_RATE_LIMIT_BACKOFF_SECONDS", "1.0"))
+
+# Completion cap of every OpenAI call; callers packing several answers into one reply budget against it
+COMPLETION_MAX_TOKENS = 2500
+
+# Module-level HTTP clients so every ModelFactory reuses warm TLS connections
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled sync HTTP client, creating it on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.Client(http2=HTTP2_AVAILABLE, limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled async HTTP client, creating it on first use"""
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=HTTP_POOL_LIMITS, timeout=HTTP_TIMEOUT)
+    return _async_http_client
+
 
 class ModelInfo(NamedTuple):
     """Container for model initialization information"""
     provider: str
     model_name: str
-    client: Optional[openai.OpenAI] = None
-    model: Optional[genai.GenerativeModel] = None
+    client: Optional["openai.OpenAI"] = None
+    model: Optional["genai.GenerativeModel"] = None
+    async_client: Optional["openai.AsyncOpenAI"] = None
+
+
+class Generation(NamedTuple):
+    """Outcome of one synchronous completion"""
+    text: str
+    # "length" when the reply was cut off at the completion cap, else the provider's reason (or None)
+    finish_reason: Optional[str] = None
+    # Provider/SDK error message when the call failed; text is empty then
+    error: Optional[str] = None
 
 
 class ModelFactory:
@@ -66,6 +127,18 @@ class ModelFactory:
     # Supported providers
     SUPPORTED_PROVIDERS = {"gemini", "openai"}
     
+    # Provider rate-limit exception types, filled in by _init_gemini/_init_openai
+    _rate_limit_errors: tuple = ()
+    
+    # OpenAI request-rejected exception types, filled in by _init_openai
+    _bad_request_errors: tuple = ()
+    
+    # Set once the model rejects json_schema response formats; later calls go straight to JSON mode
+    _json_schema_unsupported: bool = False
+    
+    # Callbacks run by aclose that drop module-level registries of factories (or agents holding them)
+    _close_hooks: List[Callable[[], None]] = []
+    
     def __init__(self,
                  provider: str = "openai",
                  model_name: Optional[str] = None,
@@ -151,6 +224,10 @@ class ModelFactory:
                 "Google AI API key must be provided either as parameter or GOOGLE_API_KEY environment variable"
             )
         
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+        self._rate_limit_errors = (google_exceptions.ResourceExhausted,)
+        
         # Configure and create model
         try:
             genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
@@ -175,6 +252,10 @@ class ModelFactory:
         Returns:
             ModelInfo with OpenAI client
         """
+        import openai
+        self._rate_limit_errors = (openai.RateLimitError,)
+        self._bad_request_errors = (openai.BadRequestError,)
+        
         # Handle API key
         api_key = self.openai_api_key
         if api_key:
@@ -186,16 +267,18 @@ class ModelFactory:
                 "OpenAI API key must be provided either as parameter or OPENAI_API_KEY environment variable"
             )
         
-        # Create client
+        # Create clients on top of the shared connection pools
         try:
-            client = openai.OpenAI(api_key=openai.api_key)
+            client = openai.OpenAI(api_key=openai.api_key, http_client=get_http_client())
+            async_client = openai.AsyncOpenAI(api_key=openai.api_key, http_client=get_async_http_client())
             
             logger.info(f"✅ Initialized {self.agent_name} with OpenAI {self.model_name}")
             
             return ModelInfo(
                 provider=self.provider,
                 model_name=self.model_name,
-                client=client
+                client=client,
+                async_client=async_client
             )
             
         except Exception as e:
@@ -211,16 +294,41 @@ class ModelFactory:
         """
         return self.model_info
     
-    def generate_content(self, prompt: str, system_message: Optional[str] = None) -> str:
+    def generate_content(self, prompt: str, system_message: Optional[str] = None,
+                         response_schema: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate content using the initialized model
         
         Args:
             prompt: The user prompt
             system_message: Optional system message for better context
+            response_schema: Optional JSON Schema the response must follow. OpenAI enforces it
+                with strict structured output (JSON mode on models without it); Gemini is
+                asked for JSON output only, since its schema dialect is a restricted subset
             
         Returns:
-            Generated content string
+            Generated content string (an error string if the call failed)
+        """
+        generation = self.generate(prompt, system_message, response_schema)
+        if generation.error is not None:
+            return f"Error generating content with {self.provider}: {generation.error}"
+        return generation.text
+    
+    def generate(self, prompt: str, system_message: Optional[str] = None,
+                 response_schema: Optional[Dict[str, Any]] = None) -> Generation:
+        """
+        Variant of generate_content that reports failures and truncation separately
+        
+        Callers that pack several answers into one reply use it to tell a provider error
+        (nothing to retry with a smaller request) from a reply cut off at COMPLETION_MAX_TOKENS.
+        
+        Args:
+            prompt: The user prompt
+            system_message: Optional system message for better context
+            response_schema: Optional JSON Schema the response must follow (see generate_content)
+            
+        Returns:
+            Generation with the text, the finish reason and any error message
         """
         if system_message is None:
             system_message = "You are a helpful AI assistant."
@@ -229,24 +337,226 @@ class ModelFactory:
             if self.provider == "gemini":
                 # For Gemini, include system message in the prompt
                 full_prompt = f"System: {system_message}\n\nUser: {prompt}"
-                response = self.model_info.model.generate_content(full_prompt)
-                return response.text
+                if response_schema is not None:
+                    response = self.model_info.model.generate_content(
+                        full_prompt, generation_config={"response_mime_type": "application/json"}
+                    )
+                else:
+                    response = self.model_info.model.generate_content(full_prompt)
+                candidates = getattr(response, "candidates", None)
+                reason = getattr(candidates[0].finish_reason, "name", None) if candidates else None
+                return Generation(response.text, "length" if reason == "MAX_TOKENS" else reason)
+                
+            elif self.provider == "openai":
+                messages = [
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": prompt}
+                ]
+                if response_schema is None:
+                    response = self.model_info.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        temperature=0.3,
+                        max_tokens=COMPLETION_MAX_TOKENS
+                    )
+                else:
+                    response = self._create_structured_completion(messages, response_schema)
+                choice = response.choices[0]
+                return Generation(choice.message.content or "", getattr(choice, "finish_reason", None))
+                
+        except Exception as e:
+            logger.error(f"Error generating content with {self.provider} for {self.agent_name}: {str(e)}")
+            return Generation("", error=str(e))
+        
+        return Generation("", error=f"Unsupported provider: {self.provider}")
+    
+    def _create_structured_completion(self, messages: list, response_schema: Dict[str, Any]):
+        """
+        Create an OpenAI completion constrained to a JSON Schema
+        
+        Models without json_schema support reject the response_format parameter; the factory
+        then falls back to JSON mode (valid JSON, schema not enforced) and remembers that for
+        later calls. Any other bad request is raised to the caller.
+        
+        Args:
+            messages: Chat messages
+            response_schema: Strict-mode compatible JSON Schema
+            
+        Returns:
+            OpenAI chat completion
+        """
+        if not self._json_schema_unsupported:
+            try:
+                return self.model_info.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=COMPLETION_MAX_TOKENS,
+                    response_format={
+                        "type": "json_schema",
+                        "json_schema": {
+                            "name": response_schema.get("title", "response"),
+                            "schema": {k: v for k, v in response_schema.items() if k != "title"},
+                            "strict": True
+                        }
+                    }
+                )
+            except self._bad_request_errors as e:
+                # Only a rejection of the response format itself means the model lacks json_schema
+                # support; context-length or schema-limit errors must not turn strict mode off
+                # for every later call on this (pooled) factory
+                param = str(getattr(e, "param", None) or "")
+                if not (param.startswith("response_format") and "not supported" in str(e).lower()):
+                    raise
+                logger.warning(f"{self.model_name} rejected structured output for {self.agent_name}, using JSON mode: {str(e)}")
+                self._json_schema_unsupported = True
+        
+        return self.model_info.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=COMPLETION_MAX_TOKENS,
+            response_format={"type": "json_object"}
+        )
+    
+    async def agenerate_content(self, prompt: str, system_message: Optional[str] = None) -> str:
+        """
+        Async counterpart of generate_content for concurrent LLM dispatch
+        
+        Rate-limit errors are retried with jittered exponential backoff before
+        falling back to the error string returned by generate_content.
+        
+        Args:
+            prompt: The user prompt
+            system_message: Optional system message for better context
+            
+        Returns:
+            Generated content string
+        """
+        if system_message is None:
+            system_message = "You are a helpful AI assistant."
+        
+        attempt = 0
+        while True:
+            try:
+                return await self._acomplete(prompt, system_message)
+                
+            except self._rate_limit_errors as e:
+                if attempt >= RATE_LIMIT_RETRIES:
+                    logger.error(f"Rate limited by {self.provider} for {self.agent_name} after {attempt} retries: {str(e)}")
+                    return f"Error generating content with {self.provider}: {str(e)}"
+                delay = RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, RATE_LIMIT_BACKOFF_SECONDS)
+                attempt += 1
+                logger.warning(f"Rate limited by {self.provider} for {self.agent_name}, retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
                 
+            except Exception as e:
+                logger.error(f"Error generating content with {self.provider} for {self.agent_name}: {str(e)}")
+                return f"Error generating content with {self.provider}: {str(e)}"
+    
+    async def _acomplete(self, prompt: str, system_message: str) -> str:
+        """
+        Issue a single async completion request, letting provider errors propagate
+        
+        Args:
+            prompt: The user prompt
+            system_message: System message for better context
+            
+        Returns:
+            Generated content string
+        """
+        if self.provider == "gemini":
+            full_prompt = f"System: {system_message}\n\nUser: {prompt}"
+            response = await self.model_info.model.generate_content_async(full_prompt)
+            return response.text
+        
+        response = await self.model_info.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=COMPLETION_MAX_TOKENS
+        )
+        return response.choices[0].message.content
+    
+    async def astream_content(self, prompt: str, system_message: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream generated content as it is produced
+        
+        Args:
+            prompt: The user prompt
+            system_message: Optional system message for better context
+            
+        Yields:
+            Text chunks of the generated content
+            
+        Raises:
+            Exception: The provider/SDK error, logged first; chunks yielded before it are partial
+        """
+        if system_message is None:
+            system_message = "You are a helpful AI assistant."
+        
+        try:
+            if self.provider == "gemini":
+                full_prompt = f"System: {system_message}\n\nUser: {prompt}"
+                response = await self.model_info.model.generate_content_async(full_prompt, stream=True)
+                async for chunk in response:
+                    yield chunk.text
+                    
             elif self.provider == "openai":
-                response = self.model_info.client.chat.completions.create(
+                stream = await self.model_info.async_client.chat.completions.create(
                     model=self.model_name,
                     messages=[
                         {"role": "system", "content": system_message},
                         {"role": "user", "content": prompt}
                     ],
                     temperature=0.3,
-                    max_tokens=2500
+                    max_tokens=COMPLETION_MAX_TOKENS,
+                    stream=True
                 )
-                return response.choices[0].message.content
-                
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                        
         except Exception as e:
-            logger.error(f"Error generating content with {self.provider} for {self.agent_name}: {str(e)}")
-            return f"Error generating content with {self.provider}: {str(e)}"
+            logger.error(f"Error streaming content with {self.provider} for {self.agent_name}: {str(e)}")
+            raise
+    
+    @classmethod
+    def register_close_hook(cls, hook: Callable[[], None]) -> None:
+        """
+        Register a callback for aclose, e.g. one that clears a registry of cached factories
+
+        Args:
+            hook: Callable taking no arguments
+        """
+        cls._close_hooks.append(hook)
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """
+        Close the shared HTTP connection pools
+
+        Call once from the application shutdown hook. Factories created before the call keep
+        SDK clients bound to the closed pools and must not be used again, so the registered
+        close hooks first drop the registries that cache factories (NoteAgent's factories,
+        the orchestrator's agent pool). Factories created afterwards get new pools.
+        """
+        global _http_client, _async_http_client
+        for hook in cls._close_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Close hook {getattr(hook, '__qualname__', hook)} failed: {str(e)}")
+        if _async_http_client is not None:
+            await _async_http_client.aclose()
+            _async_http_client = None
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        logger.info("Closed shared LLM HTTP connection pools")
     
     @classmethod
     def create_for_agent(cls,
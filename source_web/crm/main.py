@@ -35,6 +35,8 @@ from routers.call_summary_router import router as call_summary_router
 
 # Initialize auth
 from auth.providers import init_auth
+from agents.model_factory import ModelFactory
+from agents.common_agent.schema_mapper_agent_specialized import close_db_pools
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -62,6 +64,8 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info(f"Shutting down {settings.APP_NAME}...")
+    await ModelFactory.aclose()
+    close_db_pools()
 
 # Create FastAPI app with lifespan management
 app = FastAPI(